@@ -2,7 +2,18 @@ from flask import Flask
 from flask_cors import CORS
 from flasgger import Swagger
 from app.config import config
-from app.extensions import mongo
+from app.storage import storage
+from app.utils.audit import audit
+from app.utils.cache import cache
+from app.utils.concurrency import limiter
+from app.utils.events import events
+from app.utils.memberships import memberships
+from app.utils.ranks import rebalancer
+from app.utils.reminders import reminders
+from app.utils.revocations import revocations
+from app.utils.singleflight import singleflight
+from app.utils.timing import server_timing
+from app.utils.write_behind import write_behind
 
 
 def create_app(config_name='default'):
@@ -11,7 +22,18 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
 
     # Initialize extensions
-    mongo.init_app(app)
+    storage.init_app(app)
+    cache.init_app(app)
+    memberships.init_app(app)
+    events.init_app(app)
+    write_behind.init_app(app)
+    audit.init_app(app)
+    reminders.init_app(app)
+    rebalancer.init_app(app)
+    revocations.init_app(app)
+    singleflight.init_app(app)
+    server_timing.init_app(app)
+    limiter.init_app(app)
     CORS(app)
 
     # Configure Swagger
@@ -59,11 +81,23 @@ def create_app(config_name='default'):
         "tags": [
             {
                 "name": "Authentication",
-                "description": "User registration and login endpoints"
+                "description": "User registration, login and token refresh endpoints"
             },
             {
                 "name": "Tasks",
                 "description": "CRUD operations for tasks"
+            },
+            {
+                "name": "Lists",
+                "description": "Task lists shared between users"
+            },
+            {
+                "name": "Events",
+                "description": "Live task updates over Server-Sent Events"
+            },
+            {
+                "name": "Admin",
+                "description": "Operational endpoints for administrators"
             }
         ]
     }
@@ -73,15 +107,32 @@ def create_app(config_name='default'):
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.tasks import tasks_bp
+    from app.routes.lists import lists_bp
+    from app.routes.events import events_bp
+    from app.routes.batch import batch_bp
+    from app.routes.admin import admin_bp
+    from app.routes.health import health_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(tasks_bp, url_prefix='/api')
+    app.register_blueprint(lists_bp, url_prefix='/api')
+    app.register_blueprint(events_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(health_bp)
+
+    # Register CLI commands
+    from app.commands import register_commands
 
-    # Create indexes
-    with app.app_context():
-        mongo.db.users.create_index('username', unique=True)
-        mongo.db.users.create_index('email', unique=True)
-        mongo.db.tasks.create_index('user_id')
-        mongo.db.tasks.create_index('created_at')
+    register_commands(app)
 
     return app
+
+
+def reinit_after_fork(app):
+    """Give a freshly forked worker process its own Mongo client
+
+    pymongo clients are not fork-safe, so a client created while the app was
+    preloaded in the parent must never be used by a worker.
+    """
+    storage.reinit(app)
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.models.task import Task
+from app.storage import storage
+
+
+def collection_stats(name):
+    """Return document count, data size and index sizes for a collection"""
+    return storage.collection_stats(name)
+
+
+def echo_stats_diff(name, before, after):
+    """Print how a collection's footprint changed between two snapshots"""
+    click.echo(
+        f"{name}: {before['count']} -> {after['count']} documents, "
+        f"data {before['size']} -> {after['size']} bytes, "
+        f"indexes {before['total_index_size']} -> {after['total_index_size']} bytes"
+    )
+    for index, size in sorted(before['index_sizes'].items()):
+        click.echo(f"  {index}: {size} -> {after['index_sizes'].get(index, 0)} bytes")
+
+
+@click.command('archive-tasks')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive tasks completed more than this many days ago.')
+@click.option('--batch-size', type=int, default=None,
+              help='Number of tasks moved per batch.')
+@click.option('--pause', type=float, default=None,
+              help='Seconds to sleep between batches.')
+@with_appcontext
+def archive_tasks_command(older_than_days, batch_size, pause):
+    """Move old completed tasks into the archive collection."""
+    config = current_app.config
+
+    if older_than_days is None:
+        older_than_days = config['TASK_ARCHIVE_AFTER_DAYS']
+    if batch_size is None:
+        batch_size = config['TASK_ARCHIVE_BATCH_SIZE']
+    if pause is None:
+        pause = config['TASK_ARCHIVE_BATCH_PAUSE']
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    before = collection_stats('tasks')
+    archived = Task.archive_completed(cutoff, batch_size=batch_size, pause=pause)
+    after = collection_stats('tasks')
+
+    click.echo(f'Archived {archived} tasks completed before {cutoff.isoformat()}')
+    echo_stats_diff('tasks', before, after)
+
+
+@click.command('migrate-task-user-ids')
+@click.option('--batch-size', type=int, default=500,
+              help='Number of tasks rewritten per batch.')
+@click.option('--pause', type=float, default=0.1,
+              help='Seconds to sleep between batches.')
+@with_appcontext
+def migrate_task_user_ids_command(batch_size, pause):
+    """Convert string task user_id values to ObjectIds in place."""
+    for name in ('tasks', 'tasks_archive'):
+        before = collection_stats(name)
+        migrated, skipped = Task.migrate_user_ids(name, batch_size=batch_size, pause=pause)
+        after = collection_stats(name)
+
+        click.echo(f'Migrated {migrated} {name} documents ({skipped} skipped, invalid user_id)')
+        echo_stats_diff(name, before, after)
+
+    click.echo('Set TASK_USER_ID_DUAL_READ=false once every worker runs this version.')
+
+
+@click.command('rank-tasks')
+@click.option('--batch-size', type=int, default=500,
+              help='Number of unranked tasks read per batch.')
+@click.option('--pause', type=float, default=0.1,
+              help='Seconds to sleep between batches.')
+@with_appcontext
+def rank_tasks_command(batch_size, pause):
+    """Give tasks created before manual ordering a rank, keeping their order."""
+    orders, rewritten = Task.rank_unranked(batch_size=batch_size, pause=pause)
+    click.echo(f'Respaced {orders} manual orders, rewriting {rewritten} ranks')
+
+
+@click.command('send-reminders')
+@click.option('--lookback-hours', type=float, default=None,
+              help='Only remind about tasks that came due within this many hours.')
+@with_appcontext
+def send_reminders_command(lookback_hours):
+    """Publish task.due events for tasks that have come due, once each."""
+    config = current_app.config
+
+    if lookback_hours is None:
+        lookback_hours = config['TASK_REMINDER_LOOKBACK_HOURS']
+
+    sent = Task.send_due_reminders(
+        datetime.utcnow(),
+        timedelta(hours=lookback_hours),
+        batch_size=config['TASK_REMINDER_BATCH_SIZE']
+    )
+    click.echo(f'Sent {sent} reminders')
+
+
+def register_commands(app):
+    """Register CLI commands on the app"""
+    app.cli.add_command(archive_tasks_command)
+    app.cli.add_command(migrate_task_user_ids_command)
+    app.cli.add_command(rank_tasks_command)
+    app.cli.add_command(send_reminders_command)
@@ -10,9 +10,119 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/task_manager')
+    # 'mongo', or 'memory' to keep everything in this process (tests, benchmarks)
+    STORAGE_ENGINE = os.getenv('STORAGE_ENGINE', 'mongo')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(
         seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))
     )
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(
+        seconds=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 30 * 24 * 3600))
+    )
+
+    # Password hashing; BCRYPT_HASH_WORKERS threads hash bulk-provisioned users.
+    # At 12 rounds a hash takes about 0.3s, so a batch has to stay well inside
+    # REQUEST_DEADLINE_MS: 100 users take about 8s on 4 threads.
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    BCRYPT_HASH_WORKERS = int(os.getenv('BCRYPT_HASH_WORKERS', os.cpu_count() or 1))
+    BULK_PROVISION_MAX_USERS = int(os.getenv('BULK_PROVISION_MAX_USERS', 100))
+
+    # Archival of completed tasks (see `flask archive-tasks`)
+    TASK_ARCHIVE_AFTER_DAYS = int(os.getenv('TASK_ARCHIVE_AFTER_DAYS', 90))
+    TASK_ARCHIVE_BATCH_SIZE = int(os.getenv('TASK_ARCHIVE_BATCH_SIZE', 500))
+    TASK_ARCHIVE_BATCH_PAUSE = float(os.getenv('TASK_ARCHIVE_BATCH_PAUSE', 0.1))
+
+    # Match string user_id values left over from before the ObjectId switch;
+    # turn off once `flask migrate-task-user-ids` has finished.
+    TASK_USER_ID_DUAL_READ = os.getenv('TASK_USER_ID_DUAL_READ', 'true').lower() == 'true'
+
+    # Live task events (GET /api/events); use 'mongo' with more than one worker
+    EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'local')
+    EVENTS_HEARTBEAT_INTERVAL = float(os.getenv('EVENTS_HEARTBEAT_INTERVAL', 15))
+    EVENTS_MAX_CONNECTIONS_PER_USER = int(os.getenv('EVENTS_MAX_CONNECTIONS_PER_USER', 5))
+    EVENTS_HISTORY_SIZE = int(os.getenv('EVENTS_HISTORY_SIZE', 1000))
+    EVENTS_CAPPED_SIZE = int(os.getenv('EVENTS_CAPPED_SIZE', 16 * 1024 * 1024))
+
+    # Write-behind task updates: coalesce per task and flush in bulk.
+    # TASK_WRITE_BEHIND_ACK is 'queued' (reply once buffered) or 'flushed'
+    # (reply once the bulk write carrying the update has been acknowledged).
+    TASK_WRITE_BEHIND = os.getenv('TASK_WRITE_BEHIND', 'false').lower() == 'true'
+    TASK_WRITE_BEHIND_WINDOW = float(os.getenv('TASK_WRITE_BEHIND_WINDOW', 0.05))
+    TASK_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('TASK_WRITE_BEHIND_BATCH_SIZE', 500))
+    TASK_WRITE_BEHIND_ACK = os.getenv('TASK_WRITE_BEHIND_ACK', 'queued')
+    TASK_WRITE_BEHIND_WRITE_CONCERN = os.getenv('TASK_WRITE_BEHIND_WRITE_CONCERN', '1')
+
+    # POST /api/batch
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+
+    # Read-through cache for tasks and first list pages: 'lru' (per worker),
+    # 'redis' (shared between workers, needs the redis package) or 'none'
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'lru')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 60))
+
+    # Due dates: GET /api/tasks/upcoming and `task.due` reminder events
+    TASK_UPCOMING_MAX_LIMIT = int(os.getenv('TASK_UPCOMING_MAX_LIMIT', 200))
+    TASK_REMINDERS = os.getenv('TASK_REMINDERS', 'false').lower() == 'true'
+    TASK_REMINDER_INTERVAL = float(os.getenv('TASK_REMINDER_INTERVAL', 30))
+    TASK_REMINDER_LOOKBACK_HOURS = float(os.getenv('TASK_REMINDER_LOOKBACK_HOURS', 24))
+    TASK_REMINDER_BATCH_SIZE = int(os.getenv('TASK_REMINDER_BATCH_SIZE', 500))
+
+    # Manual task order: rank keys longer than this trigger a rebalance, run on a
+    # background thread unless TASK_RANK_REBALANCE_ASYNC is off
+    TASK_RANK_MAX_LENGTH = int(os.getenv('TASK_RANK_MAX_LENGTH', 24))
+    TASK_RANK_REBALANCE_ASYNC = os.getenv('TASK_RANK_REBALANCE_ASYNC', 'true').lower() == 'true'
+
+    # Revoked access tokens are mirrored in each worker's memory and refreshed
+    # every REVOCATION_SYNC_INTERVAL seconds (0 disables the background sync)
+    REVOCATION_SYNC_INTERVAL = float(os.getenv('REVOCATION_SYNC_INTERVAL', 5))
+
+    # Audit log of task writes and logins, written in batches by a background thread.
+    # AUDIT_OVERFLOW is 'drop' or 'spill' (write inline) once AUDIT_QUEUE_MAX is reached
+    AUDIT_LOG = os.getenv('AUDIT_LOG', 'true').lower() == 'true'
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+    AUDIT_QUEUE_MAX = int(os.getenv('AUDIT_QUEUE_MAX', 10000))
+    AUDIT_OVERFLOW = os.getenv('AUDIT_OVERFLOW', 'drop')
+    AUDIT_RETENTION_DAYS = float(os.getenv('AUDIT_RETENTION_DAYS', 365))
+    AUDIT_PAGE_MAX_LIMIT = int(os.getenv('AUDIT_PAGE_MAX_LIMIT', 200))
+    # GET /api/admin/audit leaves out entries younger than this, so that entries still
+    # being flushed by any worker cannot land on a page that was already read
+    AUDIT_PAGE_DELAY = float(os.getenv('AUDIT_PAGE_DELAY', 5))
+
+    # Shared lists: each worker caches a user's list memberships this many seconds
+    LIST_MEMBERSHIP_TTL = float(os.getenv('LIST_MEMBERSHIP_TTL', 5))
+    LIST_MEMBERSHIP_CACHE_SIZE = int(os.getenv('LIST_MEMBERSHIP_CACHE_SIZE', 10000))
+
+    # Concurrent identical task reads share one database call; a request waits
+    # at most SINGLE_FLIGHT_TIMEOUT seconds for another's read before running its own
+    SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'true').lower() == 'true'
+    SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 2))
+
+    # Serve GET /api/tasks from raw BSON instead of materialized dicts
+    TASK_LIST_FAST_PATH = os.getenv('TASK_LIST_FAST_PATH', 'true').lower() == 'true'
+
+    # GET /healthz
+    HEALTHZ_TIMEOUT = float(os.getenv('HEALTHZ_TIMEOUT', 2))
+
+    # Per-request phase timings (Server-Timing header, JSON access log)
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() == 'true'
+    ACCESS_LOG = os.getenv('ACCESS_LOG', 'false').lower() == 'true'
+
+    # Adaptive concurrency limit and request deadlines
+    CONCURRENCY_LIMIT_ENABLED = os.getenv('CONCURRENCY_LIMIT_ENABLED', 'true').lower() == 'true'
+    CONCURRENCY_INITIAL_LIMIT = int(os.getenv('CONCURRENCY_INITIAL_LIMIT', 64))
+    CONCURRENCY_MIN_LIMIT = int(os.getenv('CONCURRENCY_MIN_LIMIT', 4))
+    CONCURRENCY_MAX_LIMIT = int(os.getenv('CONCURRENCY_MAX_LIMIT', 512))
+    CONCURRENCY_TARGET_LATENCY_MS = float(os.getenv('CONCURRENCY_TARGET_LATENCY_MS', 250))
+    CONCURRENCY_RETRY_AFTER = int(os.getenv('CONCURRENCY_RETRY_AFTER', 1))
+    # Requests a worker can run at once; the limit never exceeds it and is only
+    # applied above 1 (gthread workers). Read from the same variable as gunicorn.conf.py
+    CONCURRENCY_WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', 1))
+    # Share of the limit each request class may use
+    CONCURRENCY_SHARES = {'read': 1.0, 'write': 0.8, 'auth': 0.3}
+    REQUEST_DEADLINE_MS = float(os.getenv('REQUEST_DEADLINE_MS', 10000))
 
 
 class DevelopmentConfig(Config):
@@ -25,6 +135,16 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     MONGO_URI = 'mongodb://localhost:27017/task_manager_test'
+    # Set TEST_STORAGE_ENGINE=mongo to run the suite against a real mongod
+    STORAGE_ENGINE = os.getenv('TEST_STORAGE_ENGINE', 'memory')
+    BCRYPT_ROUNDS = 4
+    TASK_RANK_REBALANCE_ASYNC = False
+    # Tests sync revocations explicitly to stand in for other workers
+    REVOCATION_SYNC_INTERVAL = 0
+    # Tests read the audit log right after flushing it
+    AUDIT_PAGE_DELAY = 0
+    # Run the concurrency limit as a gthread worker would
+    CONCURRENCY_WORKER_THREADS = 8
 
 
 class ProductionConfig(Config):
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from flask import current_app
+from app.storage import storage
+from app.utils.audit import audit
+from app.utils.timing import timed
+
+
+class AuditEntry:
+    """Audit log entries, read through app.storage (written by app.utils.audit)"""
+
+    @staticmethod
+    def watermark():
+        """``_id`` below which the log no longer changes
+
+        Entry ids are taken when an entry is queued, but the entry is only
+        written up to AUDIT_FLUSH_INTERVAL later (more after a failed write).
+        Pages stop below ids from the last AUDIT_PAGE_DELAY seconds and below
+        anything this worker still holds, so paging cannot skip an entry
+        that is written later with a smaller id.
+        """
+        delay = current_app.config['AUDIT_PAGE_DELAY']
+        marks = [audit.oldest_unwritten()]
+        if delay > 0:
+            marks.append(ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=delay)))
+        marks = [mark for mark in marks if mark is not None]
+        return min(marks) if marks else None
+
+    @staticmethod
+    def find(before=None, limit=50, user_id=None, action=None):
+        """One page of entries, newest first, starting below the ``_id`` ``before``
+
+        Entries newer than the watermark are left out of every page.
+        """
+        before = ObjectId(before) if before is not None else None
+        watermark = AuditEntry.watermark()
+        if watermark is not None and (before is None or watermark < before):
+            before = watermark
+        with timed('db'):
+            return storage.audit_log.find(
+                before=before,
+                limit=limit,
+                user_id=ObjectId(user_id) if user_id is not None else None,
+                action=action
+            )
+
+    @staticmethod
+    def to_dict(entry):
+        """Convert an audit entry to a dictionary"""
+        return {
+            'id': str(entry['_id']),
+            'at': entry['at'].isoformat(),
+            'action': entry['action'],
+            'user_id': str(entry['user_id']) if entry.get('user_id') else None,
+            'task_id': str(entry['task_id']) if entry.get('task_id') else None,
+            'ip': entry.get('ip'),
+            'details': entry.get('details') or {}
+        }
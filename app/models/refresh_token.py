@@ -0,0 +1,73 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime
+from bson import ObjectId
+from app.storage import storage
+
+
+class RefreshToken:
+    """Refresh token model, stored through app.storage
+
+    Only a SHA-256 hash of each token is stored. Tokens are single use: every
+    refresh issues a new token in the same family, and presenting a token that
+    was already used revokes the whole family.
+    """
+
+    @staticmethod
+    def _hash(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def issue(user_id, expires_in, family_id=None):
+        """Create a new refresh token and return its plaintext value"""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+
+        storage.refresh_tokens.insert({
+            'token_hash': RefreshToken._hash(token),
+            'user_id': ObjectId(user_id),
+            'family_id': family_id or uuid.uuid4().hex,
+            'created_at': now,
+            'expires_at': now + expires_in,
+            'used_at': None,
+            'revoked': False
+        })
+
+        return token
+
+    @staticmethod
+    def consume(token):
+        """Mark a refresh token as used and return its document
+
+        Returns None if the token is unknown, expired, revoked or already used.
+        Reuse of a spent token means it has leaked, so its family is revoked.
+        """
+        token_hash = RefreshToken._hash(token)
+        now = datetime.utcnow()
+
+        document = storage.refresh_tokens.consume(token_hash, now)
+
+        if document is None:
+            spent = storage.refresh_tokens.get(token_hash)
+            if spent is not None and spent['used_at'] is not None:
+                RefreshToken.revoke_family(spent['family_id'])
+
+        return document
+
+    @staticmethod
+    def revoke_family(family_id):
+        """Revoke every token descended from the same login"""
+        storage.refresh_tokens.revoke_family(family_id)
+
+    @staticmethod
+    def revoke(token, user_id):
+        """Revoke a refresh token of ``user_id`` together with its family
+
+        Returns False if the token is unknown or belongs to someone else.
+        """
+        document = storage.refresh_tokens.get(RefreshToken._hash(token))
+        if document is None or document['user_id'] != ObjectId(user_id):
+            return False
+        RefreshToken.revoke_family(document['family_id'])
+        return True
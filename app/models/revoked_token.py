@@ -0,0 +1,33 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.storage import storage
+from app.utils.revocations import revocations
+
+
+class RevokedToken:
+    """Revoked access tokens, stored through app.storage
+
+    A revocation is kept only until the token it names would have expired,
+    so the collection stays as small as the set of live revoked tokens.
+    """
+
+    @staticmethod
+    def revoke(jti, user_id, expires_at):
+        """Revoke the access token with id ``jti`` until ``expires_at``"""
+        try:
+            storage.revoked_tokens.insert({
+                'jti': jti,
+                'user_id': ObjectId(user_id),
+                'expires_at': expires_at,
+                'revoked_at': datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            # Another worker's upsert of the same jti won the race; the token is revoked
+            pass
+        revocations.add(jti, expires_at)
+
+    @staticmethod
+    def revoked_since(after, now):
+        """Revocations made at or after ``after`` (all if None) that are still live"""
+        return storage.revoked_tokens.revoked_since(after, now)
@@ -1,73 +1,829 @@
+import heapq
+import json
+import time
 from datetime import datetime
+from itertools import islice
 from bson import ObjectId
-from app.extensions import mongo
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from flask import current_app
+from app.models.task_list import WRITE_ROLES
+from app.storage import storage
+from app.utils.audit import audit
+from app.utils.cache import cache
+from app.utils.events import events
+from app.utils.memberships import memberships
+from app.utils.ranks import key_between, rebalancer, spread_keys
+from app.utils.singleflight import singleflight
+from app.utils.timing import timed
+from app.utils.write_behind import write_behind
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+_encode_string = json.JSONEncoder().encode
+_encode_compact = json.JSONEncoder(separators=(',', ':')).encode
+
+# Task priorities run from 0 (lowest, the default) to 3 (highest)
+MIN_PRIORITY = 0
+MAX_PRIORITY = 3
+
+# GET /tasks/upcoming looks at most a year ahead
+MAX_UPCOMING_HOURS = 24 * 365
+
+MAX_TAGS = 20
+MAX_TAG_LENGTH = 50
+
+# Subtasks nest at most this many levels below a top-level task
+MAX_TASK_DEPTH = 10
+
+# Tries at writing a rank before a move gives up on a manual order that keeps changing
+MAX_RANK_ATTEMPTS = 5
+
+
+class ConflictError(Exception):
+    """A concurrent write got in the way; the request can be retried"""
+
+
+class TaskRecord:
+    """Compact read-only task used to serve list pages"""
+
+    __slots__ = ('id', 'title', 'description', 'completed', 'archived', 'list_id',
+                 'parent_id', 'priority', 'due_at', 'tags', 'created_at', 'updated_at')
+
+    # Only the fields a list response needs are fetched from the server
+    PROJECTION = {
+        'title': 1,
+        'description': 1,
+        'completed': 1,
+        'archived_at': 1,
+        'list_id': 1,
+        'parent_id': 1,
+        'priority': 1,
+        'due_at': 1,
+        'tags': 1,
+        'created_at': 1,
+        'updated_at': 1
+    }
+
+    def __init__(self, document):
+        # Works on RawBSONDocument, which decodes each field only when accessed
+        self.id = str(document['_id'])
+        self.title = document['title']
+        self.description = document['description']
+        self.completed = document['completed']
+        self.archived = 'archived_at' in document
+        self.list_id = document.get('list_id')
+        self.parent_id = document.get('parent_id')
+        self.priority = document.get('priority', MIN_PRIORITY)
+        self.due_at = document.get('due_at')
+        self.tags = document.get('tags', [])
+        self.created_at = document['created_at']
+        self.updated_at = document['updated_at']
+
+    def to_json(self):
+        """Encode the record exactly as Task.to_dict would serialize"""
+        due_at = f'"{self.due_at.isoformat()}"' if self.due_at else 'null'
+        list_id = f'"{self.list_id}"' if self.list_id else 'null'
+        parent_id = f'"{self.parent_id}"' if self.parent_id else 'null'
+        return (
+            f'{{"archived":{"true" if self.archived else "false"},'
+            f'"completed":{"true" if self.completed else "false"},'
+            f'"created_at":"{self.created_at.isoformat()}",'
+            f'"description":{_encode_string(self.description)},'
+            f'"due_at":{due_at},'
+            f'"id":"{self.id}",'
+            f'"list_id":{list_id},'
+            f'"parent_id":{parent_id},'
+            f'"priority":{int(self.priority)},'
+            f'"tags":{_encode_compact(list(self.tags))},'
+            f'"title":{_encode_string(self.title)},'
+            f'"updated_at":"{self.updated_at.isoformat()}"}}'
+        )
 
 
 class Task:
-    """Task model for MongoDB"""
+    """Task model, stored through app.storage"""
+
+    @staticmethod
+    def _owners(user_id, write=False, list_id=None):
+        """``user_id`` values of the tasks ObjectId ``user_id`` may access
+
+        That is the user's own tasks plus those of every shared list they are
+        a member of (only lists they can edit with ``write``). Tasks written
+        before ``user_id`` was stored as an ObjectId hold the string form;
+        while TASK_USER_ID_DUAL_READ is on both are matched. With ``list_id``
+        only that list is matched, or nothing if the user may not access it.
+        """
+        roles = memberships.lists_for(user_id)
+        if list_id is not None:
+            role = roles.get(ObjectId(list_id)) if ObjectId.is_valid(list_id) else None
+            if role is None or (write and role not in WRITE_ROLES):
+                return []
+            return [ObjectId(list_id)]
+
+        user_id = ObjectId(user_id)
+        owners = [user_id, str(user_id)] if current_app.config['TASK_USER_ID_DUAL_READ'] else [user_id]
+        owners.extend(shared for shared, role in roles.items() if not write or role in WRITE_ROLES)
+        return owners
 
     @staticmethod
-    def create_task(user_id, title, description):
-        """Create a new task"""
+    def _rank_owners(user_id, owner):
+        """``user_id`` values sharing the manual order of a task stored under ``owner``
+
+        Each shared list has an order of its own, and so do the user's own
+        tasks (the string form included while TASK_USER_ID_DUAL_READ is on).
+        """
+        owner = ObjectId(owner)
+        if owner != ObjectId(user_id):
+            return [owner]
+        return [owner, str(owner)] if current_app.config['TASK_USER_ID_DUAL_READ'] else [owner]
+
+    @staticmethod
+    def _page_key(kind, user_id, completed, per_page, tags, list_id=None):
+        """Cache key of a first list page, covering the user's shared lists"""
+        if list_id is not None:
+            kind = f'{kind}:{list_id}'
+        return cache.page_key(kind, user_id, completed, per_page, tags,
+                              memberships.lists_for(user_id))
+
+    @staticmethod
+    def _shared_read(name, owners, args, read):
+        """Run ``read`` once for concurrent identical reads over ``owners``
+
+        Callers of the same query get the same result objects, so results
+        are treated as read-only.
+        """
+        scopes = {str(owner) for owner in owners}
+        return singleflight.do((name, tuple(sorted(scopes))) + args, scopes, read)
+
+    @staticmethod
+    def _invalidate(task_id, user_id):
+        """Drop a cached task whose owner is unknown: the user or any list they edit"""
+        cache.invalidate_task(task_id, user_id)
+        for list_id, role in memberships.lists_for(user_id).items():
+            if role in WRITE_ROLES:
+                cache.invalidate_user(list_id)
+
+    @staticmethod
+    def _publish(user_id, owner, event_type, data):
+        """Publish a task event to everyone who sees tasks stored under ``owner``
+
+        That is ``user_id`` for their own tasks. Nobody subscribes to a list
+        id, so events of a list's tasks go to each member of the list. With
+        ``user_id`` None the owner is looked up as a list first.
+        """
+        if str(owner) == str(user_id):
+            recipients = [user_id]
+        else:
+            with timed('db'):
+                members = storage.lists.members(ObjectId(owner))
+            recipients = [member['user_id'] for member in members] or [owner]
+        for recipient in recipients:
+            events.publish(recipient, event_type, data)
+
+    @staticmethod
+    def create_task(user_id, title, description, due_at=None, priority=MIN_PRIORITY,
+                    tags=None, parent_id=None, list_id=None):
+        """Create a new task, first in the manual order of the user or its list
+
+        With ``parent_id`` the task is a subtask of that task; raises
+        ValueError if the parent does not exist or is nested too deeply.
+        With ``list_id`` it goes into that shared list, which the user must
+        be able to edit. Subtasks always live in the list of their parent.
+        """
+        owner = ObjectId(user_id)
+        if list_id is not None:
+            owners = Task._owners(user_id, write=True, list_id=list_id)
+            if not owners:
+                raise ValueError('List not found')
+            owner = owners[0]
+
+        parent = Task._parent(parent_id, user_id)
+        if parent is not None:
+            if list_id is not None and ObjectId(parent['user_id']) != owner:
+                raise ValueError('Subtasks belong to the list of their parent')
+            owner = ObjectId(parent['user_id'])
+        ancestors = Task._ancestors_below(parent)
+
+        with timed('db'):
+            first = storage.tasks.next_rank(Task._rank_owners(user_id, owner), None)
+
         task_data = {
-            'user_id': user_id,
+            'user_id': owner,
+            'list_id': owner if owner != ObjectId(user_id) else None,
+            'created_by': ObjectId(user_id),
             'title': title,
             'description': description,
             'completed': False,
+            'priority': priority,
+            'due_at': due_at,
+            'tags': list(tags or []),
+            'parent_id': ancestors[-1] if ancestors else None,
+            'ancestors': ancestors,
+            'rank': key_between(None, first.get('rank') if first else None),
+            'reminder_sent_at': None,
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
 
-        result = mongo.db.tasks.insert_one(task_data)
-        return result.inserted_id
+        with timed('db'):
+            task_id = storage.tasks.insert(task_data)
+        cache.invalidate_user(owner)
+        Task._publish(user_id, owner, 'task.created', Task.to_dict(task_data))
+        audit.record('task.created', user_id, task_id)
+        return task_id
 
     @staticmethod
-    def find_all(user_id, page=1, per_page=10, completed=None):
-        """Find all tasks for a user with pagination and filtering"""
-        query = {'user_id': user_id}
+    def _parent(parent_id, user_id):
+        """The task a new subtask goes under, None for top level
 
-        if completed is not None:
-            query['completed'] = completed
+        Raises ValueError unless the user can edit ``parent_id``.
+        """
+        if parent_id is None:
+            return None
+        if not ObjectId.is_valid(parent_id):
+            raise ValueError('parent_id must be a task ID')
 
+        with timed('db'):
+            parent = storage.tasks.get(ObjectId(parent_id), Task._owners(user_id, write=True),
+                                       {'ancestors': 1, 'user_id': 1})
+        if parent is None:
+            raise ValueError('Parent task not found')
+        return parent
+
+    @staticmethod
+    def _ancestors_below(parent):
+        """The ``ancestors`` of a task placed under ``parent`` (None: top level)"""
+        if parent is None:
+            return []
+
+        ancestors = list(parent.get('ancestors') or []) + [parent['_id']]
+        if len(ancestors) > MAX_TASK_DEPTH:
+            raise ValueError(f'Subtasks can be nested at most {MAX_TASK_DEPTH} levels deep')
+        return ancestors
+
+    @staticmethod
+    def find_all(user_id, page=1, per_page=10, completed=None, include_archived=False,
+                 tags=None, sort='created_at', list_id=None):
+        """Find all tasks for a user with pagination and filtering
+
+        Covers the user's own tasks and every list they share, in one query,
+        or only the tasks of ``list_id``. ``sort`` is 'created_at' (newest
+        first) or 'rank' (manual order); archived tasks are always merged in
+        by created_at.
+        """
+        owners = Task._owners(user_id, list_id=list_id)
         skip = (page - 1) * per_page
+        query = (completed, skip, per_page, tuple(sorted(tags)) if tags else None)
+
+        if include_archived:
+            return Task._shared_read(
+                'find_all:archived', owners, query,
+                lambda: Task._find_all_with_archive(owners, completed, skip, per_page, tags))
+
+        kind = f'docs:{sort}'
+        page_key = Task._page_key(kind, user_id, completed, per_page, tags, list_id) \
+            if page == 1 else None
+        if page_key is not None:
+            cached = cache.get(page_key)
+            if cached is not None:
+                return cached['tasks'], cached['total']
+
+        def read():
+            with timed('db'):
+                tasks = storage.tasks.find_page(owners, completed, skip, per_page, tags=tags,
+                                                sort=sort)
+                total = storage.tasks.count(owners, completed, tags)
+
+            if page_key is not None:
+                cache.set(page_key, {'tasks': tasks, 'total': total})
+            return tasks, total
+
+        return Task._shared_read(kind, owners, query, read)
+
+    @staticmethod
+    def find_records(user_id, page=1, per_page=10, completed=None, tags=None,
+                     sort='created_at', list_id=None):
+        """Like find_all, but decode raw BSON straight into TaskRecord objects"""
+        owners = Task._owners(user_id, list_id=list_id)
+        skip = (page - 1) * per_page
+        query = (completed, skip, per_page, tuple(sorted(tags)) if tags else None)
+
+        kind = f'raw:{sort}'
+        page_key = Task._page_key(kind, user_id, completed, per_page, tags, list_id) \
+            if page == 1 else None
+        if page_key is not None:
+            cached = cache.get(page_key, RAW_CODEC_OPTIONS)
+            if cached is not None:
+                return [TaskRecord(document) for document in cached['tasks']], cached['total']
+
+        def read():
+            with timed('db'):
+                documents = storage.tasks.find_page(owners, completed, skip, per_page,
+                                                    fields=TaskRecord.PROJECTION,
+                                                    codec_options=RAW_CODEC_OPTIONS,
+                                                    tags=tags, sort=sort)
+                total = storage.tasks.count(owners, completed, tags)
+
+            if page_key is not None:
+                # Raw documents are stored as-is, without being decoded
+                cache.set(page_key, {'tasks': documents, 'total': total})
+            return documents, total
+
+        documents, total = Task._shared_read(kind, owners, query, read)
+        return [TaskRecord(document) for document in documents], total
+
+    @staticmethod
+    def encode_page(records, total, page, per_page):
+        """Build the JSON body of a task list page without intermediate dicts"""
+        parts = ['{"page":', str(page), ',"per_page":', str(per_page), ',"tasks":[']
+        parts.append(','.join([record.to_json() for record in records]))
+        parts.extend([
+            '],"total":', str(total),
+            ',"total_pages":', str((total + per_page - 1) // per_page), '}'
+        ])
+        return ''.join(parts)
+
+    @staticmethod
+    def _find_all_with_archive(owners, completed, skip, per_page, tags=None):
+        """Merge a page from the live and archive collections by created_at"""
+        # Neither collection can contribute more than skip + per_page rows
+        # to the requested page, so each side is bounded by that window.
+        window = skip + per_page
+        with timed('db'):
+            live = storage.tasks.find_page(owners, completed, 0, window, tags=tags)
+            archived = storage.tasks_archive.find_page(owners, completed, 0, window, tags=tags)
 
-        tasks = mongo.db.tasks.find(query).sort(
-            'created_at', -1
-        ).skip(skip).limit(per_page)
+            merged = heapq.merge(live, archived, key=lambda t: t['created_at'], reverse=True)
+            tasks = list(islice(merged, skip, window))
 
-        total = mongo.db.tasks.count_documents(query)
+            total = (storage.tasks.count(owners, completed, tags) +
+                     storage.tasks_archive.count(owners, completed, tags))
 
-        return list(tasks), total
+        return tasks, total
 
     @staticmethod
-    def find_by_id(task_id, user_id):
+    def find_by_id(task_id, user_id, include_archived=False):
         """Find task by ID and user ID"""
-        return mongo.db.tasks.find_one({
-            '_id': ObjectId(task_id),
-            'user_id': user_id
-        })
+        task_id = ObjectId(task_id)
+        owners = Task._owners(user_id)
+
+        key = cache.task_key(task_id)
+        cached = cache.get(key)
+        if cached is not None:
+            task = cached if cached['user_id'] in owners else None
+        else:
+            def read():
+                with timed('db'):
+                    found = storage.tasks.get(task_id, owners)
+                    if found is not None:
+                        cache.set(key, found)
+                    elif include_archived:
+                        found = storage.tasks_archive.get(task_id, owners)
+                return found
+
+            task = Task._shared_read('find_by_id', owners, (task_id, include_archived), read)
+
+        if task is not None and write_behind.enabled():
+            # Read-your-writes for updates still sitting in the queue
+            pending = write_behind.pending(task_id)
+            if pending:
+                task = {**task, **pending}
+
+        return task
 
     @staticmethod
     def update_task(task_id, user_id, update_data):
         """Update a task"""
         update_data['updated_at'] = datetime.utcnow()
+        if 'due_at' in update_data:
+            # A new due date gets a new reminder
+            update_data['reminder_sent_at'] = None
 
-        result = mongo.db.tasks.update_one(
-            {'_id': ObjectId(task_id), 'user_id': user_id},
-            {'$set': update_data}
-        )
+        owners = Task._owners(user_id, write=True)
+        # Without a list to edit, the user can only be changing their own task
+        shared = any(role in WRITE_ROLES for role in memberships.lists_for(user_id).values())
+
+        if write_behind.enabled() or shared:
+            with timed('db'):
+                task = storage.tasks.get(ObjectId(task_id), owners, {'user_id': 1})
+            if not task:
+                return False
+            owner = task['user_id']
+        else:
+            owner = user_id
+
+        if write_behind.enabled():
+            write_behind.enqueue(task_id, update_data, owner=owner)
+            Task._publish(user_id, owner, 'task.updated', Task._changes_dict(task_id, update_data))
+            audit.record('task.updated', user_id, task_id, fields=sorted(update_data))
+            return True
+
+        with timed('db'):
+            modified = storage.tasks.update(ObjectId(task_id), owners, update_data)
 
-        return result.modified_count > 0
+        if modified:
+            Task._invalidate(task_id, user_id)
+            Task._publish(user_id, owner, 'task.updated', Task._changes_dict(task_id, update_data))
+            audit.record('task.updated', user_id, task_id, fields=sorted(update_data))
+            return True
+        return False
+
+    @staticmethod
+    def set_parent(task_id, user_id, parent_id):
+        """Move a task, with all of its subtasks, under ``parent_id`` (None: top level)
+
+        The subtree is read once to check the nesting depth, then the task and
+        its descendants are rewritten. Returns False if the task does not
+        exist; raises ValueError for an invalid parent, including one in
+        another list, and ConflictError if the task was moved meanwhile.
+        """
+        task_id = ObjectId(task_id)
+        owners = Task._owners(user_id, write=True)
+
+        with timed('db'):
+            subtree = storage.tasks.subtree(task_id, owners, {'ancestors': 1, 'user_id': 1})
+        if not subtree:
+            return False
+
+        parent = Task._parent(parent_id, user_id)
+        if parent is not None and str(parent['user_id']) != str(subtree[0]['user_id']):
+            raise ValueError('Subtasks belong to the list of their parent')
+        ancestors = Task._ancestors_below(parent)
+        if task_id in ancestors:
+            raise ValueError('A task cannot be moved below itself')
+
+        old_ancestors = subtree[0].get('ancestors')
+        height = max(len(task.get('ancestors') or ()) for task in subtree) - len(old_ancestors or ())
+        if len(ancestors) + height > MAX_TASK_DEPTH:
+            raise ValueError(f'Subtasks can be nested at most {MAX_TASK_DEPTH} levels deep')
+
+        fields = {'parent_id': ancestors[-1] if ancestors else None, 'updated_at': datetime.utcnow()}
+        with timed('db'):
+            moved = storage.tasks.move_subtree(task_id, owners, old_ancestors, ancestors, fields)
+        if not moved:
+            raise ConflictError('The task was moved or deleted meanwhile; retry the update')
+
+        for task in subtree:
+            cache.invalidate_task(task['_id'], task['user_id'])
+        Task._publish(user_id, subtree[0]['user_id'], 'task.updated', Task._changes_dict(task_id, fields))
+        audit.record('task.updated', user_id, task_id, fields=sorted(fields))
+        return True
+
+    @staticmethod
+    def find_subtree(task_id, user_id):
+        """Return a task with its nested ``subtasks`` and completion ``rollup``
+
+        The whole subtree comes from one query on the ancestors index; the tree
+        and the rollups are assembled in memory. Returns None if not found.
+        """
+        with timed('db'):
+            tasks = storage.tasks.subtree(ObjectId(task_id), Task._owners(user_id))
+        if not tasks:
+            return None
+
+        children = {}
+        for task in tasks[1:]:
+            children.setdefault(task.get('parent_id'), []).append(task)
+
+        def build(task):
+            node = Task.to_dict(task)
+            below = sorted(children.get(task['_id'], []),
+                           key=lambda t: (t.get('rank') or '', t['created_at']))
+            node['subtasks'] = [build(child) for child in below]
+            node['rollup'] = {
+                'total': sum(1 + sub['rollup']['total'] for sub in node['subtasks']),
+                'completed': sum(sub['completed'] + sub['rollup']['completed']
+                                 for sub in node['subtasks'])
+            }
+            return node
+
+        with timed('serialize'):
+            return build(tasks[0])
 
     @staticmethod
     def delete_task(task_id, user_id):
-        """Delete a task"""
-        result = mongo.db.tasks.delete_one({
-            '_id': ObjectId(task_id),
-            'user_id': user_id
+        """Delete a task together with its subtasks"""
+        with timed('db'):
+            subtree = storage.tasks.subtree(ObjectId(task_id), Task._owners(user_id, write=True),
+                                            {'user_id': 1})
+            deleted = storage.tasks.delete_ids([task['_id'] for task in subtree]) if subtree else 0
+
+        if deleted:
+            for task in subtree:
+                cache.invalidate_task(task['_id'], task['user_id'])
+                Task._publish(user_id, task['user_id'], 'task.deleted', {'id': str(task['_id'])})
+                audit.record('task.deleted', user_id, task['_id'])
+            return True
+        return False
+
+    @staticmethod
+    def move_task(task_id, user_id, after_id=None):
+        """Place a task right after ``after_id`` in the manual order (None: first)
+
+        Only the moved task is written: it gets a rank key between its new
+        neighbours. Keys that grow past TASK_RANK_MAX_LENGTH queue a background
+        rebalance. Each list has its own order, so ``after_id`` must be in the
+        same list (or both among the user's own tasks), else ValueError.
+        Returns False if either task does not exist; raises ConflictError if
+        the order kept changing under the move, or if a neighbour has not
+        been ranked yet.
+        """
+        task_id = ObjectId(task_id)
+        after_id = ObjectId(after_id) if after_id is not None else None
+        if after_id == task_id:
+            raise ValueError('A task cannot be moved after itself')
+
+        with timed('db'):
+            task = storage.tasks.get(task_id, Task._owners(user_id, write=True), {'user_id': 1})
+            anchor = storage.tasks.get(after_id, Task._owners(user_id), {'user_id': 1}) \
+                if after_id is not None else None
+        if task is None or (after_id is not None and anchor is None):
+            return False
+        owners = Task._rank_owners(user_id, task['user_id'])
+        if anchor is not None and anchor['user_id'] not in owners:
+            raise ValueError('Tasks can only be moved within their own list')
+
+        rank = Task._place(task_id, owners, after_id)
+        if rank is False:
+            # Tasks created before manual ordering are ranked by `flask rank-tasks`
+            raise ConflictError('Tasks created before manual ordering cannot be moved '
+                                'until they are ranked')
+        if not rank:
+            return False
+
+        cache.invalidate_task(task_id, task['user_id'])
+        Task._publish(user_id, task['user_id'], 'task.moved', {
+            'id': str(task_id),
+            'after': str(after_id) if after_id is not None else None
         })
 
-        return result.deleted_count > 0
+        if len(rank) > current_app.config['TASK_RANK_MAX_LENGTH']:
+            rebalancer.request(user_id, task['user_id'])
+        return True
+
+    @staticmethod
+    def _neighbours(task_id, owners, after_id):
+        """Rank of ``after_id`` and the ``{'_id', 'rank'}`` of the task following it
+
+        The task being placed is skipped. Returns None if ``after_id`` is gone.
+        """
+        low = None
+        if after_id is not None:
+            anchor = storage.tasks.get(after_id, owners, {'rank': 1})
+            if anchor is None:
+                return None
+            low = anchor.get('rank')
+        return low, storage.tasks.next_rank(owners, low, exclude_id=task_id)
+
+    @staticmethod
+    def _place(task_id, owners, after_id):
+        """Rank a task right after ``after_id`` (None: first) in the order of ``owners``
+
+        The key is only written if the task still has the rank it was read
+        with, and the neighbours it was made from are read again afterwards:
+        a rebalance that respaced them in between leaves the key in the old
+        key space, so the placement is redone. Returns the new key, None if
+        either task is gone, or False if a neighbour has no rank yet.
+        """
+        for _ in range(MAX_RANK_ATTEMPTS):
+            with timed('db'):
+                task = storage.tasks.get(task_id, owners, {'rank': 1})
+                placement = Task._neighbours(task_id, owners, after_id) if task else None
+                if placement is None:
+                    return None
+
+                low, following = placement
+                if (after_id is not None and low is None) or \
+                        (following is not None and following.get('rank') is None):
+                    return False
+
+                rank = key_between(low, following['rank'] if following else None)
+                written = rank == task.get('rank') or \
+                    storage.tasks.set_rank(task_id, task.get('rank'), rank, after_id)
+                if written and Task._neighbours(task_id, owners, after_id) == placement:
+                    return rank
+
+        raise ConflictError('The manual order changed while moving the task; retry the move')
+
+    @staticmethod
+    def rebalance_ranks(user_id, owner=None):
+        """Give every task in one manual order a short, evenly spaced rank
+
+        The order is that of ``owner``: a list the user can edit, or by
+        default the user's own tasks. Each key is only replaced while the
+        task still has the rank that was read. Tasks moved or created while
+        this runs may hold a key from the old key space, so afterwards they
+        are placed again after the task they were moved after. Returns the
+        number of tasks whose rank changed; 0 for a list the user cannot edit.
+        """
+        owner = ObjectId(user_id if owner is None else owner)
+        if owner not in Task._owners(user_id, write=True):
+            return 0
+        changed = Task._respace(Task._rank_owners(user_id, owner))
+        cache.invalidate_user(owner)
+        return changed
+
+    @staticmethod
+    def _respace(owners):
+        """Rewrite the ranks of the order shared by ``owners``; see rebalance_ranks"""
+        with timed('db'):
+            order = storage.tasks.rank_order(owners)
+            planned = {task['_id']: rank for task, rank in zip(order, spread_keys(len(order)))}
+            changes = [(task['_id'], task.get('rank'), planned[task['_id']])
+                       for task in order if task.get('rank') != planned[task['_id']]]
+            changed = storage.tasks.replace_ranks(changes)
+
+            raced = [task['_id'] for task in storage.tasks.rank_order(owners)
+                     if task.get('rank') != planned.get(task['_id'])]
+
+        for task_id in raced:
+            with timed('db'):
+                task = storage.tasks.get(task_id, owners, {'rank_after': 1})
+            if task is not None:
+                Task._place(task_id, owners, task.get('rank_after'))
+        return changed
+
+    @staticmethod
+    def rank_unranked(batch_size=500, pause=0.0):
+        """Rank tasks stored before manual ordering existed, one order at a time.
+
+        Walks unranked tasks in ``_id`` order and respaces the order of each
+        owner found once, which keeps the unranked tasks where they were
+        listed: first, newest first. Returns the number of orders respaced
+        and of ranks rewritten.
+        """
+        done = set()
+        rewritten = 0
+        last_id = None
+
+        while True:
+            batch = storage.tasks.find_unranked(last_id, batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+
+            for task in batch:
+                owner = task['user_id']
+                if str(owner) in done:
+                    continue
+                done.add(str(owner))
+                # Owners that are not ObjectIds cannot be read by anyone; rank them alone
+                owners = Task._rank_owners(owner, owner) if ObjectId.is_valid(owner) else [owner]
+                rewritten += Task._respace(owners)
+                cache.invalidate_user(owner)
+
+            if len(batch) < batch_size:
+                break
+
+            if pause:
+                time.sleep(pause)
+
+        return len(done), rewritten
+
+    @staticmethod
+    def tag_counts(user_id, completed=None, tags=None):
+        """Count the live tasks a user can see per tag, most used first
+
+        With ``tags``, only tasks carrying all of them are counted, which
+        gives the facets of the current selection.
+        """
+        key = cache.facets_key(user_id, completed, tags, memberships.lists_for(user_id))
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        with timed('db'):
+            counts = storage.tasks.tag_counts(Task._owners(user_id), completed, tags)
+        facets = [{'tag': tag, 'count': count}
+                  for tag, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+
+        if key is not None:
+            cache.set(key, facets)
+        return facets
+
+    @staticmethod
+    def find_upcoming(user_id, until, limit=50):
+        """Open tasks due by ``until``, overdue ones first"""
+        with timed('db'):
+            return storage.tasks.find_due(Task._owners(user_id), until, limit)
+
+    @staticmethod
+    def send_due_reminders(now, lookback, batch_size=500):
+        """Publish ``task.due`` for open tasks that came due in ``(now - lookback, now]``
+
+        Each reminder is claimed with a conditional update first, so several
+        workers can run this at once and every task is announced only once.
+        Returns the number of reminders sent.
+        """
+        sent = 0
+
+        while True:
+            batch = storage.tasks.find_due_reminders(now - lookback, now, batch_size)
+            for task in batch:
+                # Claimed tasks drop out of the next query, whoever claimed them
+                if storage.tasks.claim_reminder(task['_id'], now):
+                    Task._publish(None, task['user_id'], 'task.due', Task.to_dict(task))
+                    sent += 1
+
+            if len(batch) < batch_size:
+                return sent
+
+    @staticmethod
+    def next_due_at(after):
+        """When the next reminder falls due, or None if nothing is scheduled"""
+        return storage.tasks.next_due_at(after)
+
+    @staticmethod
+    def archive_completed(older_than, batch_size=500, pause=0.0):
+        """Move tasks completed before ``older_than`` into the archive collection.
+
+        Works in batches of ``batch_size`` documents, sleeping ``pause`` seconds
+        between batches so the hot collection is not starved of I/O. Returns the
+        number of tasks archived.
+        """
+        archived = 0
+
+        while True:
+            batch = storage.tasks.find_completed_before(older_than, batch_size)
+            if not batch:
+                break
+
+            archived_at = datetime.utcnow()
+            for task in batch:
+                task['archived_at'] = archived_at
+
+            # A previous run may have died between insert and delete; tasks
+            # already in the archive are skipped.
+            storage.tasks_archive.insert_many(batch)
+
+            ids = [task['_id'] for task in batch]
+            deleted = storage.tasks.delete_completed(ids, older_than)
+            archived += deleted
+
+            for task in batch:
+                cache.invalidate_task(task['_id'], task['user_id'])
+
+            if deleted < len(ids):
+                # Tasks reopened while the batch was in flight stay live,
+                # so drop their archive copies again.
+                storage.tasks_archive.delete_ids(storage.tasks.existing_ids(ids))
+
+            if len(batch) < batch_size:
+                break
+
+            if pause:
+                time.sleep(pause)
+
+        return archived
+
+    @staticmethod
+    def migrate_user_ids(collection='tasks', batch_size=500, pause=0.0):
+        """Rewrite string ``user_id`` values as ObjectIds, one batch at a time.
+
+        Walks the collection in ``_id`` order so the migration can run while
+        the API is serving traffic. Returns ``(migrated, skipped)``, where
+        skipped counts values that are not valid ObjectId strings.
+        """
+        tasks = storage.task_store(collection)
+        migrated = skipped = 0
+        last_id = None
+
+        while True:
+            batch = tasks.find_string_owners(last_id, batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+
+            changes = []
+            for task in batch:
+                if ObjectId.is_valid(task['user_id']):
+                    changes.append((task['_id'], task['user_id'], ObjectId(task['user_id'])))
+                else:
+                    skipped += 1
+
+            migrated += tasks.replace_owners(changes)
+
+            if len(batch) < batch_size:
+                break
+
+            if pause:
+                time.sleep(pause)
+
+        return migrated, skipped
+
+    @staticmethod
+    def _changes_dict(task_id, update_data):
+        """Convert a partial update into a JSON-friendly event payload"""
+        changes = {'id': str(task_id)}
+        for field, value in update_data.items():
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, ObjectId):
+                value = str(value)
+            changes[field] = value
+        return changes
 
     @staticmethod
     def to_dict(task):
@@ -78,7 +834,19 @@ class Task:
                 'title': task['title'],
                 'description': task['description'],
                 'completed': task['completed'],
+                'archived': 'archived_at' in task,
+                'list_id': str(task['list_id']) if task.get('list_id') else None,
+                'parent_id': str(task['parent_id']) if task.get('parent_id') else None,
+                'priority': task.get('priority', MIN_PRIORITY),
+                'due_at': task['due_at'].isoformat() if task.get('due_at') else None,
+                'tags': list(task.get('tags', [])),
                 'created_at': task['created_at'].isoformat(),
                 'updated_at': task['updated_at'].isoformat()
             }
         return None
+
+
+# Cached documents and pages go stale once buffered updates reach the database
+write_behind.add_flush_callback(cache.invalidate_task)
+# Reads already in flight go stale with them; later requests start their own
+cache.add_invalidation_callback(singleflight.forget)
@@ -0,0 +1,136 @@
+from datetime import datetime
+from bson import ObjectId
+from app.models.user import User
+from app.storage import storage
+from app.utils.cache import cache
+from app.utils.memberships import memberships
+from app.utils.timing import timed
+
+# Owners manage members, editors change tasks, viewers only read
+ROLES = ('owner', 'editor', 'viewer')
+WRITE_ROLES = ('owner', 'editor')
+
+
+class TaskList:
+    """Task list shared between users, stored through app.storage
+
+    Tasks of a list are stored with the list's id as their ``user_id``, so
+    every owner-scoped task query and index serves shared lists unchanged.
+    """
+
+    @staticmethod
+    def create_list(user_id, name):
+        """Create a list with ``user_id`` as its owner and return it as a dict"""
+        now = datetime.utcnow()
+        task_list = {'name': name, 'created_by': ObjectId(user_id), 'created_at': now}
+        with timed('db'):
+            storage.lists.insert(task_list)
+            storage.lists.set_member(task_list['_id'], ObjectId(user_id), 'owner', now)
+        memberships.invalidate(user_id)
+        return TaskList.to_dict(task_list, 'owner')
+
+    @staticmethod
+    def role_of(list_id, user_id):
+        """The role of ``user_id`` in a list, or None if not a member"""
+        if not ObjectId.is_valid(list_id):
+            return None
+        return memberships.lists_for(user_id).get(ObjectId(list_id))
+
+    @staticmethod
+    def find_for_user(user_id):
+        """Every list ``user_id`` belongs to, with their role, by name"""
+        roles = memberships.lists_for(user_id)
+        with timed('db'):
+            lists = storage.lists.find(roles)
+        return sorted((TaskList.to_dict(task_list, roles[task_list['_id']]) for task_list in lists),
+                      key=lambda task_list: (task_list['name'].lower(), task_list['id']))
+
+    @staticmethod
+    def members(list_id):
+        """The members of a list with their usernames"""
+        with timed('db'):
+            members = storage.lists.members(ObjectId(list_id))
+        result = []
+        for member in members:
+            user = User.find_by_id(member['user_id'])
+            result.append({
+                'user_id': str(member['user_id']),
+                'username': user['username'] if user else None,
+                'role': member['role'],
+                'added_at': member['added_at'].isoformat()
+            })
+        return sorted(result, key=lambda member: (ROLES.index(member['role']), member['added_at']))
+
+    @staticmethod
+    def set_member(list_id, user_id, username, role):
+        """Add ``username`` to a list or change their role; only owners may
+
+        Returns the member's user id, or None if there is no such user.
+        Raises PermissionError for non-owners and ValueError for a bad role
+        or an owner changing their own role.
+        """
+        if TaskList.role_of(list_id, user_id) != 'owner':
+            raise PermissionError('Only list owners can manage members')
+        if role not in ROLES:
+            raise ValueError(f"role must be one of {', '.join(ROLES)}")
+
+        member = User.find_by_username(username)
+        if member is None:
+            return None
+        if member['_id'] == ObjectId(user_id):
+            raise ValueError('Owners cannot change their own role')
+
+        with timed('db'):
+            storage.lists.set_member(ObjectId(list_id), member['_id'], role, datetime.utcnow())
+        memberships.invalidate(member['_id'])
+        cache.invalidate_user(member['_id'])
+        return member['_id']
+
+    @staticmethod
+    def remove_member(list_id, user_id, member_id):
+        """Remove ``member_id`` from a list: owners remove others, members leave
+
+        Returns False if they were not a member; raises PermissionError if
+        ``user_id`` may not remove them and ValueError for the owner leaving.
+        """
+        if not ObjectId.is_valid(member_id):
+            return False
+        if str(member_id) == str(user_id):
+            if TaskList.role_of(list_id, user_id) == 'owner':
+                raise ValueError('Owners cannot leave their list; delete it instead')
+        elif TaskList.role_of(list_id, user_id) != 'owner':
+            raise PermissionError('Only list owners can manage members')
+
+        with timed('db'):
+            removed = storage.lists.remove_member(ObjectId(list_id), ObjectId(member_id))
+        if removed:
+            memberships.invalidate(member_id)
+            cache.invalidate_user(member_id)
+        return removed
+
+    @staticmethod
+    def delete_list(list_id, user_id):
+        """Delete a list with all of its tasks and memberships; only owners may"""
+        if TaskList.role_of(list_id, user_id) != 'owner':
+            raise PermissionError('Only list owners can delete a list')
+
+        list_id = ObjectId(list_id)
+        with timed('db'):
+            members = storage.lists.members(list_id)
+            storage.tasks.delete_owned([list_id])
+            storage.tasks_archive.delete_owned([list_id])
+            storage.lists.delete(list_id)
+
+        memberships.invalidate(*[member['user_id'] for member in members])
+        cache.invalidate_user(list_id)
+        return True
+
+    @staticmethod
+    def to_dict(task_list, role):
+        """Convert a list document to a dictionary"""
+        return {
+            'id': str(task_list['_id']),
+            'name': task_list['name'],
+            'role': role,
+            'created_at': task_list['created_at'].isoformat()
+        }
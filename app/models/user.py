@@ -1,16 +1,33 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
+from functools import partial
 import bcrypt
 from bson import ObjectId
-from app.extensions import mongo
+from flask import current_app
+from app.storage import storage
+from app.utils.timing import timed
+
+UNIQUE_FIELDS = ('username', 'email')
 
 
 class User:
-    """User model for MongoDB"""
+    """User model, stored through app.storage"""
+
+    @staticmethod
+    def hash_password(password, rounds=12):
+        """Hash a password with bcrypt"""
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds))
 
     @staticmethod
     def create_user(username, email, password, role='user'):
-        """Create a new user with hashed password"""
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        """Create a new user with hashed password
+
+        Uniqueness of username and email is enforced by the unique indexes, so
+        a clash raises DuplicateKeyError instead of being checked beforehand.
+        """
+        hashed_password = User.hash_password(password, current_app.config['BCRYPT_ROUNDS'])
 
         user_data = {
             'username': username,
@@ -21,31 +38,99 @@ class User:
             'updated_at': datetime.utcnow()
         }
 
-        result = mongo.db.users.insert_one(user_data)
-        return result.inserted_id
+        return storage.users.insert(user_data)
+
+    @staticmethod
+    def create_users(users, deadline=None):
+        """Create many users with one insert_many, hashing passwords in parallel
+
+        Returns one result per input user, in order: ``{'user_id': ...}`` when
+        created or ``{'field': ..., 'message': ...}`` when it clashed. Returns
+        None, with nothing inserted, if hashing is not done by ``deadline``
+        (a ``time.monotonic()`` value).
+        """
+        config = current_app.config
+        hasher = partial(User.hash_password, rounds=config['BCRYPT_ROUNDS'])
+
+        # bcrypt releases the GIL, so threads hash on every core
+        executor = ThreadPoolExecutor(max_workers=config['BCRYPT_HASH_WORKERS'])
+        futures = [executor.submit(hasher, user['password']) for user in users]
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        _, pending = wait(futures, timeout=timeout)
+        executor.shutdown(wait=False, cancel_futures=True)
+        if pending:
+            return None
+        hashes = [future.result() for future in futures]
+
+        now = datetime.utcnow()
+        documents = [
+            {
+                'username': user['username'],
+                'email': user['email'],
+                'password': hashed_password,
+                'role': user.get('role', 'user'),
+                'created_at': now,
+                'updated_at': now
+            }
+            for user, hashed_password in zip(users, hashes)
+        ]
+
+        failures = {}
+        for error in storage.users.insert_many(documents):
+            failures[error['index']] = {
+                'field': User.duplicate_field(error),
+                'message': error.get('errmsg', 'Insert failed')
+            }
+
+        return [
+            failures.get(index, {'user_id': str(document['_id'])})
+            for index, document in enumerate(documents)
+        ]
+
+    @staticmethod
+    def duplicate_field(error):
+        """Name the unique field behind a duplicate key error, if known
+
+        Accepts a DuplicateKeyError or a single bulk write error document.
+        """
+        details = error if isinstance(error, dict) else (error.details or {})
+
+        key_pattern = details.get('keyPattern') or details.get('keyValue')
+        if key_pattern:
+            return next(iter(key_pattern))
+
+        # Older servers only name the index in the message
+        message = details.get('errmsg') or str(error)
+        match = re.search(r'index: (\w+?)_1', message)
+        if match and match.group(1) in UNIQUE_FIELDS:
+            return match.group(1)
+        return None
 
     @staticmethod
     def find_by_username(username):
         """Find user by username"""
-        return mongo.db.users.find_one({'username': username})
+        with timed('user'):
+            return storage.users.find_by('username', username)
 
     @staticmethod
     def find_by_email(email):
         """Find user by email"""
-        return mongo.db.users.find_one({'email': email})
+        return storage.users.find_by('email', email)
 
     @staticmethod
     def find_by_id(user_id):
         """Find user by ID"""
-        return mongo.db.users.find_one({'_id': ObjectId(user_id)})
+        with timed('user'):
+            return storage.users.find_by('_id', ObjectId(user_id))
 
     @staticmethod
     def verify_password(stored_password, provided_password):
         """Verify password"""
-        return bcrypt.checkpw(
-            provided_password.encode('utf-8'),
-            stored_password
-        )
+        with timed('password'):
+            return bcrypt.checkpw(
+                provided_password.encode('utf-8'),
+                stored_password
+            )
 
     @staticmethod
     def to_dict(user):
@@ -0,0 +1,231 @@
+from bson import ObjectId
+from flask import Blueprint, current_app, jsonify, request
+from flasgger import swag_from
+from app.models.audit_entry import AuditEntry
+from app.models.user import User
+from app.utils.audit import audit
+from app.utils.cache import cache
+from app.utils.concurrency import limiter
+from app.utils.decorators import token_required, admin_required
+from app.utils.events import events
+from app.utils.memberships import memberships
+from app.utils.ranks import rebalancer
+from app.utils.reminders import reminders
+from app.utils.revocations import revocations
+from app.utils.singleflight import singleflight
+from app.utils.write_behind import write_behind
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/metrics', methods=['GET'])
+@token_required
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'summary': 'Get runtime metrics',
+    'description': 'Queue depths and counters for this worker process',
+    'security': [{'Bearer': []}],
+    'responses': {
+        200: {
+            'description': 'Metrics retrieved successfully'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        403: {
+            'description': 'Admin access required'
+        }
+    }
+})
+def get_metrics(current_user):
+    """Get runtime metrics for this worker"""
+    return jsonify({
+        'cache': cache.stats(),
+        'write_behind': write_behind.stats(),
+        'audit': audit.stats(),
+        'events': {'connections': events.connection_count()},
+        'concurrency': limiter.stats(),
+        'reminders': reminders.stats(),
+        'rank_rebalance': rebalancer.stats(),
+        'list_memberships': memberships.stats(),
+        'revocations': revocations.stats(),
+        'single_flight': singleflight.stats()
+    }), 200
+
+
+@admin_bp.route('/audit', methods=['GET'])
+@token_required
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'summary': 'Read the audit log',
+    'description': (
+        'Audit entries, newest first. Pass the `next_before` of a page as `before` '
+        'to get the next one; pages are keyed on the entry id, so they stay stable '
+        'while new entries arrive. Entries younger than AUDIT_PAGE_DELAY seconds, '
+        'or not yet written by this worker, are left out.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'before',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Only entries older than this entry id'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'default': 50,
+            'description': 'Entries per page (capped by AUDIT_PAGE_MAX_LIMIT)'
+        },
+        {
+            'name': 'user_id',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Only entries of this user'
+        },
+        {
+            'name': 'action',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Only entries of this action, e.g. task.deleted'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Audit entries retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'entries': {'type': 'array', 'items': {'type': 'object'}},
+                    'next_before': {'type': 'string'}
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid before, user_id or limit'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        403: {
+            'description': 'Admin access required'
+        }
+    }
+})
+def get_audit_log(current_user):
+    """Page through the audit log"""
+    before = request.args.get('before')
+    user_id = request.args.get('user_id')
+    for value in (before, user_id):
+        if value is not None and not ObjectId.is_valid(value):
+            return jsonify({'message': 'before and user_id must be IDs'}), 400
+
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'message': 'limit must be a number'}), 400
+    if limit < 1:
+        return jsonify({'message': 'limit must be >= 1'}), 400
+    limit = min(limit, current_app.config['AUDIT_PAGE_MAX_LIMIT'])
+
+    entries = AuditEntry.find(before, limit, user_id, request.args.get('action'))
+    return jsonify({
+        'entries': [AuditEntry.to_dict(entry) for entry in entries],
+        'next_before': str(entries[-1]['_id']) if len(entries) == limit else None
+    }), 200
+
+
+@admin_bp.route('/users/bulk', methods=['POST'])
+@token_required
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'summary': 'Provision many users',
+    'description': (
+        'Create many user accounts in one request. Passwords are hashed in '
+        'parallel and users are inserted with a single unordered insert, so one '
+        'duplicate does not stop the rest.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'required': ['users'],
+                'properties': {
+                    'users': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'required': ['username', 'email', 'password'],
+                            'properties': {
+                                'username': {'type': 'string'},
+                                'email': {'type': 'string'},
+                                'password': {'type': 'string'},
+                                'role': {'type': 'string', 'enum': ['user', 'admin']}
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Per-user results, in request order',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'created': {'type': 'integer'},
+                    'failed': {'type': 'integer'},
+                    'results': {'type': 'array', 'items': {'type': 'object'}}
+                }
+            }
+        },
+        400: {
+            'description': 'Malformed request'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        403: {
+            'description': 'Admin access required'
+        },
+        503: {
+            'description': 'Passwords could not be hashed within the request deadline; nothing was created'
+        }
+    }
+})
+def bulk_create_users(current_user):
+    """Create many users at once"""
+    data = request.get_json(silent=True)
+    users = data.get('users') if isinstance(data, dict) else None
+
+    if not isinstance(users, list) or not users:
+        return jsonify({'message': 'A non-empty list of users is required'}), 400
+
+    max_users = current_app.config['BULK_PROVISION_MAX_USERS']
+    if len(users) > max_users:
+        return jsonify({'message': f'At most {max_users} users can be created at once'}), 400
+
+    for index, user in enumerate(users):
+        if not isinstance(user, dict) or not all(user.get(f) for f in ('username', 'email', 'password')):
+            return jsonify({'message': f'Missing required fields for user {index}'}), 400
+
+    results = User.create_users(users, limiter.request_deadline())
+    if results is None:
+        return limiter.overloaded_response('Request deadline exceeded while hashing passwords')
+    failed = sum(1 for result in results if 'user_id' not in result)
+
+    return jsonify({
+        'created': len(results) - failed,
+        'failed': failed,
+        'results': results
+    }), 200
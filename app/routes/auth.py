@@ -1,13 +1,34 @@
-from flask import Blueprint, request, jsonify
+import uuid
+from flask import Blueprint, g, request, jsonify
 from datetime import datetime
 from flasgger import swag_from
 import jwt
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from app.config import Config
+from app.models.refresh_token import RefreshToken
+from app.models.revoked_token import RevokedToken
 from app.models.user import User
+from app.utils.audit import audit
+from app.utils.decorators import token_required
 
 auth_bp = Blueprint('auth', __name__)
 
 
+def create_access_token(user):
+    """Sign a short-lived access token for ``user``; its ``jti`` allows revoking it"""
+    return jwt.encode(
+        {
+            'jti': uuid.uuid4().hex,
+            'user_id': str(user['_id']),
+            'username': user['username'],
+            'role': user.get('role', 'user'),
+            'exp': datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
+        },
+        Config.JWT_SECRET_KEY,
+        algorithm='HS256'
+    )
+
+
 @auth_bp.route('/register', methods=['POST'])
 @swag_from({
     'tags': ['Authentication'],
@@ -61,7 +82,14 @@ auth_bp = Blueprint('auth', __name__)
             'description': 'Missing required fields'
         },
         409: {
-            'description': 'Username or email already exists'
+            'description': 'Username or email already exists',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'field': {'type': 'string', 'enum': ['username', 'email']}
+                }
+            }
         }
     }
 })
@@ -72,12 +100,6 @@ def register():
     if not data or not data.get('username') or not data.get('email') or not data.get('password'):
         return jsonify({'message': 'Missing required fields'}), 400
 
-    if User.find_by_username(data['username']):
-        return jsonify({'message': 'Username already exists'}), 409
-
-    if User.find_by_email(data['email']):
-        return jsonify({'message': 'Email already exists'}), 409
-
     try:
         user_id = User.create_user(
             username=data['username'],
@@ -91,6 +113,14 @@ def register():
             'user_id': str(user_id)
         }), 201
 
+    except DuplicateKeyError as e:
+        field = User.duplicate_field(e)
+        message = f'{field.capitalize()} already exists' if field else 'Username or email already exists'
+        return jsonify({'message': message, 'field': field}), 409
+
+    except PyMongoError:
+        raise
+
     except Exception as e:
         return jsonify({'message': f'Error creating user: {str(e)}'}), 500
 
@@ -130,6 +160,7 @@ def register():
                 'properties': {
                     'message': {'type': 'string'},
                     'token': {'type': 'string'},
+                    'refresh_token': {'type': 'string'},
                     'user': {
                         'type': 'object',
                         'properties': {
@@ -160,25 +191,135 @@ def login():
 
     user = User.find_by_username(data['username'])
 
-    if not user:
+    if not user or not User.verify_password(user['password'], data['password']):
+        audit.record('auth.login_failed', user['_id'] if user else None, username=data['username'])
         return jsonify({'message': 'Invalid credentials'}), 401
 
-    if not User.verify_password(user['password'], data['password']):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    audit.record('auth.login', user['_id'])
 
-    token = jwt.encode(
+    return jsonify({
+        'message': 'Login successful',
+        'token': create_access_token(user),
+        'refresh_token': RefreshToken.issue(user['_id'], Config.JWT_REFRESH_TOKEN_EXPIRES),
+        'user': User.to_dict(user)
+    }), 200
+
+
+@auth_bp.route('/refresh', methods=['POST'])
+@swag_from({
+    'tags': ['Authentication'],
+    'summary': 'Refresh access token',
+    'description': (
+        'Exchange a refresh token for a new access token and a new refresh token. '
+        'Each refresh token can be used once; reusing one revokes every token '
+        'issued from the same login.'
+    ),
+    'parameters': [
         {
-            'user_id': str(user['_id']),
-            'username': user['username'],
-            'role': user.get('role', 'user'),
-            'exp': datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'required': ['refresh_token'],
+                'properties': {
+                    'refresh_token': {'type': 'string'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Token refreshed',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'token': {'type': 'string'},
+                    'refresh_token': {'type': 'string'}
+                }
+            }
         },
-        Config.JWT_SECRET_KEY,
-        algorithm='HS256'
-    )
+        400: {
+            'description': 'Missing refresh token'
+        },
+        401: {
+            'description': 'Invalid, expired or reused refresh token'
+        }
+    }
+})
+def refresh():
+    """Issue a new access token from a refresh token"""
+    data = request.get_json(silent=True)
+
+    if not data or not data.get('refresh_token'):
+        return jsonify({'message': 'Missing refresh token'}), 400
+
+    stored = RefreshToken.consume(data['refresh_token'])
+    if not stored:
+        return jsonify({'message': 'Invalid refresh token'}), 401
+
+    user = User.find_by_id(stored['user_id'])
+    if not user:
+        return jsonify({'message': 'Invalid refresh token'}), 401
 
     return jsonify({
-        'message': 'Login successful',
-        'token': token,
-        'user': User.to_dict(user)
+        'message': 'Token refreshed',
+        'token': create_access_token(user),
+        'refresh_token': RefreshToken.issue(
+            user['_id'],
+            Config.JWT_REFRESH_TOKEN_EXPIRES,
+            family_id=stored['family_id']
+        )
     }), 200
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@token_required
+@swag_from({
+    'tags': ['Authentication'],
+    'summary': 'Log out',
+    'description': (
+        'Revoke the access token used for this request. Passing the refresh token '
+        'from the same login revokes it too, together with every token refreshed from it.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'refresh_token': {'type': 'string'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Logged out'
+        },
+        400: {
+            'description': 'Token issued without a jti, or an unknown refresh token'
+        },
+        401: {
+            'description': 'Unauthorized'
+        }
+    }
+})
+def logout(current_user):
+    """Revoke the current access token and optionally its refresh token"""
+    claims = g.token_claims
+    if not claims.get('jti'):
+        return jsonify({'message': 'This token cannot be revoked; it expires on its own'}), 400
+
+    data = request.get_json(silent=True)
+    refresh_token = data.get('refresh_token') if isinstance(data, dict) else None
+    if refresh_token and not RefreshToken.revoke(refresh_token, current_user['_id']):
+        return jsonify({'message': 'Invalid refresh token'}), 400
+
+    RevokedToken.revoke(claims['jti'], current_user['_id'], datetime.utcfromtimestamp(claims['exp']))
+    audit.record('auth.logout', current_user['_id'])
+    return jsonify({'message': 'Logged out'}), 200
@@ -0,0 +1,181 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import pymongo
+from flask import Blueprint, current_app, jsonify, request
+from flasgger import swag_from
+from pymongo.errors import PyMongoError
+from app.utils.concurrency import limiter
+from app.utils.decorators import token_required
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+
+
+def run_subrequest(app, current_user, subrequest, deadline=None):
+    """Run one sub-request against tasks_bp as the already authenticated user
+
+    The view is called directly, so before_request hooks such as admission
+    control do not run for it: the batch was admitted as a whole, and each
+    sub-request gets what is left of the batch's ``deadline`` (a
+    ``time.monotonic()`` value) as its own ``pymongo.timeout``. Once it has
+    passed, sub-requests are not run.
+    """
+    method = subrequest['method']
+    remaining = deadline - time.monotonic() if deadline is not None else None
+    if remaining is not None and remaining <= 0:
+        return {'status': 503, 'body': {'message': 'Request deadline exceeded'}}
+
+    # A fresh app context gives the sub-request its own ``g``: popping its
+    # request context runs the teardown hooks, which must not see the batch's state
+    with app.app_context(), app.test_request_context(subrequest['path'], method=method,
+                                                     json=subrequest.get('body')):
+        if request.routing_exception is not None:
+            return {'status': request.routing_exception.code,
+                    'body': {'message': request.routing_exception.description}}
+
+        endpoint = request.url_rule.endpoint
+        if not endpoint.startswith('tasks.'):
+            return {'status': 400, 'body': {'message': 'Only task endpoints can be batched'}}
+
+        # Every tasks_bp view is wrapped by token_required; call the inner
+        # function so the token and user lookup are not repeated.
+        view = app.view_functions[endpoint].__wrapped__
+
+        try:
+            # pymongo.timeout(None) would lift the deadline instead of keeping it
+            with pymongo.timeout(remaining) if remaining is not None else nullcontext():
+                response = app.make_response(view(current_user, **request.view_args))
+        except PyMongoError as e:
+            if e.timeout:
+                return {'status': 503, 'body': {'message': 'Request deadline exceeded'}}
+            return {'status': 500, 'body': {'message': f'Error processing request: {str(e)}'}}
+        except Exception as e:
+            return {'status': 500, 'body': {'message': f'Error processing request: {str(e)}'}}
+
+        return {'status': response.status_code, 'body': response.get_json()}
+
+
+def plan_groups(subrequests):
+    """Split sub-requests into runs of concurrent reads separated by writes"""
+    groups = []
+    for index, subrequest in enumerate(subrequests):
+        is_read = subrequest['method'] == 'GET'
+        if is_read and groups and groups[-1][0]:
+            groups[-1][1].append(index)
+        else:
+            groups.append((is_read, [index]))
+    return groups
+
+
+@batch_bp.route('/batch', methods=['POST'])
+@token_required
+@swag_from({
+    'tags': ['Tasks'],
+    'summary': 'Run several task requests at once',
+    'description': (
+        'Execute a list of task API calls in one round trip. The token is verified '
+        'once; consecutive GET requests run concurrently and writes run in order.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'required': ['requests'],
+                'properties': {
+                    'requests': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'required': ['method', 'path'],
+                            'properties': {
+                                'id': {'type': 'string', 'example': 'page'},
+                                'method': {'type': 'string', 'example': 'GET'},
+                                'path': {'type': 'string', 'example': '/api/tasks?page=1'},
+                                'body': {'type': 'object'}
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Responses for every sub-request, in order',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'responses': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'id': {'type': 'string'},
+                                'status': {'type': 'integer'},
+                                'body': {'type': 'object'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            'description': 'Malformed batch'
+        },
+        401: {
+            'description': 'Unauthorized'
+        }
+    }
+})
+def run_batch(current_user):
+    """Run a batch of task requests"""
+    data = request.get_json(silent=True)
+    subrequests = data.get('requests') if isinstance(data, dict) else None
+
+    if not isinstance(subrequests, list) or not subrequests:
+        return jsonify({'message': 'A non-empty list of requests is required'}), 400
+
+    max_requests = current_app.config['BATCH_MAX_REQUESTS']
+    if len(subrequests) > max_requests:
+        return jsonify({'message': f'A batch may contain at most {max_requests} requests'}), 400
+
+    for subrequest in subrequests:
+        if (not isinstance(subrequest, dict) or
+                str(subrequest.get('method', '')).upper() not in BATCH_METHODS or
+                not str(subrequest.get('path', '')).startswith('/api/')):
+            return jsonify({'message': 'Each request needs a method and an /api/ path'}), 400
+        subrequest['method'] = subrequest['method'].upper()
+
+    app = current_app._get_current_object()
+    deadline = limiter.request_deadline()
+    results = [None] * len(subrequests)
+
+    with ThreadPoolExecutor(max_workers=current_app.config['BATCH_MAX_WORKERS']) as executor:
+        for is_read, indexes in plan_groups(subrequests):
+            if is_read and len(indexes) > 1:
+                # Executors do not carry context variables over, so each read
+                # runs in a copy of this request's context and its pymongo timeout
+                futures = {
+                    index: executor.submit(contextvars.copy_context().run, run_subrequest,
+                                           app, current_user, subrequests[index], deadline)
+                    for index in indexes
+                }
+                for index, future in futures.items():
+                    results[index] = future.result()
+            else:
+                for index in indexes:
+                    results[index] = run_subrequest(app, current_user, subrequests[index], deadline)
+
+    return jsonify({
+        'responses': [
+            {'id': subrequest.get('id', str(index)), **result}
+            for index, (subrequest, result) in enumerate(zip(subrequests, results))
+        ]
+    }), 200
@@ -0,0 +1,90 @@
+import json
+from flask import Blueprint, Response, current_app, jsonify, request
+from flasgger import swag_from
+from app.utils.decorators import token_required
+from app.utils.events import events, TooManyConnections
+
+events_bp = Blueprint('events', __name__)
+
+
+def format_event(event):
+    """Encode an event in the text/event-stream wire format"""
+    return f'id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n'
+
+
+@events_bp.route('/events', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Events'],
+    'summary': 'Stream task events',
+    'description': (
+        'Server-Sent Events stream of task.created, task.updated and task.deleted '
+        'events for the authenticated user. Send Last-Event-ID to resume after a '
+        'disconnect; a "reset" event means the gap could not be replayed and the '
+        'client should refetch its tasks.'
+    ),
+    'security': [{'Bearer': []}],
+    'produces': ['text/event-stream'],
+    'parameters': [
+        {
+            'name': 'Last-Event-ID',
+            'in': 'header',
+            'type': 'string',
+            'description': 'Id of the last event the client received'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Event stream'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        429: {
+            'description': 'Too many open streams for this user'
+        }
+    }
+})
+def stream_events(current_user):
+    """Stream task events for the authenticated user"""
+    config = current_app.config
+    user_id = str(current_user['_id'])
+    heartbeat_interval = config['EVENTS_HEARTBEAT_INTERVAL']
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    try:
+        subscription = events.subscribe(user_id, config['EVENTS_MAX_CONNECTIONS_PER_USER'])
+    except TooManyConnections:
+        return jsonify({'message': 'Too many open event streams'}), 429
+
+    # Subscribe before replaying so nothing published in between is lost;
+    # anything delivered twice is filtered out by id below.
+    replayed = events.replay(user_id, last_event_id) if last_event_id else []
+
+    def generate():
+        yield 'retry: 3000\n\n'
+
+        seen = set()
+        if replayed is None:
+            yield 'event: reset\ndata: {}\n\n'
+        else:
+            for event in replayed:
+                seen.add(event.id)
+                yield format_event(event)
+
+        # A client that falls too far behind is disconnected and resumes
+        # from its Last-Event-ID rather than holding events in memory.
+        while not subscription.overflowed:
+            event = subscription.get(timeout=heartbeat_interval)
+            if event is None:
+                yield ': heartbeat\n\n'
+            elif event.id not in seen:
+                yield format_event(event)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the stream, including on client disconnect
+    response.call_on_close(lambda: events.unsubscribe(subscription))
+    return response
@@ -0,0 +1,18 @@
+import os
+from flask import Blueprint, current_app, jsonify
+from pymongo.errors import PyMongoError
+from app.storage import storage
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness check: 200 once this worker can reach its storage engine"""
+    try:
+        storage.ping(current_app.config['HEALTHZ_TIMEOUT'])
+    except PyMongoError as e:
+        return jsonify({'status': 'unavailable', 'storage': storage.name, 'error': str(e),
+                        'pid': os.getpid()}), 503
+
+    return jsonify({'status': 'ok', 'storage': storage.name, 'pid': os.getpid()}), 200
@@ -0,0 +1,283 @@
+from flask import Blueprint, request, jsonify
+from flasgger import swag_from
+from app.models.task_list import ROLES, TaskList
+from app.utils.decorators import token_required
+
+lists_bp = Blueprint('lists', __name__)
+
+MAX_LIST_NAME_LENGTH = 100
+
+LIST_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'string'},
+        'name': {'type': 'string'},
+        'role': {'type': 'string', 'enum': list(ROLES)},
+        'created_at': {'type': 'string'}
+    }
+}
+
+LIST_ID_PARAMETER = {
+    'name': 'list_id',
+    'in': 'path',
+    'type': 'string',
+    'required': True,
+    'description': 'List ID'
+}
+
+
+@lists_bp.route('/lists', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Lists'],
+    'summary': 'Get shared lists',
+    'description': 'Every list the authenticated user is a member of, with their role',
+    'security': [{'Bearer': []}],
+    'responses': {
+        200: {
+            'description': 'Lists retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'lists': {'type': 'array', 'items': LIST_SCHEMA}
+                }
+            }
+        },
+        401: {
+            'description': 'Unauthorized'
+        }
+    }
+})
+def get_lists(current_user):
+    """Get the lists of the authenticated user"""
+    return jsonify({'lists': TaskList.find_for_user(current_user['_id'])}), 200
+
+
+@lists_bp.route('/lists', methods=['POST'])
+@token_required
+@swag_from({
+    'tags': ['Lists'],
+    'summary': 'Create a shared list',
+    'description': 'Create a list owned by the authenticated user',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'required': ['name'],
+                'properties': {
+                    'name': {'type': 'string', 'example': 'Household'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        201: {
+            'description': 'List created successfully'
+        },
+        400: {
+            'description': 'Missing or invalid name'
+        },
+        401: {
+            'description': 'Unauthorized'
+        }
+    }
+})
+def create_list(current_user):
+    """Create a shared list"""
+    data = request.get_json(silent=True)
+    name = data.get('name') if isinstance(data, dict) else None
+
+    if not isinstance(name, str) or not name.strip():
+        return jsonify({'message': 'Name is required'}), 400
+    if len(name) > MAX_LIST_NAME_LENGTH:
+        return jsonify({'message': f'Name can be at most {MAX_LIST_NAME_LENGTH} characters'}), 400
+
+    task_list = TaskList.create_list(current_user['_id'], name.strip())
+    return jsonify({'message': 'List created successfully', 'list': task_list}), 201
+
+
+@lists_bp.route('/lists/<list_id>', methods=['DELETE'])
+@token_required
+@swag_from({
+    'tags': ['Lists'],
+    'summary': 'Delete a shared list',
+    'description': 'Delete a list together with its tasks and memberships (owners only)',
+    'security': [{'Bearer': []}],
+    'parameters': [LIST_ID_PARAMETER],
+    'responses': {
+        200: {
+            'description': 'List deleted successfully'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        403: {
+            'description': 'Not an owner of the list'
+        },
+        404: {
+            'description': 'List not found'
+        }
+    }
+})
+def delete_list(current_user, list_id):
+    """Delete a shared list"""
+    if TaskList.role_of(list_id, current_user['_id']) is None:
+        return jsonify({'message': 'List not found'}), 404
+
+    try:
+        TaskList.delete_list(list_id, current_user['_id'])
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
+
+    return jsonify({'message': 'List deleted successfully'}), 200
+
+
+@lists_bp.route('/lists/<list_id>/members', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Lists'],
+    'summary': 'Get list members',
+    'description': 'Members of a list with their roles, owners first',
+    'security': [{'Bearer': []}],
+    'parameters': [LIST_ID_PARAMETER],
+    'responses': {
+        200: {
+            'description': 'Members retrieved successfully'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        404: {
+            'description': 'List not found'
+        }
+    }
+})
+def get_members(current_user, list_id):
+    """Get the members of a shared list"""
+    if TaskList.role_of(list_id, current_user['_id']) is None:
+        return jsonify({'message': 'List not found'}), 404
+
+    return jsonify({'members': TaskList.members(list_id)}), 200
+
+
+@lists_bp.route('/lists/<list_id>/members', methods=['POST'])
+@token_required
+@swag_from({
+    'tags': ['Lists'],
+    'summary': 'Add or update a list member',
+    'description': 'Share a list with a user, or change their role (owners only)',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        LIST_ID_PARAMETER,
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'required': ['username', 'role'],
+                'properties': {
+                    'username': {'type': 'string', 'example': 'jane'},
+                    'role': {'type': 'string', 'enum': list(ROLES), 'example': 'editor'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Member saved successfully'
+        },
+        400: {
+            'description': 'Missing username or invalid role'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        403: {
+            'description': 'Not an owner of the list'
+        },
+        404: {
+            'description': 'List or user not found'
+        }
+    }
+})
+def set_member(current_user, list_id):
+    """Add a member to a shared list or change their role"""
+    if TaskList.role_of(list_id, current_user['_id']) is None:
+        return jsonify({'message': 'List not found'}), 404
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('username') or 'role' not in data:
+        return jsonify({'message': 'username and role are required'}), 400
+
+    try:
+        member_id = TaskList.set_member(list_id, current_user['_id'], data['username'], data['role'])
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if member_id is None:
+        return jsonify({'message': 'User not found'}), 404
+
+    return jsonify({
+        'message': 'Member saved successfully',
+        'member': {'user_id': str(member_id), 'username': data['username'], 'role': data['role']}
+    }), 200
+
+
+@lists_bp.route('/lists/<list_id>/members/<user_id>', methods=['DELETE'])
+@token_required
+@swag_from({
+    'tags': ['Lists'],
+    'summary': 'Remove a list member',
+    'description': 'Owners remove any other member; members remove themselves to leave',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        LIST_ID_PARAMETER,
+        {
+            'name': 'user_id',
+            'in': 'path',
+            'type': 'string',
+            'required': True,
+            'description': 'User ID of the member'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Member removed successfully'
+        },
+        400: {
+            'description': 'Owners cannot leave their own list'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        403: {
+            'description': 'Not an owner of the list'
+        },
+        404: {
+            'description': 'List or member not found'
+        }
+    }
+})
+def remove_member(current_user, list_id, user_id):
+    """Remove a member from a shared list"""
+    if TaskList.role_of(list_id, current_user['_id']) is None:
+        return jsonify({'message': 'List not found'}), 404
+
+    try:
+        removed = TaskList.remove_member(list_id, current_user['_id'], user_id)
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if not removed:
+        return jsonify({'message': 'Member not found'}), 404
+
+    return jsonify({'message': 'Member removed successfully'}), 200
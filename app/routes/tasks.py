@@ -1,10 +1,75 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, current_app, request, jsonify
 from flasgger import swag_from
-from app.models.task import Task
+from pymongo.errors import PyMongoError
+from app.models.task import (MAX_PRIORITY, MAX_TAG_LENGTH, MAX_TAGS, MAX_UPCOMING_HOURS, MIN_PRIORITY,
+                             ConflictError, Task)
+from app.models.task_list import TaskList
 from app.utils.decorators import token_required, admin_required
+from app.utils.timing import timed
 
 tasks_bp = Blueprint('tasks', __name__)
 
+# Values of ?sort= and the storage order they select
+SORT_ORDERS = {'created': 'created_at', 'manual': 'rank'}
+
+TASK_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'string'},
+        'title': {'type': 'string'},
+        'description': {'type': 'string'},
+        'completed': {'type': 'boolean'},
+        'archived': {'type': 'boolean'},
+        'list_id': {'type': 'string', 'description': 'Shared list of the task, null for personal tasks'},
+        'parent_id': {'type': 'string'},
+        'priority': {'type': 'integer'},
+        'due_at': {'type': 'string', 'format': 'date-time'},
+        'tags': {'type': 'array', 'items': {'type': 'string'}},
+        'created_at': {'type': 'string'},
+        'updated_at': {'type': 'string'}
+    }
+}
+
+
+def parse_due_at(value):
+    """Parse an ISO 8601 due date into naive UTC; None clears the due date"""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError('due_at must be an ISO 8601 date-time string')
+
+    try:
+        due_at = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError('due_at must be an ISO 8601 date-time string')
+
+    if due_at.tzinfo is not None:
+        due_at = due_at.astimezone(timezone.utc).replace(tzinfo=None)
+    # Stored dates keep millisecond precision
+    return due_at.replace(microsecond=due_at.microsecond // 1000 * 1000)
+
+
+def parse_priority(value):
+    """Validate a priority, an integer from MIN_PRIORITY to MAX_PRIORITY"""
+    if isinstance(value, bool) or not isinstance(value, int) or \
+            not MIN_PRIORITY <= value <= MAX_PRIORITY:
+        raise ValueError(f'priority must be an integer from {MIN_PRIORITY} to {MAX_PRIORITY}')
+    return value
+
+
+def parse_tags(value):
+    """Validate a list of tags; tags are trimmed, lower-cased and de-duplicated"""
+    if not isinstance(value, list) or not all(isinstance(tag, str) for tag in value):
+        raise ValueError('tags must be a list of strings')
+
+    tags = list(dict.fromkeys(tag.strip().lower() for tag in value))
+    if '' in tags or any(len(tag) > MAX_TAG_LENGTH for tag in tags):
+        raise ValueError(f'tags must be 1 to {MAX_TAG_LENGTH} characters long')
+    if len(tags) > MAX_TAGS:
+        raise ValueError(f'a task can have at most {MAX_TAGS} tags')
+    return tags
+
 
 @tasks_bp.route('/tasks', methods=['GET'])
 @token_required
@@ -33,6 +98,35 @@ tasks_bp = Blueprint('tasks', __name__)
             'in': 'query',
             'type': 'boolean',
             'description': 'Filter by completion status'
+        },
+        {
+            'name': 'tag',
+            'in': 'query',
+            'type': 'array',
+            'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'description': 'Only tasks carrying every given tag (repeat for several)'
+        },
+        {
+            'name': 'list_id',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Only tasks of this shared list (default: own tasks and every shared list)'
+        },
+        {
+            'name': 'sort',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['created', 'manual'],
+            'default': 'created',
+            'description': 'Newest first, or the order set with POST /tasks/{task_id}/move'
+        },
+        {
+            'name': 'include_archived',
+            'in': 'query',
+            'type': 'boolean',
+            'default': False,
+            'description': 'Also return tasks moved to the archive (not with sort=manual)'
         }
     ],
     'responses': {
@@ -43,17 +137,7 @@ tasks_bp = Blueprint('tasks', __name__)
                 'properties': {
                     'tasks': {
                         'type': 'array',
-                        'items': {
-                            'type': 'object',
-                            'properties': {
-                                'id': {'type': 'string'},
-                                'title': {'type': 'string'},
-                                'description': {'type': 'string'},
-                                'completed': {'type': 'boolean'},
-                                'created_at': {'type': 'string'},
-                                'updated_at': {'type': 'string'}
-                            }
-                        }
+                        'items': TASK_SCHEMA
                     },
                     'total': {'type': 'integer'},
                     'page': {'type': 'integer'},
@@ -62,8 +146,14 @@ tasks_bp = Blueprint('tasks', __name__)
                 }
             }
         },
+        400: {
+            'description': 'Invalid tag filter or sort order'
+        },
         401: {
             'description': 'Unauthorized - Token missing or invalid'
+        },
+        404: {
+            'description': 'List not found'
         }
     }
 })
@@ -76,22 +166,200 @@ def get_tasks(current_user):
     if completed is not None:
         completed = completed.lower() == 'true'
 
+    try:
+        tags = parse_tags(request.args.getlist('tag'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+
+    sort = SORT_ORDERS.get(request.args.get('sort', 'created'))
+    if sort is None:
+        return jsonify({'message': f'sort must be one of: {", ".join(SORT_ORDERS)}'}), 400
+    if sort == 'rank' and include_archived:
+        return jsonify({'message': 'sort=manual cannot be combined with include_archived'}), 400
+
+    list_id = request.args.get('list_id')
+    if list_id is not None and TaskList.role_of(list_id, current_user['_id']) is None:
+        return jsonify({'message': 'List not found'}), 404
+
+    if not include_archived and current_app.config['TASK_LIST_FAST_PATH']:
+        records, total = Task.find_records(
+            user_id=current_user['_id'],
+            page=page,
+            per_page=per_page,
+            completed=completed,
+            tags=tags,
+            sort=sort,
+            list_id=list_id
+        )
+        with timed('serialize'):
+            body = Task.encode_page(records, total, page, per_page)
+        return current_app.response_class(body, mimetype='application/json'), 200
+
     tasks, total = Task.find_all(
-        user_id=str(current_user['_id']),
+        user_id=current_user['_id'],
         page=page,
         per_page=per_page,
-        completed=completed
+        completed=completed,
+        include_archived=include_archived,
+        tags=tags,
+        sort=sort,
+        list_id=list_id
     )
 
-    tasks_list = [Task.to_dict(task) for task in tasks]
+    with timed('serialize'):
+        tasks_list = [Task.to_dict(task) for task in tasks]
 
-    return jsonify({
-        'tasks': tasks_list,
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page
-    }), 200
+        response = jsonify({
+            'tasks': tasks_list,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page
+        })
+    return response, 200
+
+
+@tasks_bp.route('/tasks/tags', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Tasks'],
+    'summary': 'Get tag counts',
+    'description': (
+        'Number of tasks per tag, most used first. With `tag` filters, counts '
+        'only tasks carrying every given tag.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'completed',
+            'in': 'query',
+            'type': 'boolean',
+            'description': 'Only count tasks with this completion status'
+        },
+        {
+            'name': 'tag',
+            'in': 'query',
+            'type': 'array',
+            'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'description': 'Only count tasks carrying every given tag'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Tag counts retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'tags': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'tag': {'type': 'string'},
+                                'count': {'type': 'integer'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid tag filter'
+        },
+        401: {
+            'description': 'Unauthorized'
+        }
+    }
+})
+def get_tag_counts(current_user):
+    """Get the number of tasks per tag"""
+    completed = request.args.get('completed')
+    if completed is not None:
+        completed = completed.lower() == 'true'
+
+    try:
+        tags = parse_tags(request.args.getlist('tag'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({'tags': Task.tag_counts(current_user['_id'], completed, tags)}), 200
+
+
+@tasks_bp.route('/tasks/upcoming', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Tasks'],
+    'summary': 'Get upcoming deadlines',
+    'description': (
+        'Open tasks that are overdue or due within the next `within_hours` '
+        'hours, soonest first. Tasks without a due date are not returned.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'within_hours',
+            'in': 'query',
+            'type': 'number',
+            'default': 24,
+            'description': f'How far ahead to look, from 0 to {MAX_UPCOMING_HOURS}'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'default': 50,
+            'description': 'Maximum number of tasks (capped by TASK_UPCOMING_MAX_LIMIT)'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Upcoming tasks retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'tasks': {'type': 'array', 'items': TASK_SCHEMA},
+                    'until': {'type': 'string', 'format': 'date-time'}
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid within_hours or limit'
+        },
+        401: {
+            'description': 'Unauthorized'
+        }
+    }
+})
+def get_upcoming_tasks(current_user):
+    """Get open tasks that are overdue or due soon"""
+    try:
+        within_hours = float(request.args.get('within_hours', 24))
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'message': 'within_hours and limit must be numbers'}), 400
+
+    # Also rejects nan and inf, which float() accepts
+    if not 0 <= within_hours <= MAX_UPCOMING_HOURS or limit < 1:
+        return jsonify({
+            'message': f'within_hours must be from 0 to {MAX_UPCOMING_HOURS} and limit >= 1'
+        }), 400
+
+    until = datetime.utcnow() + timedelta(hours=within_hours)
+    tasks = Task.find_upcoming(
+        current_user['_id'],
+        until,
+        limit=min(limit, current_app.config['TASK_UPCOMING_MAX_LIMIT'])
+    )
+
+    with timed('serialize'):
+        response = jsonify({
+            'tasks': [Task.to_dict(task) for task in tasks],
+            'until': until.isoformat()
+        })
+    return response, 200
 
 
 @tasks_bp.route('/tasks/<task_id>', methods=['GET'])
@@ -99,7 +367,7 @@ def get_tasks(current_user):
 @swag_from({
     'tags': ['Tasks'],
     'summary': 'Get task by ID',
-    'description': 'Retrieve a specific task by its ID',
+    'description': 'Retrieve a specific task by its ID, including archived tasks',
     'security': [{'Bearer': []}],
     'parameters': [
         {
@@ -125,13 +393,17 @@ def get_tasks(current_user):
 def get_task(current_user, task_id):
     """Get a specific task by ID"""
     try:
-        task = Task.find_by_id(task_id, str(current_user['_id']))
+        task = Task.find_by_id(task_id, current_user['_id'], include_archived=True)
 
         if not task:
             return jsonify({'message': 'Task not found'}), 404
 
-        return jsonify({'task': Task.to_dict(task)}), 200
+        with timed('serialize'):
+            response = jsonify({'task': Task.to_dict(task)})
+        return response, 200
 
+    except PyMongoError:
+        raise
     except Exception as e:
         return jsonify({'message': f'Invalid task ID: {str(e)}'}), 400
 
@@ -159,6 +431,30 @@ def get_task(current_user, task_id):
                     'description': {
                         'type': 'string',
                         'example': 'Write comprehensive API documentation'
+                    },
+                    'due_at': {
+                        'type': 'string',
+                        'format': 'date-time',
+                        'example': '2026-11-02T17:00:00Z'
+                    },
+                    'priority': {
+                        'type': 'integer',
+                        'minimum': 0,
+                        'maximum': 3,
+                        'example': 2
+                    },
+                    'tags': {
+                        'type': 'array',
+                        'items': {'type': 'string'},
+                        'example': ['docs', 'release']
+                    },
+                    'parent_id': {
+                        'type': 'string',
+                        'description': 'Create the task as a subtask of this task'
+                    },
+                    'list_id': {
+                        'type': 'string',
+                        'description': 'Create the task in this shared list (owner or editor role)'
                     }
                 }
             }
@@ -169,7 +465,7 @@ def get_task(current_user, task_id):
             'description': 'Task created successfully'
         },
         400: {
-            'description': 'Title is required'
+            'description': 'Title is required, or due_at, priority, tags, parent_id or list_id is invalid'
         },
         401: {
             'description': 'Unauthorized'
@@ -183,20 +479,36 @@ def create_task(current_user):
     if not data or not data.get('title'):
         return jsonify({'message': 'Title is required'}), 400
 
+    try:
+        due_at = parse_due_at(data.get('due_at'))
+        priority = parse_priority(data.get('priority', MIN_PRIORITY))
+        tags = parse_tags(data.get('tags', []))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
     try:
         task_id = Task.create_task(
-            user_id=str(current_user['_id']),
+            user_id=current_user['_id'],
             title=data['title'],
-            description=data.get('description', '')
+            description=data.get('description', ''),
+            due_at=due_at,
+            priority=priority,
+            tags=tags,
+            parent_id=data.get('parent_id'),
+            list_id=data.get('list_id')
         )
 
-        task = Task.find_by_id(str(task_id), str(current_user['_id']))
+        task = Task.find_by_id(str(task_id), current_user['_id'])
 
         return jsonify({
             'message': 'Task created successfully',
             'task': Task.to_dict(task)
         }), 201
 
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except PyMongoError:
+        raise
     except Exception as e:
         return jsonify({'message': f'Error creating task: {str(e)}'}), 500
 
@@ -225,7 +537,25 @@ def create_task(current_user):
                 'properties': {
                     'title': {'type': 'string'},
                     'description': {'type': 'string'},
-                    'completed': {'type': 'boolean'}
+                    'completed': {'type': 'boolean'},
+                    'due_at': {
+                        'type': 'string',
+                        'format': 'date-time',
+                        'description': 'null removes the due date'
+                    },
+                    'priority': {'type': 'integer', 'minimum': 0, 'maximum': 3},
+                    'tags': {
+                        'type': 'array',
+                        'items': {'type': 'string'},
+                        'description': 'Replaces the task\'s tags'
+                    },
+                    'parent_id': {
+                        'type': 'string',
+                        'description': (
+                            'Move the task and its subtasks under this task; '
+                            'null makes it a top-level task'
+                        )
+                    }
                 }
             }
         }
@@ -235,13 +565,16 @@ def create_task(current_user):
             'description': 'Task updated successfully'
         },
         400: {
-            'description': 'No valid fields to update'
+            'description': 'No valid fields to update, or due_at, priority, tags or parent_id is invalid'
         },
         401: {
             'description': 'Unauthorized'
         },
         404: {
             'description': 'Task not found'
+        },
+        409: {
+            'description': 'The task was moved by another request; retry'
         }
     }
 })
@@ -260,26 +593,173 @@ def update_task(current_user, task_id):
     if 'completed' in data:
         update_data['completed'] = data['completed']
 
-    if not update_data:
+    try:
+        if 'due_at' in data:
+            update_data['due_at'] = parse_due_at(data['due_at'])
+        if 'priority' in data:
+            update_data['priority'] = parse_priority(data['priority'])
+        if 'tags' in data:
+            update_data['tags'] = parse_tags(data['tags'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if not update_data and 'parent_id' not in data:
         return jsonify({'message': 'No valid fields to update'}), 400
 
     try:
-        success = Task.update_task(task_id, str(current_user['_id']), update_data)
+        if 'parent_id' in data:
+            try:
+                success = Task.set_parent(task_id, current_user['_id'], data['parent_id'])
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+            except ConflictError as e:
+                return jsonify({'message': str(e)}), 409
+            if not success:
+                return jsonify({'message': 'Task not found'}), 404
+
+        if update_data:
+            success = Task.update_task(task_id, current_user['_id'], update_data)
 
         if not success:
             return jsonify({'message': 'Task not found'}), 404
 
-        task = Task.find_by_id(task_id, str(current_user['_id']))
+        task = Task.find_by_id(task_id, current_user['_id'])
 
         return jsonify({
             'message': 'Task updated successfully',
             'task': Task.to_dict(task)
         }), 200
 
+    except PyMongoError:
+        raise
     except Exception as e:
         return jsonify({'message': f'Error updating task: {str(e)}'}), 400
 
 
+@tasks_bp.route('/tasks/<task_id>/subtree', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Tasks'],
+    'summary': 'Get a task with all of its subtasks',
+    'description': (
+        'Return the task with its subtasks nested under `subtasks`, at any depth, '
+        'in manual order. Each node has a `rollup` with the number of tasks below '
+        'it and how many of those are completed.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'task_id',
+            'in': 'path',
+            'type': 'string',
+            'required': True,
+            'description': 'Task ID'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Subtree retrieved successfully'
+        },
+        400: {
+            'description': 'Invalid task ID'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        404: {
+            'description': 'Task not found'
+        }
+    }
+})
+def get_subtree(current_user, task_id):
+    """Get a task with its nested subtasks and completion rollup"""
+    try:
+        tree = Task.find_subtree(task_id, current_user['_id'])
+    except PyMongoError:
+        raise
+    except Exception as e:
+        return jsonify({'message': f'Invalid task ID: {str(e)}'}), 400
+
+    if tree is None:
+        return jsonify({'message': 'Task not found'}), 404
+
+    return jsonify({'task': tree}), 200
+
+
+@tasks_bp.route('/tasks/<task_id>/move', methods=['POST'])
+@token_required
+@swag_from({
+    'tags': ['Tasks'],
+    'summary': 'Move a task in the manual order',
+    'description': (
+        'Place a task right after another one in the order returned by '
+        '`GET /tasks?sort=manual`. Only the moved task is written.'
+    ),
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'task_id',
+            'in': 'path',
+            'type': 'string',
+            'required': True,
+            'description': 'Task ID'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'required': ['after'],
+                'properties': {
+                    'after': {
+                        'type': 'string',
+                        'description': 'ID of the task to follow; null moves the task first'
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Task moved successfully'
+        },
+        400: {
+            'description': 'Missing or invalid after, or after a task of another list'
+        },
+        401: {
+            'description': 'Unauthorized'
+        },
+        404: {
+            'description': 'Task not found'
+        },
+        409: {
+            'description': 'The manual order changed during the move (retry), or its tasks are not ranked yet'
+        }
+    }
+})
+def move_task(current_user, task_id):
+    """Move a task in the manual order"""
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or 'after' not in data:
+        return jsonify({'message': 'after is required (null moves the task first)'}), 400
+
+    try:
+        success = Task.move_task(task_id, current_user['_id'], data['after'])
+    except ConflictError as e:
+        return jsonify({'message': str(e)}), 409
+    except PyMongoError:
+        raise
+    except Exception as e:
+        return jsonify({'message': f'Error moving task: {str(e)}'}), 400
+
+    if not success:
+        return jsonify({'message': 'Task not found'}), 404
+
+    return jsonify({'message': 'Task moved successfully'}), 200
+
+
 @tasks_bp.route('/tasks/<task_id>', methods=['DELETE'])
 @token_required
 @swag_from({
@@ -311,12 +791,14 @@ def update_task(current_user, task_id):
 def delete_task(current_user, task_id):
     """Delete a task"""
     try:
-        success = Task.delete_task(task_id, str(current_user['_id']))
+        success = Task.delete_task(task_id, current_user['_id'])
 
         if not success:
             return jsonify({'message': 'Task not found'}), 404
 
         return jsonify({'message': 'Task deleted successfully'}), 200
 
+    except PyMongoError:
+        raise
     except Exception as e:
         return jsonify({'message': f'Error deleting task: {str(e)}'}), 400
@@ -0,0 +1,62 @@
+from app.storage.memory import MemoryStorage
+
+
+class Storage:
+    """The storage engine selected by STORAGE_ENGINE
+
+    Models go through ``storage.tasks``, ``storage.tasks_archive``,
+    ``storage.users``, ``storage.refresh_tokens``, ``storage.revoked_tokens``,
+    ``storage.lists`` and ``storage.audit_log`` instead of talking to MongoDB,
+    so the same code runs on the ``mongo`` engine in production and on the
+    ``memory`` engine in tests.
+    """
+
+    def __init__(self, app=None):
+        self.engine = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        name = app.config['STORAGE_ENGINE']
+        if name == 'mongo':
+            from app.storage.mongo import MongoStorage
+            engine = MongoStorage(app)
+        elif name == 'memory':
+            engine = MemoryStorage()
+        else:
+            raise RuntimeError(f'Unknown STORAGE_ENGINE {name!r}; use mongo or memory')
+
+        self.engine = engine
+        self.tasks = engine.tasks
+        self.tasks_archive = engine.tasks_archive
+        self.users = engine.users
+        self.refresh_tokens = engine.refresh_tokens
+        self.revoked_tokens = engine.revoked_tokens
+        self.lists = engine.lists
+        self.audit_log = engine.audit_log
+
+    @property
+    def name(self):
+        return self.engine.name
+
+    def task_store(self, name):
+        return self.engine.task_store(name)
+
+    def ping(self, timeout):
+        self.engine.ping(timeout)
+
+    def collection_stats(self, name):
+        return self.engine.collection_stats(name)
+
+    def reset(self):
+        self.engine.reset()
+
+    def reinit(self, app):
+        self.engine.reinit(app)
+
+    def close(self):
+        self.engine.close()
+
+
+storage = Storage()
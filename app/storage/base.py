@@ -0,0 +1,281 @@
+class TaskStore:
+    """Tasks of one collection (live or archive)
+
+    ``owners`` is the list of ``user_id`` values a task may be stored under
+    (an ObjectId, plus its string form while legacy tasks are dual-read);
+    None matches every owner. ``tags`` restricts reads to tasks carrying
+    every one of the given tags. Task ids are ObjectIds.
+    """
+
+    def insert(self, document):
+        """Insert a task, setting ``document['_id']`` if missing, and return its id"""
+        raise NotImplementedError
+
+    def insert_many(self, documents):
+        """Insert tasks that keep their ids; ids that already exist are skipped"""
+        raise NotImplementedError
+
+    def get(self, task_id, owners=None, fields=None):
+        """Return one task, or None if it does not exist or has another owner"""
+        raise NotImplementedError
+
+    def find_page(self, owners, completed=None, skip=0, limit=10, fields=None,
+                  codec_options=None, tags=None, sort='created_at'):
+        """Return a page of tasks, newest ``created_at`` first
+
+        With ``sort='rank'`` tasks are grouped by owner, in BSON order of
+        ``user_id``, and come in ascending manual order within each owner,
+        tasks without a rank first. ``fields`` is an inclusion projection;
+        ``codec_options`` selects the document class, e.g. RawBSONDocument.
+        """
+        raise NotImplementedError
+
+    def count(self, owners=None, completed=None, tags=None):
+        raise NotImplementedError
+
+    def tag_counts(self, owners, completed=None, tags=None):
+        """Return ``{tag: number of matching tasks carrying it}``"""
+        raise NotImplementedError
+
+    def update(self, task_id, owners, fields):
+        """Set ``fields`` on an owned task; True if the document changed"""
+        raise NotImplementedError
+
+    def delete(self, task_id, owners):
+        """Delete an owned task; True if it existed"""
+        raise NotImplementedError
+
+    def delete_owned(self, owners):
+        """Delete every task of ``owners`` and return how many were removed"""
+        raise NotImplementedError
+
+    def set_fields(self, updates, write_concern=None, batch_size=500):
+        """Apply ``{task_id: fields}`` without an owner check, in bulk"""
+        raise NotImplementedError
+
+    def find_completed_before(self, cutoff, limit):
+        """Completed tasks last updated before ``cutoff``, oldest first"""
+        raise NotImplementedError
+
+    def delete_completed(self, task_ids, cutoff):
+        """Delete those of ``task_ids`` still completed before ``cutoff``; return the count"""
+        raise NotImplementedError
+
+    def existing_ids(self, task_ids):
+        raise NotImplementedError
+
+    def delete_ids(self, task_ids):
+        raise NotImplementedError
+
+    def find_due(self, owners, before, limit):
+        """Open tasks of ``owners`` due at or before ``before``, soonest first"""
+        raise NotImplementedError
+
+    def find_due_reminders(self, after, before, limit):
+        """Open tasks of any owner due in ``(after, before]`` with no reminder sent yet"""
+        raise NotImplementedError
+
+    def next_due_at(self, after):
+        """Earliest due date after ``after`` still waiting for a reminder, or None"""
+        raise NotImplementedError
+
+    def claim_reminder(self, task_id, now):
+        """Mark an open task's reminder as sent; False if it was already claimed"""
+        raise NotImplementedError
+
+    def subtree(self, root_id, owners, fields=None):
+        """The task ``root_id`` and every task below it, root first
+
+        Descendants are found through their ``ancestors`` array, in no
+        particular order. Empty if the root does not exist.
+        """
+        raise NotImplementedError
+
+    def move_subtree(self, task_id, owners, old_ancestors, new_ancestors, fields):
+        """Give a task new ``ancestors`` (plus ``fields``) and rewrite its descendants
+
+        Each descendant's ancestors up to and excluding ``task_id`` are
+        replaced by ``new_ancestors`` with one update. Nothing changes if
+        the task's ancestors are no longer ``old_ancestors`` (None for tasks
+        stored without the field); returns False in that case.
+        """
+        raise NotImplementedError
+
+    def next_rank(self, owners, rank, exclude_id=None):
+        """The first task after ``rank`` in manual order, as ``{'_id', 'rank'}``
+
+        With ``rank`` None this is the first task of all, which has no rank
+        if any task is still unranked. Returns None past the last task.
+        """
+        raise NotImplementedError
+
+    def rank_order(self, owners):
+        """Every task of ``owners`` as ``{'_id', 'rank'}`` in manual order
+
+        Unranked tasks come first, newest first.
+        """
+        raise NotImplementedError
+
+    def replace_ranks(self, changes):
+        """Apply ``(task_id, old, new)`` rank changes where ``rank`` is still ``old``
+
+        Returns the number of tasks changed.
+        """
+        raise NotImplementedError
+
+    def set_rank(self, task_id, old, new, after_id):
+        """Set a moved task's ``rank`` and ``rank_after`` if ``rank`` is still ``old``
+
+        ``rank_after`` is the task it was placed after (None: first), so a
+        rebalance that raced the move can place it again. Returns True if
+        the task was changed.
+        """
+        raise NotImplementedError
+
+    def find_unranked(self, after_id, limit):
+        """Tasks without a ``rank``, as ``{'_id', 'user_id'}`` in ``_id`` order after ``after_id``"""
+        raise NotImplementedError
+
+    def find_string_owners(self, after_id, limit):
+        """Tasks whose ``user_id`` is still a string, in ``_id`` order after ``after_id``"""
+        raise NotImplementedError
+
+    def replace_owners(self, changes):
+        """Apply ``(task_id, old, new)`` owner changes where ``user_id`` is still ``old``
+
+        Returns the number of tasks changed.
+        """
+        raise NotImplementedError
+
+
+class UserStore:
+    """Users, unique by username and by email
+
+    A clash on either raises pymongo's DuplicateKeyError, whose details name
+    the offending key, whatever the engine.
+    """
+
+    def insert(self, document):
+        """Insert a user, setting ``document['_id']``, and return its id"""
+        raise NotImplementedError
+
+    def insert_many(self, documents):
+        """Insert users independently of each other
+
+        Returns the write errors of users that were not inserted, as the
+        ``writeErrors`` documents MongoDB reports for an unordered insert.
+        """
+        raise NotImplementedError
+
+    def find_by(self, field, value):
+        """Return the user whose ``field`` equals ``value``, or None"""
+        raise NotImplementedError
+
+
+class RefreshTokenStore:
+    """Refresh token documents keyed by ``token_hash``, expiring at ``expires_at``"""
+
+    def insert(self, document):
+        raise NotImplementedError
+
+    def consume(self, token_hash, now):
+        """Atomically mark an unused, unrevoked, unexpired token as used
+
+        Returns the document as it was before, or None.
+        """
+        raise NotImplementedError
+
+    def get(self, token_hash):
+        raise NotImplementedError
+
+    def revoke_family(self, family_id):
+        raise NotImplementedError
+
+
+class RevokedTokenStore:
+    """Revoked access token ids (``jti``), kept until the token would have expired"""
+
+    def insert(self, document):
+        """Record a revocation; revoking the same ``jti`` twice is not an error"""
+        raise NotImplementedError
+
+    def revoked_since(self, after, now):
+        """Revocations made at or after ``after`` (all if None) of tokens unexpired at ``now``"""
+        raise NotImplementedError
+
+
+class AuditStore:
+    """Append-only audit entries, ordered by their ``_id`` and expiring at ``expires_at``"""
+
+    def insert_many(self, entries):
+        """Append entries; ones already stored by a retried batch are skipped"""
+        raise NotImplementedError
+
+    def find(self, before=None, limit=50, user_id=None, action=None):
+        """Entries newest first, older than the ``_id`` ``before`` when given"""
+        raise NotImplementedError
+
+
+class ListStore:
+    """Shared task lists, plus one membership per ``(user_id, list_id)``
+
+    Tasks of a list are stored with the list's id as their ``user_id``.
+    """
+
+    def insert(self, document):
+        """Insert a list, setting ``document['_id']``, and return its id"""
+        raise NotImplementedError
+
+    def find(self, list_ids):
+        """Return the lists with the given ids"""
+        raise NotImplementedError
+
+    def delete(self, list_id):
+        """Delete a list and all of its memberships; True if it existed"""
+        raise NotImplementedError
+
+    def set_member(self, list_id, user_id, role, now):
+        """Add a member or change their role"""
+        raise NotImplementedError
+
+    def remove_member(self, list_id, user_id):
+        """Remove a membership; True if it existed"""
+        raise NotImplementedError
+
+    def memberships(self, user_id):
+        """Every ``{'list_id', 'role'}`` membership of a user"""
+        raise NotImplementedError
+
+    def members(self, list_id):
+        """Every ``{'user_id', 'role', 'added_at'}`` membership of a list"""
+        raise NotImplementedError
+
+
+class StorageEngine:
+    """A set of stores plus the operations the app runs on the engine itself"""
+
+    name = None
+
+    def task_store(self, name):
+        """Return the TaskStore for ``tasks`` or ``tasks_archive``"""
+        if name not in ('tasks', 'tasks_archive'):
+            raise ValueError(f'Unknown task collection {name!r}')
+        return getattr(self, name)
+
+    def ping(self, timeout):
+        """Raise if the engine cannot serve requests within ``timeout`` seconds"""
+        raise NotImplementedError
+
+    def collection_stats(self, name):
+        """Document count, data size and index sizes of a collection"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Remove every document; used by the test suite"""
+        raise NotImplementedError
+
+    def reinit(self, app):
+        """Reconnect in a freshly forked worker process"""
+
+    def close(self):
+        """Release connections held by this process"""
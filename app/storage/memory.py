@@ -0,0 +1,768 @@
+import bisect
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import chain, islice
+import bson
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.storage.base import (
+    AuditStore, ListStore, RefreshTokenStore, RevokedTokenStore, StorageEngine, TaskStore, UserStore
+)
+
+# Documents without created_at sort last, as MongoDB sorts missing fields as null
+_NO_DATE = datetime.min
+
+_ABSENT = object()
+
+# Sorts after every (datetime, ObjectId) key with the same datetime
+_LAST_ID = ObjectId('f' * 24)
+
+
+def normalize(value):
+    """Return ``value`` as MongoDB would hand it back: naive UTC, millisecond datetimes"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+def clone(document, fields=None):
+    """Copy a stored document, keeping only ``_id`` and ``fields`` if given"""
+    if fields is None:
+        return {key: _clone_value(value) for key, value in document.items()}
+    return {
+        key: _clone_value(value) for key, value in document.items()
+        if key == '_id' or fields.get(key)
+    }
+
+
+def _clone_value(value):
+    if isinstance(value, dict):
+        return clone(value)
+    if isinstance(value, list):
+        return [_clone_value(item) for item in value]
+    return value
+
+
+def _insort(index, bucket, key):
+    bisect.insort(index.setdefault(bucket, []), key)
+
+
+def _discard(index, bucket, key):
+    keys = index[bucket]
+    del keys[bisect.bisect_left(keys, key)]
+    if not keys:
+        del index[bucket]
+
+
+def document_stats(documents):
+    return {
+        'count': len(documents),
+        'size': sum(len(bson.encode(document)) for document in documents),
+        'total_index_size': 0,
+        'index_sizes': {}
+    }
+
+
+class MemoryTaskStore(TaskStore):
+    """Tasks in a dict, with sorted ``(value, _id)`` lists standing in for indexes
+
+    ``_by_owner`` orders each owner's tasks by created_at, and ``_by_tag``
+    does the same per ``(owner, tag)``. ``_by_rank`` orders them by rank,
+    unranked tasks (an empty key) first, and ``_by_ancestor`` lists the
+    tasks below each task. ``_due_by_owner`` and ``_reminders``
+    hold open tasks with a due date, like the partial due_at indexes;
+    ``_reminders`` only while no reminder has been sent. ``_tag_counts``
+    keeps ``{(tag, completed): count}`` per owner for the tag facets.
+    """
+
+    INDEXED_FIELDS = {'user_id', 'created_at', 'completed', 'due_at', 'reminder_sent_at',
+                      'tags', 'rank', 'ancestors'}
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    @staticmethod
+    def _sort_key(document):
+        return document.get('created_at') or _NO_DATE, document['_id']
+
+    @staticmethod
+    def _due_key(document):
+        due_at = document.get('due_at')
+        if document.get('completed') is False and isinstance(due_at, datetime):
+            return due_at, document['_id']
+        return None
+
+    def _index(self, document, update=_insort, delta=1):
+        owner = document.get('user_id')
+        sort_key = self._sort_key(document)
+        update(self._by_owner, owner, sort_key)
+        update(self._by_rank, owner, (document.get('rank') or '', document['_id']))
+        for ancestor in document.get('ancestors') or ():
+            update(self._by_ancestor, ancestor, document['_id'])
+
+        counts = self._tag_counts.setdefault(owner, {})
+        for tag in set(document.get('tags') or ()):
+            update(self._by_tag, (owner, tag), sort_key)
+            key = (tag, document.get('completed'))
+            counts[key] = counts.get(key, 0) + delta
+            if not counts[key]:
+                del counts[key]
+        if not counts:
+            del self._tag_counts[owner]
+
+        due_key = self._due_key(document)
+        if due_key is not None:
+            update(self._due_by_owner, owner, due_key)
+            if document.get('reminder_sent_at') is None:
+                update(self._reminders, None, due_key)
+
+    def _unindex(self, document):
+        self._index(document, update=_discard, delta=-1)
+
+    def _newest_first(self, owners, tags=None):
+        """Yield documents of ``owners`` from newest to oldest created_at
+
+        With ``tags``, only each owner's shortest tag list is walked and the
+        other tags are checked on the documents.
+        """
+        if owners is None:
+            owners = list(self._by_owner)
+
+        lists = []
+        for owner in owners:
+            if tags:
+                keys = min((self._by_tag.get((owner, tag), ()) for tag in tags), key=len)
+            else:
+                keys = self._by_owner.get(owner, ())
+            if keys:
+                lists.append(keys)
+
+        keys = heapq.merge(*(reversed(keys) for keys in lists), reverse=True)
+        documents = (self._documents[task_id] for _, task_id in keys)
+        if tags and len(tags) > 1:
+            wanted = set(tags)
+            documents = (d for d in documents if wanted.issubset(d.get('tags') or ()))
+        return documents
+
+    def _in_rank_order(self, owners, tags=None):
+        """Yield documents of ``owners`` owner by owner, each in ascending rank order
+
+        Owners come in the order MongoDB sorts them: strings before ObjectIds.
+        """
+        if owners is None:
+            owners = list(self._by_rank)
+        owners = sorted((owner for owner in set(owners) if owner in self._by_rank),
+                        key=lambda owner: (isinstance(owner, ObjectId), str(owner)))
+        keys = chain.from_iterable(self._by_rank[owner] for owner in owners)
+        documents = (self._documents[task_id] for _, task_id in keys)
+        if tags:
+            wanted = set(tags)
+            documents = (d for d in documents if wanted.issubset(d.get('tags') or ()))
+        return documents
+
+    def _owned(self, task_id, owners):
+        document = self._documents.get(task_id)
+        if document is None or (owners is not None and document.get('user_id') not in owners):
+            return None
+        return document
+
+    def _set(self, document, fields):
+        fields = normalize(fields)
+        if all(document.get(key, _ABSENT) == value for key, value in fields.items()):
+            return False
+
+        reindex = not self.INDEXED_FIELDS.isdisjoint(fields)
+        if reindex:
+            self._unindex(document)
+        document.update(fields)
+        if reindex:
+            self._index(document)
+        return True
+
+    def _remove(self, task_id):
+        self._unindex(self._documents.pop(task_id))
+
+    def insert(self, document):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+
+        with self._lock:
+            if document['_id'] in self._documents:
+                raise DuplicateKeyError(f'E11000 duplicate key error dup key: {document["_id"]}', 11000)
+            stored = normalize(document)
+            self._documents[stored['_id']] = stored
+            self._index(stored)
+        return document['_id']
+
+    def insert_many(self, documents):
+        with self._lock:
+            for document in documents:
+                if document.get('_id') not in self._documents:
+                    self.insert(document)
+
+    def get(self, task_id, owners=None, fields=None):
+        with self._lock:
+            document = self._owned(task_id, owners)
+            return clone(document, fields) if document is not None else None
+
+    def find_page(self, owners, completed=None, skip=0, limit=10, fields=None,
+                  codec_options=None, tags=None, sort='created_at'):
+        with self._lock:
+            if sort == 'rank':
+                documents = self._in_rank_order(owners, tags)
+            else:
+                documents = self._newest_first(owners, tags)
+            if completed is not None:
+                documents = (d for d in documents if d.get('completed') == completed)
+            page = [clone(d, fields) for d in islice(documents, skip, skip + limit if limit else None)]
+
+        if codec_options is not None:
+            page = [bson.decode(bson.encode(document), codec_options) for document in page]
+        return page
+
+    def count(self, owners=None, completed=None, tags=None):
+        with self._lock:
+            if completed is None and not tags:
+                if owners is None:
+                    return len(self._documents)
+                return sum(len(self._by_owner.get(owner, ())) for owner in owners)
+            return sum(1 for d in self._newest_first(owners, tags)
+                       if completed is None or d.get('completed') == completed)
+
+    def tag_counts(self, owners, completed=None, tags=None):
+        counts = {}
+        with self._lock:
+            if tags:
+                # Facets within a selection have to look at the selected tasks
+                for document in self._newest_first(owners, tags):
+                    if completed is None or document.get('completed') == completed:
+                        for tag in set(document.get('tags') or ()):
+                            counts[tag] = counts.get(tag, 0) + 1
+                return counts
+
+            for owner in (self._tag_counts if owners is None else owners):
+                for (tag, state), count in self._tag_counts.get(owner, {}).items():
+                    if completed is None or state == completed:
+                        counts[tag] = counts.get(tag, 0) + count
+        return counts
+
+    def update(self, task_id, owners, fields):
+        with self._lock:
+            document = self._owned(task_id, owners)
+            return document is not None and self._set(document, fields)
+
+    def delete(self, task_id, owners):
+        with self._lock:
+            if self._owned(task_id, owners) is None:
+                return False
+            self._remove(task_id)
+            return True
+
+    def delete_owned(self, owners):
+        with self._lock:
+            task_ids = [d['_id'] for d in self._newest_first(owners)]
+            for task_id in task_ids:
+                self._remove(task_id)
+            return len(task_ids)
+
+    def set_fields(self, updates, write_concern=None, batch_size=500):
+        with self._lock:
+            for task_id, fields in updates.items():
+                document = self._documents.get(task_id)
+                if document is not None:
+                    self._set(document, fields)
+
+    def _completed_before(self, document, cutoff):
+        updated_at = document.get('updated_at')
+        return (document.get('completed') is True and
+                isinstance(updated_at, datetime) and updated_at < cutoff)
+
+    def find_completed_before(self, cutoff, limit):
+        with self._lock:
+            matches = [d for d in self._documents.values() if self._completed_before(d, cutoff)]
+            oldest = heapq.nsmallest(limit, matches, key=lambda d: d['updated_at'])
+            return [clone(document) for document in oldest]
+
+    def delete_completed(self, task_ids, cutoff):
+        deleted = 0
+        with self._lock:
+            for task_id in task_ids:
+                document = self._documents.get(task_id)
+                if document is not None and self._completed_before(document, cutoff):
+                    self._remove(task_id)
+                    deleted += 1
+        return deleted
+
+    def existing_ids(self, task_ids):
+        with self._lock:
+            return [task_id for task_id in task_ids if task_id in self._documents]
+
+    def delete_ids(self, task_ids):
+        with self._lock:
+            present = [task_id for task_id in task_ids if task_id in self._documents]
+            for task_id in present:
+                self._remove(task_id)
+            return len(present)
+
+    def find_due(self, owners, before, limit):
+        with self._lock:
+            lists = [self._due_by_owner[owner] for owner in owners if owner in self._due_by_owner]
+            due = heapq.merge(*(keys[:bisect.bisect_right(keys, (before, _LAST_ID))]
+                                for keys in lists))
+            return [clone(self._documents[task_id]) for _, task_id in islice(due, limit)]
+
+    def find_due_reminders(self, after, before, limit):
+        with self._lock:
+            keys = self._reminders.get(None, [])
+            start = bisect.bisect_right(keys, (after, _LAST_ID))
+            end = min(bisect.bisect_right(keys, (before, _LAST_ID)), start + limit)
+            return [clone(self._documents[task_id]) for _, task_id in keys[start:end]]
+
+    def next_due_at(self, after):
+        with self._lock:
+            keys = self._reminders.get(None, [])
+            index = bisect.bisect_right(keys, (after, _LAST_ID))
+            return keys[index][0] if index < len(keys) else None
+
+    def claim_reminder(self, task_id, now):
+        with self._lock:
+            document = self._documents.get(task_id)
+            if (document is None or document.get('completed') is not False or
+                    document.get('reminder_sent_at') is not None):
+                return False
+            return self._set(document, {'reminder_sent_at': now})
+
+    def subtree(self, root_id, owners, fields=None):
+        with self._lock:
+            root = self._owned(root_id, owners)
+            if root is None:
+                return []
+            below = (self._owned(task_id, owners) for task_id in self._by_ancestor.get(root_id, ()))
+            return [clone(root, fields)] + [clone(d, fields) for d in below if d is not None]
+
+    def move_subtree(self, task_id, owners, old_ancestors, new_ancestors, fields):
+        depth = len(old_ancestors or ())
+        with self._lock:
+            document = self._owned(task_id, owners)
+            if document is None or document.get('ancestors') != old_ancestors:
+                return False
+            self._set(document, {**fields, 'ancestors': new_ancestors})
+
+            for descendant_id in list(self._by_ancestor.get(task_id, ())):
+                descendant = self._owned(descendant_id, owners)
+                ancestors = descendant.get('ancestors') if descendant is not None else None
+                if ancestors and len(ancestors) > depth and ancestors[depth] == task_id:
+                    self._set(descendant, {'ancestors': new_ancestors + ancestors[depth:]})
+            return True
+
+    def next_rank(self, owners, rank, exclude_id=None):
+        with self._lock:
+            first = None
+            for owner in (self._by_rank if owners is None else owners):
+                keys = self._by_rank.get(owner, ())
+                start = 0 if rank is None else bisect.bisect_right(keys, (rank, _LAST_ID))
+                for key in islice(keys, start, None):
+                    if key[1] != exclude_id:
+                        first = key if first is None else min(first, key)
+                        break
+            return clone(self._documents[first[1]], {'rank': 1}) if first else None
+
+    def rank_order(self, owners):
+        with self._lock:
+            documents = sorted(self._newest_first(owners), key=lambda d: d.get('rank') or '')
+            return [clone(document, {'rank': 1}) for document in documents]
+
+    def replace_ranks(self, changes):
+        changed = 0
+        with self._lock:
+            for task_id, old, new in changes:
+                document = self._documents.get(task_id)
+                if document is not None and document.get('rank') == old:
+                    changed += self._set(document, {'rank': new})
+        return changed
+
+    def set_rank(self, task_id, old, new, after_id):
+        with self._lock:
+            document = self._documents.get(task_id)
+            if document is None or document.get('rank') != old:
+                return False
+            return self._set(document, {'rank': new, 'rank_after': after_id})
+
+    def find_unranked(self, after_id, limit):
+        with self._lock:
+            matches = sorted(
+                task_id for task_id, document in self._documents.items()
+                if not document.get('rank') and (after_id is None or task_id > after_id)
+            )
+            return [{'_id': task_id, 'user_id': self._documents[task_id]['user_id']}
+                    for task_id in matches[:limit]]
+
+    def find_string_owners(self, after_id, limit):
+        with self._lock:
+            matches = sorted(
+                task_id for task_id, document in self._documents.items()
+                if isinstance(document.get('user_id'), str) and (after_id is None or task_id > after_id)
+            )
+            return [{'_id': task_id, 'user_id': self._documents[task_id]['user_id']}
+                    for task_id in matches[:limit]]
+
+    def replace_owners(self, changes):
+        changed = 0
+        with self._lock:
+            for task_id, old, new in changes:
+                document = self._documents.get(task_id)
+                if (document is not None and type(document.get('user_id')) is type(old)
+                        and document['user_id'] == old):
+                    changed += self._set(document, {'user_id': new})
+        return changed
+
+    def stats(self):
+        with self._lock:
+            return document_stats(list(self._documents.values()))
+
+    def reset(self):
+        with self._lock:
+            self._documents = {}
+            self._by_owner = {}
+            self._by_tag = {}
+            self._by_rank = {}
+            self._by_ancestor = {}
+            self._tag_counts = {}
+            self._due_by_owner = {}
+            self._reminders = {}
+
+
+class MemoryUserStore(UserStore):
+    """Users in a dict, with a dict per unique field"""
+
+    UNIQUE_FIELDS = ('username', 'email')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _insert(self, document):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+
+        for field in self.UNIQUE_FIELDS:
+            if document.get(field) in self._unique[field]:
+                message = (f'E11000 duplicate key error collection: users index: {field}_1 '
+                           f'dup key: {{ {field}: "{document.get(field)}" }}')
+                raise DuplicateKeyError(message, 11000, {
+                    'code': 11000,
+                    'errmsg': message,
+                    'keyPattern': {field: 1},
+                    'keyValue': {field: document.get(field)}
+                })
+
+        stored = normalize(document)
+        self._documents[stored['_id']] = stored
+        for field in self.UNIQUE_FIELDS:
+            self._unique[field][stored.get(field)] = stored['_id']
+        return document['_id']
+
+    def insert(self, document):
+        with self._lock:
+            return self._insert(document)
+
+    def insert_many(self, documents):
+        errors = []
+        with self._lock:
+            for index, document in enumerate(documents):
+                try:
+                    self._insert(document)
+                except DuplicateKeyError as e:
+                    errors.append({'index': index, **e.details})
+        return errors
+
+    def find_by(self, field, value):
+        with self._lock:
+            if field == '_id':
+                document = self._documents.get(value)
+            elif field in self._unique:
+                document = self._documents.get(self._unique[field].get(value))
+            else:
+                document = next((d for d in self._documents.values() if d.get(field) == value), None)
+            return clone(document) if document is not None else None
+
+    def stats(self):
+        with self._lock:
+            return document_stats(list(self._documents.values()))
+
+    def reset(self):
+        with self._lock:
+            self._documents = {}
+            self._unique = {field: {} for field in self.UNIQUE_FIELDS}
+
+
+class MemoryRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens in a dict keyed by hash, expired about once a minute like a TTL index"""
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+        expired_before = datetime.utcnow()
+        for token_hash, document in list(self._documents.items()):
+            if document['expires_at'] <= expired_before:
+                del self._documents[token_hash]
+
+    def insert(self, document):
+        with self._lock:
+            self._sweep()
+            if document['token_hash'] in self._documents:
+                raise DuplicateKeyError('E11000 duplicate key error index: token_hash_1', 11000)
+            if '_id' not in document:
+                document['_id'] = ObjectId()
+            self._documents[document['token_hash']] = normalize(document)
+            return document['_id']
+
+    def consume(self, token_hash, now):
+        with self._lock:
+            self._sweep()
+            document = self._documents.get(token_hash)
+            if (document is None or document['used_at'] is not None or
+                    document['revoked'] or document['expires_at'] <= now):
+                return None
+            original = clone(document)
+            document['used_at'] = normalize(now)
+            return original
+
+    def get(self, token_hash):
+        with self._lock:
+            document = self._documents.get(token_hash)
+            return clone(document) if document is not None else None
+
+    def revoke_family(self, family_id):
+        with self._lock:
+            for document in self._documents.values():
+                if document['family_id'] == family_id:
+                    document['revoked'] = True
+
+    def stats(self):
+        with self._lock:
+            return document_stats(list(self._documents.values()))
+
+    def reset(self):
+        with self._lock:
+            self._documents = {}
+            self._next_sweep = 0.0
+
+
+class MemoryRevokedTokenStore(RevokedTokenStore):
+    """Revocations in a dict keyed by ``jti``, expired about once a minute like a TTL index"""
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+        expired_before = datetime.utcnow()
+        for jti, document in list(self._documents.items()):
+            if document['expires_at'] <= expired_before:
+                del self._documents[jti]
+
+    def insert(self, document):
+        with self._lock:
+            self._sweep()
+            self._documents.setdefault(document['jti'], normalize(document))
+
+    def revoked_since(self, after, now):
+        after, now = normalize(after), normalize(now)
+        with self._lock:
+            return [
+                {field: document[field] for field in ('jti', 'expires_at', 'revoked_at')}
+                for document in self._documents.values()
+                if document['expires_at'] > now and (after is None or document['revoked_at'] >= after)
+            ]
+
+    def stats(self):
+        with self._lock:
+            return document_stats(list(self._documents.values()))
+
+    def reset(self):
+        with self._lock:
+            self._documents = {}
+            self._next_sweep = 0.0
+
+
+class MemoryAuditStore(AuditStore):
+    """Audit entries by ``_id``, expired about once a minute like a TTL index"""
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+        expired_before = datetime.utcnow()
+        for entry_id, entry in list(self._documents.items()):
+            if entry['expires_at'] <= expired_before:
+                del self._documents[entry_id]
+        self._ids = sorted(self._documents)
+
+    def insert_many(self, entries):
+        with self._lock:
+            self._sweep()
+            for entry in entries:
+                if entry['_id'] not in self._documents:
+                    self._documents[entry['_id']] = normalize(entry)
+                    bisect.insort(self._ids, entry['_id'])
+
+    def find(self, before=None, limit=50, user_id=None, action=None):
+        with self._lock:
+            end = bisect.bisect_left(self._ids, before) if before is not None else len(self._ids)
+            found = []
+            for index in range(end - 1, -1, -1):
+                if len(found) == limit:
+                    break
+                entry = self._documents[self._ids[index]]
+                if (user_id is None or entry['user_id'] == user_id) and \
+                        (action is None or entry['action'] == action):
+                    found.append(clone(entry))
+            return found
+
+    def stats(self):
+        with self._lock:
+            return document_stats(list(self._documents.values()))
+
+    def reset(self):
+        with self._lock:
+            self._documents = {}
+            self._ids = []
+            self._next_sweep = 0.0
+
+
+class MemoryListStore(ListStore):
+    """Lists in a dict, memberships keyed by user and by list"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def insert(self, document):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        with self._lock:
+            self._lists[document['_id']] = normalize(document)
+        return document['_id']
+
+    def find(self, list_ids):
+        with self._lock:
+            return [clone(self._lists[list_id]) for list_id in list_ids if list_id in self._lists]
+
+    def delete(self, list_id):
+        with self._lock:
+            for user_id in self._by_list.pop(list_id, {}):
+                del self._by_user[user_id][list_id]
+            return self._lists.pop(list_id, None) is not None
+
+    def set_member(self, list_id, user_id, role, now):
+        with self._lock:
+            membership = self._by_list.setdefault(list_id, {}).get(user_id)
+            if membership is None:
+                membership = {'list_id': list_id, 'user_id': user_id, 'added_at': normalize(now)}
+                self._by_list[list_id][user_id] = membership
+                self._by_user.setdefault(user_id, {})[list_id] = membership
+            membership['role'] = role
+
+    def remove_member(self, list_id, user_id):
+        with self._lock:
+            if self._by_list.get(list_id, {}).pop(user_id, None) is None:
+                return False
+            del self._by_user[user_id][list_id]
+            return True
+
+    def memberships(self, user_id):
+        with self._lock:
+            return [{'list_id': m['list_id'], 'role': m['role']}
+                    for m in self._by_user.get(user_id, {}).values()]
+
+    def members(self, list_id):
+        with self._lock:
+            return [{'user_id': m['user_id'], 'role': m['role'], 'added_at': m['added_at']}
+                    for m in self._by_list.get(list_id, {}).values()]
+
+    def stats(self):
+        with self._lock:
+            return document_stats(list(self._lists.values()))
+
+    def reset(self):
+        with self._lock:
+            self._lists = {}
+            self._by_list = {}
+            self._by_user = {}
+
+
+class MemoryStorage(StorageEngine):
+    """Engine that keeps every collection in this process's memory
+
+    Meant for tests, benchmarks and single-process development; data does
+    not survive a restart and is not shared between workers.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self.tasks = MemoryTaskStore()
+        self.tasks_archive = MemoryTaskStore()
+        self.users = MemoryUserStore()
+        self.refresh_tokens = MemoryRefreshTokenStore()
+        self.lists = MemoryListStore()
+        self.revoked_tokens = MemoryRevokedTokenStore()
+        self.audit_log = MemoryAuditStore()
+
+    def _collections(self):
+        return {
+            'tasks': self.tasks,
+            'tasks_archive': self.tasks_archive,
+            'users': self.users,
+            'refresh_tokens': self.refresh_tokens,
+            'revoked_tokens': self.revoked_tokens,
+            'lists': self.lists,
+            'audit_log': self.audit_log
+        }
+
+    def ping(self, timeout):
+        pass
+
+    def collection_stats(self, name):
+        collection = self._collections().get(name)
+        if collection is None:
+            return {'count': 0, 'size': 0, 'total_index_size': 0, 'index_sizes': {}}
+        return collection.stats()
+
+    def reset(self):
+        for collection in self._collections().values():
+            collection.reset()
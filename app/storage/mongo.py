@@ -0,0 +1,437 @@
+import pymongo
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.write_concern import WriteConcern
+from app.extensions import mongo
+from app.storage.base import (
+    AuditStore, ListStore, RefreshTokenStore, RevokedTokenStore, StorageEngine, TaskStore, UserStore
+)
+
+
+def parse_write_concern(value):
+    """Turn a config value such as '0', '1' or 'majority' into a WriteConcern"""
+    value = str(value)
+    return WriteConcern(w=int(value) if value.isdigit() else value)
+
+
+def owner_query(owners=None, completed=None, tags=None):
+    query = {}
+    if owners is not None:
+        query['user_id'] = owners[0] if len(owners) == 1 else {'$in': list(owners)}
+    if completed is not None:
+        query['completed'] = completed
+    if tags:
+        query['tags'] = {'$all': list(tags)}
+    return query
+
+
+class MongoTaskStore(TaskStore):
+    """Tasks in a MongoDB collection"""
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def collection(self):
+        return mongo.db[self.name]
+
+    def insert(self, document):
+        return self.collection.insert_one(document).inserted_id
+
+    def insert_many(self, documents):
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if any(err['code'] != 11000 for err in e.details['writeErrors']):
+                raise
+
+    def get(self, task_id, owners=None, fields=None):
+        return self.collection.find_one({'_id': task_id, **owner_query(owners)}, fields)
+
+    def find_page(self, owners, completed=None, skip=0, limit=10, fields=None,
+                  codec_options=None, tags=None, sort='created_at'):
+        collection = self.collection
+        if codec_options is not None:
+            collection = collection.with_options(codec_options=codec_options)
+        # Each owner has its own manual order; ranks can tie while a move races
+        # a rebalance, so _id keeps skip pages stable
+        order = [('user_id', 1), ('rank', 1), ('_id', 1)] if sort == 'rank' else [('created_at', -1)]
+        return list(collection.find(owner_query(owners, completed, tags), fields).sort(
+            order
+        ).skip(skip).limit(limit))
+
+    def count(self, owners=None, completed=None, tags=None):
+        return self.collection.count_documents(owner_query(owners, completed, tags))
+
+    def tag_counts(self, owners, completed=None, tags=None):
+        results = self.collection.aggregate([
+            {'$match': owner_query(owners, completed, tags)},
+            {'$project': {'_id': 0, 'tags': 1}},
+            {'$unwind': '$tags'},
+            {'$group': {'_id': '$tags', 'count': {'$sum': 1}}}
+        ])
+        return {result['_id']: result['count'] for result in results}
+
+    def update(self, task_id, owners, fields):
+        result = self.collection.update_one(
+            {'_id': task_id, **owner_query(owners)},
+            {'$set': fields}
+        )
+        return result.modified_count > 0
+
+    def delete(self, task_id, owners):
+        result = self.collection.delete_one({'_id': task_id, **owner_query(owners)})
+        return result.deleted_count > 0
+
+    def delete_owned(self, owners):
+        return self.collection.delete_many(owner_query(owners)).deleted_count
+
+    def set_fields(self, updates, write_concern=None, batch_size=500):
+        operations = [
+            UpdateOne({'_id': task_id}, {'$set': fields})
+            for task_id, fields in updates.items()
+        ]
+
+        collection = self.collection
+        if write_concern is not None:
+            collection = collection.with_options(write_concern=parse_write_concern(write_concern))
+        for start in range(0, len(operations), batch_size):
+            collection.bulk_write(operations[start:start + batch_size], ordered=False)
+
+    def find_completed_before(self, cutoff, limit):
+        query = {'completed': True, 'updated_at': {'$lt': cutoff}}
+        return list(self.collection.find(query).sort('updated_at', 1).limit(limit))
+
+    def delete_completed(self, task_ids, cutoff):
+        result = self.collection.delete_many({
+            '_id': {'$in': list(task_ids)},
+            'completed': True,
+            'updated_at': {'$lt': cutoff}
+        })
+        return result.deleted_count
+
+    def existing_ids(self, task_ids):
+        return [t['_id'] for t in self.collection.find({'_id': {'$in': list(task_ids)}}, {'_id': 1})]
+
+    def delete_ids(self, task_ids):
+        return self.collection.delete_many({'_id': {'$in': list(task_ids)}}).deleted_count
+
+    def find_due(self, owners, before, limit):
+        query = owner_query(owners, completed=False)
+        query['due_at'] = {'$type': 'date', '$lte': before}
+        return list(self.collection.find(query).sort('due_at', 1).limit(limit))
+
+    @staticmethod
+    def _reminder_query(after):
+        return {
+            'completed': False,
+            'due_at': {'$type': 'date', '$gt': after},
+            'reminder_sent_at': None
+        }
+
+    def find_due_reminders(self, after, before, limit):
+        query = self._reminder_query(after)
+        query['due_at']['$lte'] = before
+        return list(self.collection.find(query).sort('due_at', 1).limit(limit))
+
+    def next_due_at(self, after):
+        task = self.collection.find_one(self._reminder_query(after), {'due_at': 1},
+                                        sort=[('due_at', 1)])
+        return task['due_at'] if task else None
+
+    def claim_reminder(self, task_id, now):
+        result = self.collection.update_one(
+            {'_id': task_id, 'completed': False, 'reminder_sent_at': None},
+            {'$set': {'reminder_sent_at': now}}
+        )
+        return result.modified_count == 1
+
+    def subtree(self, root_id, owners, fields=None):
+        query = {'$or': [{'_id': root_id}, {'ancestors': root_id}], **owner_query(owners)}
+        tasks = list(self.collection.find(query, fields))
+        root = [task for task in tasks if task['_id'] == root_id]
+        return root + [task for task in tasks if task['_id'] != root_id] if root else []
+
+    def move_subtree(self, task_id, owners, old_ancestors, new_ancestors, fields):
+        depth = len(old_ancestors or ())
+        # The guarded update goes first on its own: if a concurrent move got
+        # there before us, the descendants must keep the prefix it gave them
+        moved = self.collection.update_one(
+            {'_id': task_id, 'ancestors': old_ancestors, **owner_query(owners)},
+            {'$set': {**fields, 'ancestors': new_ancestors}}
+        )
+        if moved.matched_count == 0:
+            return False
+
+        # Only descendants that still sit below task_id at the old depth
+        self.collection.update_many(
+            {'ancestors': task_id, f'ancestors.{depth}': task_id, **owner_query(owners)},
+            [{'$set': {'ancestors': {'$concatArrays': [
+                new_ancestors,
+                {'$slice': ['$ancestors', depth, 2 ** 31 - 1]}
+            ]}}}]
+        )
+        return True
+
+    def next_rank(self, owners, rank, exclude_id=None):
+        query = owner_query(owners)
+        if rank is not None:
+            query['rank'] = {'$gt': rank}
+        if exclude_id is not None:
+            query['_id'] = {'$ne': exclude_id}
+        return self.collection.find_one(query, {'rank': 1}, sort=[('rank', 1), ('_id', 1)])
+
+    def rank_order(self, owners):
+        return list(self.collection.find(owner_query(owners), {'rank': 1}).sort(
+            [('rank', 1), ('created_at', -1)]
+        ))
+
+    def replace_ranks(self, changes):
+        operations = [
+            UpdateOne({'_id': task_id, 'rank': old}, {'$set': {'rank': new}})
+            for task_id, old, new in changes
+        ]
+        if not operations:
+            return 0
+        return self.collection.bulk_write(operations, ordered=False).modified_count
+
+    def set_rank(self, task_id, old, new, after_id):
+        result = self.collection.update_one(
+            {'_id': task_id, 'rank': old},
+            {'$set': {'rank': new, 'rank_after': after_id}}
+        )
+        return result.modified_count > 0
+
+    def find_unranked(self, after_id, limit):
+        # Matches a missing rank as well as null
+        query = {'rank': None}
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        return list(self.collection.find(query, {'user_id': 1}).sort('_id', 1).limit(limit))
+
+    def find_string_owners(self, after_id, limit):
+        query = {'user_id': {'$type': 'string'}}
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        return list(self.collection.find(query, {'user_id': 1}).sort('_id', 1).limit(limit))
+
+    def replace_owners(self, changes):
+        operations = [
+            UpdateOne({'_id': task_id, 'user_id': old}, {'$set': {'user_id': new}})
+            for task_id, old, new in changes
+        ]
+        if not operations:
+            return 0
+        return self.collection.bulk_write(operations, ordered=False).modified_count
+
+
+class MongoUserStore(UserStore):
+    """Users in the ``users`` collection, unique through its indexes"""
+
+    @property
+    def collection(self):
+        return mongo.db.users
+
+    def insert(self, document):
+        return self.collection.insert_one(document).inserted_id
+
+    def insert_many(self, documents):
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            return e.details['writeErrors']
+        return []
+
+    def find_by(self, field, value):
+        return self.collection.find_one({field: value})
+
+
+class MongoRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens in the ``refresh_tokens`` collection, expired by a TTL index"""
+
+    @property
+    def collection(self):
+        return mongo.db.refresh_tokens
+
+    def insert(self, document):
+        return self.collection.insert_one(document).inserted_id
+
+    def consume(self, token_hash, now):
+        return self.collection.find_one_and_update(
+            {
+                'token_hash': token_hash,
+                'used_at': None,
+                'revoked': False,
+                'expires_at': {'$gt': now}
+            },
+            {'$set': {'used_at': now}}
+        )
+
+    def get(self, token_hash):
+        return self.collection.find_one({'token_hash': token_hash})
+
+    def revoke_family(self, family_id):
+        self.collection.update_many(
+            {'family_id': family_id},
+            {'$set': {'revoked': True}}
+        )
+
+
+class MongoRevokedTokenStore(RevokedTokenStore):
+    """Revocations in the ``revoked_tokens`` collection, expired by a TTL index"""
+
+    @property
+    def collection(self):
+        return mongo.db.revoked_tokens
+
+    def insert(self, document):
+        self.collection.update_one({'jti': document['jti']}, {'$setOnInsert': document}, upsert=True)
+
+    def revoked_since(self, after, now):
+        query = {'expires_at': {'$gt': now}}
+        if after is not None:
+            query['revoked_at'] = {'$gte': after}
+        return list(self.collection.find(query, {'_id': 0, 'jti': 1, 'expires_at': 1, 'revoked_at': 1}))
+
+
+class MongoAuditStore(AuditStore):
+    """Audit entries in the ``audit_log`` collection, expired by a TTL index"""
+
+    @property
+    def collection(self):
+        return mongo.db.audit_log
+
+    def insert_many(self, entries):
+        try:
+            self.collection.insert_many(entries, ordered=False)
+        except BulkWriteError as e:
+            if any(err['code'] != 11000 for err in e.details['writeErrors']):
+                raise
+
+    def find(self, before=None, limit=50, user_id=None, action=None):
+        query = {}
+        if before is not None:
+            query['_id'] = {'$lt': before}
+        if user_id is not None:
+            query['user_id'] = user_id
+        if action is not None:
+            query['action'] = action
+        return list(self.collection.find(query).sort('_id', -1).limit(limit))
+
+
+class MongoListStore(ListStore):
+    """Lists in ``lists``, memberships in ``list_members``"""
+
+    def insert(self, document):
+        return mongo.db.lists.insert_one(document).inserted_id
+
+    def find(self, list_ids):
+        return list(mongo.db.lists.find({'_id': {'$in': list(list_ids)}}))
+
+    def delete(self, list_id):
+        mongo.db.list_members.delete_many({'list_id': list_id})
+        return mongo.db.lists.delete_one({'_id': list_id}).deleted_count > 0
+
+    def set_member(self, list_id, user_id, role, now):
+        mongo.db.list_members.update_one(
+            {'user_id': user_id, 'list_id': list_id},
+            {'$set': {'role': role}, '$setOnInsert': {'added_at': now}},
+            upsert=True
+        )
+
+    def remove_member(self, list_id, user_id):
+        result = mongo.db.list_members.delete_one({'user_id': user_id, 'list_id': list_id})
+        return result.deleted_count > 0
+
+    def memberships(self, user_id):
+        # Covered by the (user_id, list_id, role) index
+        return list(mongo.db.list_members.find(
+            {'user_id': user_id}, {'_id': 0, 'list_id': 1, 'role': 1}
+        ))
+
+    def members(self, list_id):
+        return list(mongo.db.list_members.find(
+            {'list_id': list_id}, {'_id': 0, 'user_id': 1, 'role': 1, 'added_at': 1}
+        ))
+
+
+class MongoStorage(StorageEngine):
+    """Production engine: MongoDB through Flask-PyMongo"""
+
+    name = 'mongo'
+
+    def __init__(self, app):
+        mongo.init_app(app)
+        self.tasks = MongoTaskStore('tasks')
+        self.tasks_archive = MongoTaskStore('tasks_archive')
+        self.users = MongoUserStore()
+        self.refresh_tokens = MongoRefreshTokenStore()
+        self.lists = MongoListStore()
+        self.revoked_tokens = MongoRevokedTokenStore()
+        self.audit_log = MongoAuditStore()
+
+        with app.app_context():
+            self.create_indexes()
+
+    @staticmethod
+    def create_indexes():
+        mongo.db.users.create_index('username', unique=True)
+        mongo.db.users.create_index('email', unique=True)
+        mongo.db.tasks.create_index('user_id')
+        mongo.db.tasks.create_index('created_at')
+        # Multikey: one entry per tag, serving ?tag= filters and tag counts
+        mongo.db.tasks.create_index([('user_id', 1), ('tags', 1)])
+        mongo.db.tasks.create_index([('user_id', 1), ('rank', 1), ('_id', 1)])
+        mongo.db.tasks.create_index('ancestors')
+        mongo.db.tasks.create_index(
+            'updated_at',
+            partialFilterExpression={'completed': True}
+        )
+        # Only open tasks with a due date are indexed by due_at
+        open_with_due_date = {'completed': False, 'due_at': {'$type': 'date'}}
+        mongo.db.tasks.create_index([('user_id', 1), ('due_at', 1)],
+                                    partialFilterExpression=open_with_due_date)
+        mongo.db.tasks.create_index('due_at', partialFilterExpression=open_with_due_date)
+        mongo.db.tasks_archive.create_index([('user_id', 1), ('created_at', -1)])
+        mongo.db.list_members.create_index([('user_id', 1), ('list_id', 1)], unique=True)
+        mongo.db.list_members.create_index([('user_id', 1), ('list_id', 1), ('role', 1)])
+        mongo.db.list_members.create_index('list_id')
+        mongo.db.refresh_tokens.create_index('token_hash', unique=True)
+        mongo.db.refresh_tokens.create_index('family_id')
+        mongo.db.refresh_tokens.create_index('expires_at', expireAfterSeconds=0)
+        mongo.db.revoked_tokens.create_index('jti', unique=True)
+        mongo.db.revoked_tokens.create_index('revoked_at')
+        mongo.db.revoked_tokens.create_index('expires_at', expireAfterSeconds=0)
+        mongo.db.audit_log.create_index([('user_id', 1), ('_id', -1)])
+        mongo.db.audit_log.create_index([('action', 1), ('_id', -1)])
+        mongo.db.audit_log.create_index('expires_at', expireAfterSeconds=0)
+
+    def ping(self, timeout):
+        with pymongo.timeout(timeout):
+            mongo.cx.admin.command('ping')
+
+    def collection_stats(self, name):
+        try:
+            stats = next(mongo.db[name].aggregate([{'$collStats': {'storageStats': {}}}]))
+            storage = stats['storageStats']
+        except (OperationFailure, StopIteration, KeyError):
+            return {'count': 0, 'size': 0, 'total_index_size': 0, 'index_sizes': {}}
+
+        return {
+            'count': storage.get('count', 0),
+            'size': storage.get('size', 0),
+            'total_index_size': storage.get('totalIndexSize', 0),
+            'index_sizes': storage.get('indexSizes', {})
+        }
+
+    def reset(self):
+        for name in ('users', 'tasks', 'tasks_archive', 'refresh_tokens', 'revoked_tokens',
+                     'lists', 'list_members', 'audit_log'):
+            mongo.db[name].delete_many({})
+
+    def reinit(self, app):
+        # pymongo clients are not fork-safe
+        mongo.init_app(app)
+
+    def close(self):
+        mongo.cx.close()
@@ -0,0 +1,187 @@
+import atexit
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from bson import ObjectId
+from flask import has_request_context, request
+from app.storage import storage
+from app.utils.threads import BackgroundThread
+
+
+class AuditLog:
+    """Queue audit entries in memory and append them to ``audit_log`` in batches
+
+    Recording an entry never waits on the database: a background thread
+    writes whatever is queued every AUDIT_FLUSH_INTERVAL seconds, or as soon
+    as a full batch is waiting. Once AUDIT_QUEUE_MAX entries are queued the
+    writer is falling behind, and AUDIT_OVERFLOW decides what happens to new
+    entries: 'drop' counts and discards them, 'spill' writes them from the
+    calling thread, which slows callers down to the speed of the database.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = BackgroundThread(self._run, 'audit-log')
+        self._registered = False
+        self._reset()
+
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        self._queue = deque()
+        self._writing = None
+        self._stats = {
+            'recorded': 0,
+            'written': 0,
+            'batches': 0,
+            'dropped': 0,
+            'spilled': 0,
+            'errors': 0,
+            'max_queue_depth': 0,
+            'last_flush_ms': 0.0
+        }
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+            self._reset()
+
+        if not self._registered:
+            atexit.register(self.shutdown)
+            self._registered = True
+
+    def enabled(self):
+        return self._app is not None and self._app.config['AUDIT_LOG']
+
+    def record(self, action, user_id=None, task_id=None, **details):
+        """Queue an audit entry for ``action`` performed by ``user_id``"""
+        if not self.enabled():
+            return
+
+        config = self._app.config
+        now = datetime.utcnow()
+        entry = {
+            'at': now,
+            'action': action,
+            'user_id': ObjectId(user_id) if user_id is not None else None,
+            'task_id': ObjectId(task_id) if task_id is not None else None,
+            'ip': request.remote_addr if has_request_context() else None,
+            'details': details,
+            'expires_at': now + timedelta(days=config['AUDIT_RETENTION_DAYS'])
+        }
+
+        with self._lock:
+            # Ids are taken under the lock so the queue stays in _id order
+            entry['_id'] = ObjectId()
+            self._stats['recorded'] += 1
+            overflow = len(self._queue) >= config['AUDIT_QUEUE_MAX']
+            if not overflow:
+                self._queue.append(entry)
+                depth = len(self._queue)
+                self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+
+        if overflow:
+            self._wake.set()
+            self._overflow(entry)
+            return
+
+        self._worker.ensure_running(self._stop.clear)
+        if depth >= config['AUDIT_BATCH_SIZE']:
+            self._wake.set()
+
+    def _overflow(self, entry):
+        if self._app.config['AUDIT_OVERFLOW'] == 'spill':
+            try:
+                self._write([entry])
+            except Exception:
+                pass
+            else:
+                self._count('spilled')
+                return
+        self._count('dropped')
+
+    def flush(self):
+        """Write everything queued so far; returns the number of entries written"""
+        batch_size = self._app.config['AUDIT_BATCH_SIZE']
+        written = 0
+
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(batch_size, len(self._queue)))]
+                    self._writing = batch[0]['_id'] if batch else None
+                if not batch:
+                    return written
+
+                started = time.perf_counter()
+                try:
+                    self._write(batch)
+                except Exception:
+                    self._requeue(batch)
+                    return written
+
+                with self._lock:
+                    self._writing = None
+                    self._stats['written'] += len(batch)
+                    self._stats['batches'] += 1
+                    self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+                written += len(batch)
+
+    def _requeue(self, batch):
+        # A failed batch goes back to the front, so the next flush retries it
+        # in order; whatever no longer fits under AUDIT_QUEUE_MAX is dropped
+        with self._lock:
+            self._writing = None
+            self._stats['errors'] += 1
+            room = max(self._app.config['AUDIT_QUEUE_MAX'] - len(self._queue), 0)
+            self._queue.extendleft(reversed(batch[:room]))
+            self._stats['dropped'] += len(batch) - min(room, len(batch))
+
+    def oldest_unwritten(self):
+        """``_id`` of the oldest entry this worker has not written yet, or None
+
+        The queue is in ``_id`` order (failed batches go back to the front),
+        so that is the batch being written or else the head of the queue.
+        """
+        with self._lock:
+            if self._writing is not None:
+                return self._writing
+            return self._queue[0]['_id'] if self._queue else None
+
+    def _write(self, entries):
+        with self._app.app_context():
+            storage.audit_log.insert_many(entries)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._app.config['AUDIT_FLUSH_INTERVAL'])
+            self._wake.clear()
+            self.flush()
+
+    def shutdown(self):
+        """Stop the writer and write whatever is still queued"""
+        self._stop.set()
+        self._wake.set()
+        if self._app is not None:
+            self.flush()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'enabled': bool(self.enabled()),
+                'queue_depth': len(self._queue)
+            }
+
+
+audit = AuditLog()
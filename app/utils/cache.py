@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import OrderedDict
+import bson
+from bson import ObjectId
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+
+
+class LRUCacheBackend:
+    """In-process LRU cache; each worker process holds its own copy"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._counter_expiry = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def counter(self, key):
+        with self._lock:
+            expires_at = self._counter_expiry.get(key)
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._counters[key], self._counter_expiry[key]
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        # Counters live outside the LRU: evicting one would resurrect the
+        # pages it invalidated.
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def set_counter(self, key, value, ttl):
+        # Dropped once ``ttl`` passes; callers store values that never repeat,
+        # so an expired counter cannot lead back to an older entry
+        with self._lock:
+            now = time.monotonic()
+            self._counters[key] = value
+            self._counter_expiry[key] = now + ttl
+            if len(self._counter_expiry) > self.max_entries:
+                for name, expires_at in list(self._counter_expiry.items()):
+                    if expires_at < now:
+                        del self._counters[name], self._counter_expiry[name]
+
+    def evictions(self):
+        return self._evictions
+
+
+class RedisCacheBackend:
+    """Cache shared by every worker, backed by a Redis-compatible client"""
+
+    def __init__(self, client):
+        self._client = client
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND=redis requires the redis package')
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+    def counter(self, key):
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key):
+        return int(self._client.incr(key))
+
+    def set_counter(self, key, value, ttl):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def evictions(self):
+        info = getattr(self._client, 'info', None)
+        return info('stats').get('evicted_keys', 0) if info else 0
+
+
+class TaskCache:
+    """Read-through cache for task documents and first list pages.
+
+    List pages are keyed by a per-user generation number, so a write only has
+    to bump that counter to invalidate every cached page for the user.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._invalidation_callbacks = []
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend=None):
+        if backend is None:
+            name = app.config['CACHE_BACKEND']
+            if name == 'redis':
+                backend = RedisCacheBackend.from_url(app.config['CACHE_REDIS_URL'])
+            elif name == 'lru':
+                backend = LRUCacheBackend(app.config['CACHE_MAX_ENTRIES'])
+
+        self.backend = backend
+        self.ttl = app.config['CACHE_TTL']
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, key, codec_options=DEFAULT_CODEC_OPTIONS):
+        """Return the cached value for ``key`` or None"""
+        if self.backend is None:
+            return None
+
+        data = self.backend.get(key)
+        self._count('hits' if data is not None else 'misses')
+        if data is None:
+            return None
+        return bson.decode(data, codec_options)['v']
+
+    def set(self, key, value):
+        if self.backend is not None:
+            self.backend.set(key, bson.encode({'v': value}), self.ttl)
+
+    def task_key(self, task_id):
+        """Key of a task document at its current version
+
+        Take the key before reading the document: if the task is invalidated
+        while the read is in flight, the stale copy is stored under a version
+        nobody looks up anymore.
+        """
+        if self.backend is None:
+            return None
+        return f'task:{task_id}:{self.backend.counter(f"task_ver:{task_id}")}'
+
+    def page_key(self, kind, user_id, completed, per_page, tags=None, lists=()):
+        """Key of a user's first list page at the current generation
+
+        ``lists`` are the shared lists the page draws from; a write to any of
+        them bumps that list's generation, which changes the key too.
+        """
+        if self.backend is None:
+            return None
+        generation = self.backend.counter(f'tasks_gen:{user_id}')
+        for list_id in sorted(lists):
+            generation = f'{generation}.{self.backend.counter(f"tasks_gen:{list_id}")}'
+        key = f'tasks:{kind}:{user_id}:{generation}:{completed}:{per_page}'
+        if tags:
+            key += f':{sorted(tags)!r}'
+        return key
+
+    def facets_key(self, user_id, completed, tags=None, lists=()):
+        """Key of a user's tag counts, invalidated together with the list pages"""
+        return self.page_key('tag_counts', user_id, completed, None, tags, lists)
+
+    def add_invalidation_callback(self, callback):
+        """Call ``callback(user_id)`` on every invalidation, with or without a backend"""
+        self._invalidation_callbacks.append(callback)
+
+    def invalidate_task(self, task_id, user_id):
+        """Drop a task document and every list page of its owner"""
+        if self.backend is not None:
+            # A new ObjectId never repeats an earlier version, so the version
+            # can expire once it has outlived every entry stored under it
+            version = int(str(ObjectId()), 16)
+            self.backend.set_counter(f'task_ver:{task_id}', version, 2 * self.ttl)
+        self.invalidate_user(user_id)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached list page for ``user_id`` (a user or a shared list)"""
+        if self.backend is not None:
+            self.backend.incr(f'tasks_gen:{user_id}')
+            self._count('invalidations')
+        for callback in self._invalidation_callbacks:
+            callback(user_id)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['backend'] = type(self.backend).__name__ if self.backend else None
+        stats['evictions'] = self.backend.evictions() if self.backend else 0
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+cache = TaskCache()
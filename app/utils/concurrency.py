@@ -0,0 +1,197 @@
+import threading
+import time
+import pymongo
+from flask import g, jsonify, request
+from pymongo.errors import PyMongoError
+
+# Endpoints that are never limited: docs, health checks and long-lived streams
+EXEMPT_ENDPOINTS = {'static', 'flasgger.static', 'flasgger.apispec', 'flasgger.apidocs',
+                    'health.healthz', 'events.stream_events'}
+
+# Endpoints that spend most of their time in bcrypt
+AUTH_ENDPOINTS = {'auth.login', 'auth.register', 'admin.bulk_create_users'}
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts with additive increase, multiplicative decrease
+
+    Each request class may only use its share of the current limit, so once
+    the server is busy bcrypt-heavy auth requests are turned away first and
+    cheap reads last.
+    """
+
+    def __init__(self, initial=64, min_limit=4, max_limit=512, target_latency=0.25,
+                 backoff=0.9, shares=None):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.shares = shares or {'read': 1.0, 'write': 0.8, 'auth': 0.3}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._stats = {'admitted': 0, 'shed': {name: 0 for name in self.shares}, 'expired': 0}
+
+    def try_acquire(self, request_class):
+        """Take a slot for ``request_class``; False means the request should be shed"""
+        with self._lock:
+            allowed = max(1, int(self.limit * self.shares[request_class]))
+            if self.in_flight >= allowed:
+                self._stats['shed'][request_class] += 1
+                return False
+            self.in_flight += 1
+            self._stats['admitted'] += 1
+            return True
+
+    def release(self, latency=None, overloaded=False):
+        """Return a slot and feed the outcome back into the limit
+
+        ``latency`` is None for requests that should not steer the limit,
+        such as auth requests whose cost is dominated by bcrypt.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if overloaded or (latency is not None and latency > self.target_latency):
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def record_expired(self):
+        with self._lock:
+            self._stats['expired'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'admitted': self._stats['admitted'],
+                'shed': dict(self._stats['shed']),
+                'expired': self._stats['expired']
+            }
+
+
+def request_class(endpoint, method):
+    if endpoint in AUTH_ENDPOINTS:
+        return 'auth'
+    return 'read' if method in ('GET', 'HEAD') else 'write'
+
+
+def queued_seconds():
+    """Time spent before reaching the app, from a proxy's X-Request-Start header"""
+    header = request.headers.get('X-Request-Start', '')
+    try:
+        started = float(header[2:] if header.startswith('t=') else header)
+    except ValueError:
+        return 0.0
+    # nginx sends seconds with a millisecond fraction; some proxies send microseconds
+    if started > 1e12:
+        started /= 1e6
+    return max(0.0, time.time() - started)
+
+
+class ConcurrencyLimiter:
+    """Admission control and per-request deadlines for the API blueprints
+
+    Requests over the limit get a 503 with Retry-After before any auth or
+    database work is done. A worker never runs more requests at once than
+    it has threads, so the limit is capped at CONCURRENCY_WORKER_THREADS and
+    only sheds anything with gthread workers; a sync worker (one thread)
+    skips it. Admitted requests run under ``pymongo.timeout`` with whatever
+    is left of their deadline, so pymongo sends it to the server as
+    maxTimeMS and abandons work nobody is waiting for.
+    """
+
+    def __init__(self, app=None):
+        self.limiter = None
+        self.shedding = False
+        self.deadline = 10.0
+        self.retry_after = 1
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        threads = config['CONCURRENCY_WORKER_THREADS']
+        max_limit = min(config['CONCURRENCY_MAX_LIMIT'], threads)
+        self.limiter = AdaptiveLimiter(
+            initial=min(config['CONCURRENCY_INITIAL_LIMIT'], max_limit),
+            min_limit=min(config['CONCURRENCY_MIN_LIMIT'], max_limit),
+            max_limit=max_limit,
+            target_latency=config['CONCURRENCY_TARGET_LATENCY_MS'] / 1000,
+            shares=dict(config['CONCURRENCY_SHARES'])
+        )
+        self.deadline = config['REQUEST_DEADLINE_MS'] / 1000
+        self.retry_after = config['CONCURRENCY_RETRY_AFTER']
+        self.shedding = threads > 1
+
+        if not config['CONCURRENCY_LIMIT_ENABLED']:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.register_error_handler(PyMongoError, self._handle_mongo_error)
+
+    def overloaded_response(self, message):
+        response = jsonify({'message': message})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(self.retry_after)
+        return response
+
+    def _before_request(self):
+        if request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        remaining = self.deadline - queued_seconds()
+        if remaining <= 0:
+            # The client has given up on this request already
+            self.limiter.record_expired()
+            return self.overloaded_response('Request deadline exceeded')
+
+        if self.shedding:
+            klass = request_class(request.endpoint, request.method)
+            if not self.limiter.try_acquire(klass):
+                return self.overloaded_response('Server is overloaded, retry later')
+            g.limiter_class = klass
+        g.limiter_started = time.perf_counter()
+        g.limiter_deadline = time.monotonic() + remaining
+        g.limiter_timeout = pymongo.timeout(remaining)
+        g.limiter_timeout.__enter__()
+        return None
+
+    @staticmethod
+    def request_deadline():
+        """``time.monotonic()`` value the current request must finish by, or None"""
+        return g.get('limiter_deadline')
+
+    def _after_request(self, response):
+        if 'limiter_started' in g:
+            g.limiter_status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        started = g.pop('limiter_started', None)
+        if started is None:
+            return
+
+        g.pop('limiter_timeout').__exit__(None, None, None)
+        g.pop('limiter_deadline', None)
+        klass = g.pop('limiter_class', None)
+        if klass is None:
+            return
+        latency = time.perf_counter() - started
+        overloaded = g.pop('limiter_status', 500) == 503
+        self.limiter.release(None if klass == 'auth' else latency, overloaded=overloaded)
+
+    def _handle_mongo_error(self, error):
+        if getattr(error, 'timeout', False):
+            return self.overloaded_response('Request deadline exceeded')
+        raise error
+
+    def stats(self):
+        return self.limiter.stats() if self.limiter else {}
+
+
+limiter = ConcurrencyLimiter()
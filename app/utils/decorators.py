@@ -1,8 +1,10 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import g, request, jsonify
 import jwt
 from app.config import Config
 from app.models.user import User
+from app.utils.revocations import revocations
+from app.utils.timing import timed
 
 
 def token_required(f):
@@ -25,11 +27,14 @@ def token_required(f):
 
         try:
             # Decode token
-            data = jwt.decode(
-                token,
-                Config.JWT_SECRET_KEY,
-                algorithms=['HS256']
-            )
+            with timed('jwt'):
+                data = jwt.decode(
+                    token,
+                    Config.JWT_SECRET_KEY,
+                    algorithms=['HS256']
+                )
+            if revocations.is_revoked(data.get('jti')):
+                return jsonify({'message': 'Token has been revoked'}), 401
             current_user = User.find_by_id(data['user_id'])
 
             if not current_user:
@@ -40,6 +45,7 @@ def token_required(f):
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Invalid token'}), 401
 
+        g.token_claims = data
         return f(current_user, *args, **kwargs)
 
     return decorated
@@ -0,0 +1,223 @@
+import itertools
+import queue
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from functools import partial
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from app.extensions import mongo
+from app.utils.threads import BackgroundThread
+
+Event = namedtuple('Event', ['id', 'type', 'data'])
+
+
+class TooManyConnections(Exception):
+    """Raised when a user already holds the maximum number of streams"""
+
+
+class Subscription:
+    """A single client's view of its user's event stream"""
+
+    def __init__(self, user_id, max_pending=1000):
+        self.user_id = user_id
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=max_pending)
+
+    def push(self, event):
+        """Queue an event; a slow client is cut off instead of blocking publishers"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Wait up to ``timeout`` seconds for the next event"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalEventBackend:
+    """Keep events in process memory; only suitable for a single worker"""
+
+    def __init__(self, history_size=1000):
+        # Ids are prefixed with a per-process epoch so a Last-Event-ID from
+        # before a restart is never mistaken for a newer event.
+        self._epoch = f'{int(time.time()):x}'
+        self._counter = itertools.count(1)
+        self._history = defaultdict(partial(deque, maxlen=history_size))
+        self._lock = threading.Lock()
+        self._dispatch = None
+
+    def start(self, dispatch):
+        self._dispatch = dispatch
+
+    def publish(self, user_id, event_type, data):
+        with self._lock:
+            event = Event(f'{self._epoch}-{next(self._counter)}', event_type, data)
+            self._history[user_id].append(event)
+            self._dispatch(user_id, event)
+
+    def replay(self, user_id, last_event_id):
+        """Return events after ``last_event_id``, or None if it is no longer known"""
+        with self._lock:
+            history = list(self._history.get(user_id, ()))
+
+        for index, event in enumerate(history):
+            if event.id == last_event_id:
+                return history[index + 1:]
+        return None
+
+    def ensure_listening(self):
+        pass
+
+
+class MongoEventBackend:
+    """Share events between workers through a capped collection.
+
+    Every worker tails the collection and fans matching events out to its own
+    subscribers, so an update handled by one worker reaches streams held by
+    any other.
+    """
+
+    def __init__(self, app, collection='task_events', size=16 * 1024 * 1024, poll_interval=1.0):
+        self._app = app
+        self._collection = collection
+        self._size = size
+        self._poll_interval = poll_interval
+        self._dispatch = None
+        self._tailer = BackgroundThread(self._tail, 'task-events-tailer')
+
+    def start(self, dispatch):
+        self._dispatch = dispatch
+
+        with self._app.app_context():
+            try:
+                mongo.db.create_collection(self._collection, capped=True, size=self._size)
+            except CollectionInvalid:
+                pass
+            mongo.db[self._collection].create_index([('user_id', 1), ('_id', 1)])
+
+    def publish(self, user_id, event_type, data):
+        # Local subscribers are served by this worker's tailer like everyone else
+        mongo.db[self._collection].insert_one({
+            'user_id': user_id,
+            'type': event_type,
+            'data': data
+        })
+
+    def replay(self, user_id, last_event_id):
+        """Return events after ``last_event_id``, or None if it has been evicted"""
+        try:
+            last_id = ObjectId(last_event_id)
+        except (InvalidId, TypeError):
+            return None
+
+        collection = mongo.db[self._collection]
+        oldest = collection.find_one({}, {'_id': 1}, sort=[('$natural', 1)])
+        if oldest is None or oldest['_id'] > last_id:
+            return None
+
+        docs = collection.find({'user_id': user_id, '_id': {'$gt': last_id}}).sort('_id', 1)
+        return [self._to_event(doc) for doc in docs]
+
+    def ensure_listening(self):
+        """Start the tailer thread on first use in this process (and after a fork)"""
+        self._tailer.ensure_running()
+
+    def _tail(self):
+        with self._app.app_context():
+            last_id = None
+            while True:
+                try:
+                    collection = mongo.db[self._collection]
+                    if last_id is None:
+                        newest = collection.find_one({}, {'_id': 1}, sort=[('$natural', -1)])
+                        last_id = newest['_id'] if newest else ObjectId('0' * 24)
+
+                    cursor = collection.find(
+                        {'_id': {'$gt': last_id}},
+                        cursor_type=CursorType.TAILABLE_AWAIT
+                    )
+                    while cursor.alive:
+                        for doc in cursor:
+                            last_id = doc['_id']
+                            self._dispatch(doc['user_id'], self._to_event(doc))
+                except PyMongoError:
+                    pass
+
+                time.sleep(self._poll_interval)
+
+    @staticmethod
+    def _to_event(doc):
+        return Event(str(doc['_id']), doc['type'], doc['data'])
+
+
+class EventBroker:
+    """In-process pub/sub for task change events"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config['EVENTS_BACKEND'] == 'mongo':
+            if app.config['STORAGE_ENGINE'] != 'mongo':
+                raise RuntimeError('EVENTS_BACKEND=mongo requires STORAGE_ENGINE=mongo')
+            backend = MongoEventBackend(app, size=app.config['EVENTS_CAPPED_SIZE'])
+        else:
+            backend = LocalEventBackend(history_size=app.config['EVENTS_HISTORY_SIZE'])
+
+        self._subscribers = defaultdict(set)
+        self.backend = backend
+        backend.start(self._dispatch)
+
+    def publish(self, user_id, event_type, data):
+        """Publish an event to every stream held by ``user_id``"""
+        if self.backend is not None:
+            self.backend.publish(str(user_id), event_type, data)
+
+    def subscribe(self, user_id, max_connections):
+        """Open a new stream for ``user_id``"""
+        user_id = str(user_id)
+
+        with self._lock:
+            if len(self._subscribers[user_id]) >= max_connections:
+                raise TooManyConnections(user_id)
+            subscription = Subscription(user_id)
+            self._subscribers[user_id].add(subscription)
+
+        self.backend.ensure_listening()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def replay(self, user_id, last_event_id):
+        return self.backend.replay(str(user_id), last_event_id)
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _dispatch(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+
+
+events = EventBroker()
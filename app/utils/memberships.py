@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from flask import g, has_request_context
+from app.storage import storage
+
+
+class MembershipCache:
+    """Which shared lists each user belongs to, and with which role
+
+    Every task access check needs a user's memberships, so they are read
+    once per request (memoized on ``flask.g``) and kept per worker for
+    LIST_MEMBERSHIP_TTL seconds. Membership changes invalidate this worker
+    right away; other workers pick them up once their entry expires.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.ttl = 5.0
+        self.max_entries = 10000
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with self._lock:
+            self.ttl = app.config['LIST_MEMBERSHIP_TTL']
+            self.max_entries = app.config['LIST_MEMBERSHIP_CACHE_SIZE']
+            self._entries = OrderedDict()
+            self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def lists_for(self, user_id):
+        """``{list_id: role}`` for every list ``user_id`` is a member of"""
+        key = str(user_id)
+        memo = g.setdefault('list_memberships', {}) if has_request_context() else {}
+        if key in memo:
+            return memo[key]
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                memo[key] = entry[1]
+                return entry[1]
+            self._stats['misses'] += 1
+
+        roles = {m['list_id']: m['role'] for m in storage.lists.memberships(ObjectId(user_id))}
+
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (now + self.ttl, roles)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        memo[key] = roles
+        return roles
+
+    def invalidate(self, *user_ids):
+        """Forget the memberships of ``user_ids`` after they changed"""
+        memo = g.get('list_memberships', {}) if has_request_context() else {}
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(str(user_id), None)
+                memo.pop(str(user_id), None)
+                self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries)}
+
+
+memberships = MembershipCache()
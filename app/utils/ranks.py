@@ -0,0 +1,165 @@
+import threading
+from app.utils.threads import BackgroundThread
+
+# Rank keys are strings over these digits, which sort the same as their ASCII
+# codes. A key never ends in '0', so there is always room for a key before it.
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+
+def _digit(key, position):
+    return DIGITS.index(key[position]) if position < len(key) else 0
+
+
+def key_before(key):
+    """A short key sorting before ``key``; shrinks the first digit when it can"""
+    first = _digit(key, 0)
+    if first > 1:
+        return DIGITS[first - 1]
+    if first == 1:
+        return DIGITS[0] + DIGITS[-1]
+    return DIGITS[0] + key_before(key[1:])
+
+
+def key_after(key):
+    """A short key sorting after ``key``; grows the first digit when it can"""
+    first = _digit(key, 0)
+    if first < BASE - 1:
+        return DIGITS[first + 1]
+    return DIGITS[-1] + key_after(key[1:])
+
+
+def _midpoint(low, high):
+    # low < high; low may be empty, high None stands for the end of the key space
+    if high is not None:
+        prefix = 0
+        while prefix < len(high) and DIGITS[_digit(low, prefix)] == high[prefix]:
+            prefix += 1
+        if prefix:
+            return high[:prefix] + _midpoint(low[prefix:], high[prefix:])
+
+    low_digit = _digit(low, 0)
+    high_digit = BASE if high is None else _digit(high, 0)
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit) // 2]
+    if high is not None and len(high) > 1:
+        return high[0]
+    return DIGITS[low_digit] + _midpoint(low[1:], None)
+
+
+def key_between(low, high):
+    """Return a key sorting strictly between ``low`` and ``high``
+
+    Either bound may be None for an open end. Repeated inserts at the same
+    spot make keys longer, which is what triggers a rebalance.
+    """
+    if low is not None and high is not None and low >= high:
+        raise ValueError(f'{low!r} does not sort before {high!r}')
+    if low is None and high is None:
+        return DIGITS[BASE // 2]
+    if low is None:
+        return key_before(high)
+    if high is None:
+        return key_after(low)
+    return _midpoint(low, high)
+
+
+def spread_keys(count):
+    """``count`` ascending keys spaced evenly, leaving room at both ends"""
+    length = 1
+    while BASE ** length < 2 * (count + 1):
+        length += 1
+    step = BASE ** length // (count + 1)
+
+    keys = []
+    for position in range(1, count + 1):
+        value, digits = step * position, []
+        for _ in range(length):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append(''.join(reversed(digits)).rstrip(DIGITS[0]))
+    return keys
+
+
+class RankRebalancer:
+    """Rewrite the rank keys of a manual order in the background once they grow too long
+
+    Moves only request a rebalance; the worker thread respaces every rank
+    of that order (a user's own tasks or one list) in one bulk write, then
+    places tasks moved in the meantime again.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._work_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = set()
+        self._worker = BackgroundThread(self._run, 'rank-rebalance')
+        self._stats = {'requested': 0, 'rebalanced': 0, 'keys_rewritten': 0}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+            self._pending = set()
+            self._stats = {'requested': 0, 'rebalanced': 0, 'keys_rewritten': 0}
+
+    def request(self, user_id, owner=None):
+        """Queue a rebalance of ``owner``'s order (default: ``user_id``'s own tasks)
+
+        ``user_id`` is who asked for it; only orders they can edit are rewritten.
+        """
+        key = (str(user_id), str(user_id if owner is None else owner))
+        with self._lock:
+            if key not in self._pending:
+                self._pending.add(key)
+                self._stats['requested'] += 1
+
+        if not self._app.config['TASK_RANK_REBALANCE_ASYNC']:
+            self.flush()
+            return
+        self._worker.ensure_running()
+        self._wake.set()
+
+    def flush(self):
+        """Run every queued rebalance now; returns once none is in progress"""
+        while self._process_one():
+            pass
+        with self._work_lock:
+            pass
+
+    def _process_one(self):
+        from app.models.task import Task
+
+        with self._work_lock:
+            with self._lock:
+                if not self._pending:
+                    return False
+                user_id, owner = self._pending.pop()
+
+            with self._app.app_context():
+                rewritten = Task.rebalance_ranks(user_id, owner)
+
+            with self._lock:
+                self._stats['rebalanced'] += 1
+                self._stats['keys_rewritten'] += rewritten
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:  # the order is requested again on its next long key
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending)}
+
+
+rebalancer = RankRebalancer()
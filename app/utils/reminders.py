@@ -0,0 +1,92 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from app.utils.threads import BackgroundThread
+
+
+class ReminderScheduler:
+    """Background loop that announces tasks as they come due
+
+    Each pass reads the due_at index from the last lookback window up to
+    now, then sleeps until the next due date or the poll interval, whichever
+    comes first. It never scans tasks that are not about to come due.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = BackgroundThread(self._run, 'task-reminders')
+        self._stats = {'passes': 0, 'sent': 0, 'errors': 0, 'last_pass_ms': 0.0}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+            self._stats = {'passes': 0, 'sent': 0, 'errors': 0, 'last_pass_ms': 0.0}
+
+        if app.config['TASK_REMINDERS']:
+            # Threads do not survive a fork, so start on the first request of each worker
+            app.before_request(self.ensure_running)
+
+    def ensure_running(self):
+        self._worker.ensure_running()
+
+    def run_once(self, now=None):
+        """Send every reminder that is due; returns the number sent"""
+        from app.models.task import Task
+
+        config = self._app.config
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+
+        with self._app.app_context():
+            sent = Task.send_due_reminders(
+                now,
+                timedelta(hours=config['TASK_REMINDER_LOOKBACK_HOURS']),
+                batch_size=config['TASK_REMINDER_BATCH_SIZE']
+            )
+
+        with self._lock:
+            self._stats['passes'] += 1
+            self._stats['sent'] += sent
+            self._stats['last_pass_ms'] = (time.perf_counter() - started) * 1000
+        return sent
+
+    def seconds_until_next(self, now=None):
+        """How long to sleep: until the next due date, at most the poll interval"""
+        from app.models.task import Task
+
+        interval = self._app.config['TASK_REMINDER_INTERVAL']
+        now = now or datetime.utcnow()
+
+        with self._app.app_context():
+            next_due = Task.next_due_at(now)
+        if next_due is None:
+            return interval
+        return max(0.0, min(interval, (next_due - now).total_seconds()))
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+                delay = self.seconds_until_next()
+            except Exception:  # keep the loop alive through database hiccups
+                with self._lock:
+                    self._stats['errors'] += 1
+                delay = self._app.config['TASK_REMINDER_INTERVAL']
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'enabled': bool(self._app and self._app.config['TASK_REMINDERS']),
+                'running': self._worker.is_alive()
+            }
+
+
+reminders = ReminderScheduler()
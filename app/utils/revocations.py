@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from app.utils.threads import BackgroundThread
+
+# Revocations are stamped with the clock of the worker that made them, so each
+# sync re-reads this far back to catch ones stamped by a clock running behind
+CLOCK_SKEW = timedelta(seconds=30)
+
+
+class RevocationList:
+    """Revoked access tokens, mirrored in each worker's memory
+
+    ``is_revoked`` is a dict lookup, so protected requests never wait on the
+    database. A background thread pulls new revocations every
+    REVOCATION_SYNC_INTERVAL seconds, which bounds how long a token revoked
+    on another worker stays usable here; the revoking worker sees it at once.
+    Entries are dropped once the token would have expired anyway.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._watermark = None
+        self._worker = BackgroundThread(self._run, 'token-revocations')
+        self._stats = {'syncs': 0, 'errors': 0, 'last_sync_ms': 0.0}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+            self._revoked = {}
+            self._watermark = None
+            self._stats = {'syncs': 0, 'errors': 0, 'last_sync_ms': 0.0}
+
+        if app.config['REVOCATION_SYNC_INTERVAL'] > 0:
+            # Threads do not survive a fork, so start on the first request of each worker
+            app.before_request(self.ensure_running)
+
+    def ensure_running(self):
+        self._worker.ensure_running(self._load)
+
+    def _load(self):
+        if self._watermark is None:
+            # A new worker loads every live revocation before it serves a request
+            self.sync()
+
+    def is_revoked(self, jti):
+        return jti in self._revoked
+
+    def add(self, jti, expires_at):
+        """Mirror a revocation made by this worker right away"""
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def sync(self, now=None):
+        """Pull revocations made since the last sync; returns how many were new"""
+        from app.models.revoked_token import RevokedToken
+
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        after = self._watermark - CLOCK_SKEW if self._watermark is not None else None
+
+        with self._app.app_context():
+            documents = RevokedToken.revoked_since(after, now)
+
+        with self._lock:
+            added = 0
+            for document in documents:
+                if document['jti'] not in self._revoked:
+                    self._revoked[document['jti']] = document['expires_at']
+                    added += 1
+                if self._watermark is None or document['revoked_at'] > self._watermark:
+                    self._watermark = document['revoked_at']
+            if self._watermark is None:
+                self._watermark = now
+
+            for jti, expires_at in list(self._revoked.items()):
+                if expires_at <= now:
+                    del self._revoked[jti]
+
+            self._stats['syncs'] += 1
+            self._stats['last_sync_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return added
+
+    def _run(self):
+        while True:
+            time.sleep(self._app.config['REVOCATION_SYNC_INTERVAL'])
+            try:
+                self.sync()
+            except Exception:  # retried on the next interval
+                with self._lock:
+                    self._stats['errors'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'revoked': len(self._revoked)}
+
+
+revocations = RevocationList()
@@ -0,0 +1,134 @@
+import threading
+from app.utils.timing import timed
+
+
+class _Call:
+    """One in-flight read and the outcome its followers are waiting for"""
+
+    __slots__ = ('done', 'result', 'error', 'scopes')
+
+    def __init__(self, scopes):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.scopes = scopes
+
+
+class SingleFlight:
+    """Let concurrent identical reads share one database call
+
+    The first request for a key (the leader) runs the read; requests for the
+    same key that arrive while it is in flight wait for its result instead of
+    sending the same query again. Nothing is kept once the call returns, so
+    this only collapses bursts and never serves a result to a request that
+    arrived after the read finished.
+
+    A follower waits at most SINGLE_FLIGHT_TIMEOUT seconds and then runs the
+    read itself. If the leader's read fails, each follower retries on its
+    own, so one request's error is never handed to the others. ``forget``
+    detaches in-flight calls from a scope when it is written to: requests
+    arriving after the write start a new read instead of joining one that
+    began before it.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._scopes = {}
+        self._stats = {'leaders': 0, 'shared': 0, 'timeouts': 0, 'errors': 0}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+            self._calls = {}
+            self._scopes = {}
+            self._stats = {'leaders': 0, 'shared': 0, 'timeouts': 0, 'errors': 0}
+
+    def enabled(self):
+        return self._app is not None and self._app.config['SINGLE_FLIGHT']
+
+    def do(self, key, scopes, read, timeout=None):
+        """Return ``read()``, sharing it with concurrent callers of ``key``
+
+        ``scopes`` name what the result depends on (user and list ids);
+        ``forget`` on any of them starts a new call for later requests.
+        """
+        if not self.enabled():
+            return read()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call(frozenset(scopes))
+                self._calls[key] = call
+                for scope in call.scopes:
+                    self._scopes.setdefault(scope, set()).add(key)
+                self._stats['leaders'] += 1
+
+        if leader:
+            return self._lead(key, call, read)
+
+        if timeout is None:
+            timeout = self._app.config['SINGLE_FLIGHT_TIMEOUT']
+        with timed('coalesced'):
+            finished = call.done.wait(timeout)
+
+        if not finished:
+            self._count('timeouts')
+            return read()
+        if call.error is not None:
+            return read()
+        self._count('shared')
+        return call.result
+
+    def _lead(self, key, call, read):
+        try:
+            call.result = read()
+        except BaseException as error:
+            call.error = error
+            self._count('errors')
+            raise
+        finally:
+            with self._lock:
+                self._detach(key, call)
+            call.done.set()
+        return call.result
+
+    def _detach(self, key, call):
+        # A forgotten key may already belong to a newer call
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        for scope in call.scopes:
+            keys = self._scopes.get(scope)
+            if keys is not None and self._calls.get(key) is None:
+                keys.discard(key)
+                if not keys:
+                    del self._scopes[scope]
+
+    def forget(self, scope):
+        """Stop handing out in-flight reads of ``scope`` to new requests"""
+        with self._lock:
+            for key in self._scopes.pop(str(scope), ()):
+                call = self._calls.pop(key, None)
+                if call is not None:
+                    for other in call.scopes:
+                        if other != str(scope) and other in self._scopes:
+                            self._scopes[other].discard(key)
+                            if not self._scopes[other]:
+                                del self._scopes[other]
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'enabled': bool(self.enabled()), 'in_flight': len(self._calls)}
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,41 @@
+import os
+import threading
+
+
+class BackgroundThread:
+    """A daemon thread that runs once in every process
+
+    Threads do not survive a fork: a worker forked from a preloaded app
+    inherits the parent's thread object but not the thread, so
+    ``ensure_running`` starts it again in each process that calls it.
+    """
+
+    def __init__(self, target, name):
+        self._target = target
+        self._name = name
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def is_alive(self):
+        """Whether the thread is running in this process"""
+        thread = self._thread
+        return thread is not None and thread.is_alive() and self._pid == os.getpid()
+
+    def ensure_running(self, before_start=None):
+        """Start the thread unless it already runs in this process
+
+        ``before_start`` is called, under the start lock, only when the
+        thread is about to be started.
+        """
+        if self.is_alive():
+            return
+
+        with self._lock:
+            if self.is_alive():
+                return
+            if before_start is not None:
+                before_start()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._target, name=self._name, daemon=True)
+            self._thread.start()
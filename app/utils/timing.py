@@ -0,0 +1,92 @@
+import json
+import logging
+import time
+from contextlib import nullcontext
+from flask import current_app, g, request
+
+access_logger = logging.getLogger('app.access')
+
+_NOOP = nullcontext()
+
+
+class _Phase:
+    """Adds the time spent inside the ``with`` block to one request phase"""
+
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+def timed(name):
+    """Time a block as phase ``name`` of the current request
+
+    Returns a shared no-op context manager unless SERVER_TIMING or
+    ACCESS_LOG is enabled, so instrumented code costs one ``g`` lookup.
+    """
+    timings = g.get('timings')
+    if timings is None:
+        return _NOOP
+    return _Phase(timings, name)
+
+
+def format_server_timing(timings, total):
+    """Render phase durations as a Server-Timing header value in milliseconds"""
+    metrics = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items()]
+    metrics.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(metrics)
+
+
+class ServerTiming:
+    """Per-request phase timings for the Server-Timing header and access log"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        config = current_app.config
+        if not (config['SERVER_TIMING'] or config['ACCESS_LOG']):
+            return
+        g.timings = {}
+        g.timings_started = time.perf_counter()
+
+    def _after_request(self, response):
+        timings = g.pop('timings', None)
+        if timings is None:
+            return response
+
+        total = time.perf_counter() - g.pop('timings_started')
+        config = current_app.config
+
+        if config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = format_server_timing(timings, total)
+
+        if config['ACCESS_LOG']:
+            access_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 2),
+                'phases': {name: round(seconds * 1000, 2) for name, seconds in timings.items()}
+            }))
+
+        return response
+
+
+server_timing = ServerTiming()
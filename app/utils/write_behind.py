@@ -0,0 +1,198 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from app.storage import storage
+from app.utils.threads import BackgroundThread
+
+
+class WriteBehindError(Exception):
+    """Raised to a caller waiting on a flush that failed"""
+
+
+class WriteBehindQueue:
+    """Coalesce task updates in memory and flush them in unordered bulk writes.
+
+    Updates to the same task that arrive within one flush window are merged
+    into a single ``$set``, so a client toggling a field many times a second
+    costs one write per window instead of one per request.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = BackgroundThread(self._run, 'task-write-behind')
+        self._registered = False
+        self._flush_callbacks = []
+        self._reset()
+
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        self._pending = OrderedDict()
+        self._inflight = {}
+        self._owners = {}
+        self._cycle = 0
+        self._completed = -1
+        self._errors = {}
+        self._stats = {
+            'enqueued': 0,
+            'coalesced': 0,
+            'flushed': 0,
+            'batches': 0,
+            'errors': 0,
+            'max_queue_depth': 0,
+            'last_flush_ms': 0.0
+        }
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+            self._reset()
+
+        if not self._registered:
+            atexit.register(self.shutdown)
+            self._registered = True
+
+    def enabled(self):
+        return self._app is not None and self._app.config['TASK_WRITE_BEHIND']
+
+    def add_flush_callback(self, callback):
+        """Call ``callback(task_id, owner)`` for every task after it is written"""
+        self._flush_callbacks.append(callback)
+
+    def enqueue(self, task_id, fields, owner=None):
+        """Queue ``fields`` to be ``$set`` on a task and apply the ack policy
+
+        Callers must have checked that the task exists and belongs to
+        ``owner``; the flush only matches on ``_id``.
+        """
+        key = ObjectId(task_id)
+
+        with self._lock:
+            self._owners[key] = owner
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = dict(fields)
+            else:
+                entry.update(fields)
+                self._stats['coalesced'] += 1
+
+            self._stats['enqueued'] += 1
+            depth = len(self._pending)
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+            ticket = self._cycle
+
+        self._worker.ensure_running(self._stop.clear)
+        if depth >= self._app.config['TASK_WRITE_BEHIND_BATCH_SIZE']:
+            self._wake.set()
+
+        if self._app.config['TASK_WRITE_BEHIND_ACK'] == 'flushed':
+            self._wait_for(ticket)
+
+    def pending(self, task_id):
+        """Return fields queued for a task but not yet written, if any"""
+        key = ObjectId(task_id)
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            queued = self._pending.get(key)
+
+        if inflight is None and queued is None:
+            return None
+        return {**(inflight or {}), **(queued or {})}
+
+    def flush(self):
+        """Write everything queued so far; safe to call from any thread"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    self._completed = self._cycle
+                    self._cycle += 1
+                    self._flushed.notify_all()
+                    return 0
+                batch = self._pending
+                owners = self._owners
+                cycle = self._cycle
+                self._pending = OrderedDict()
+                self._owners = {}
+                self._inflight = batch
+                self._cycle += 1
+
+            started = time.perf_counter()
+            error = None
+            try:
+                self._write(batch)
+                # Invalidate derived state before the overlay is dropped below
+                for task_id in batch:
+                    for callback in self._flush_callbacks:
+                        callback(task_id, owners.get(task_id))
+            except Exception as e:  # waiters must be released whatever happens
+                error = e
+
+            with self._lock:
+                self._inflight = {}
+                self._completed = cycle
+                self._stats['batches'] += 1
+                self._stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+                if error is None:
+                    self._stats['flushed'] += len(batch)
+                else:
+                    self._stats['errors'] += 1
+                    self._errors[cycle] = error
+                    while len(self._errors) > 100:
+                        self._errors.pop(next(iter(self._errors)))
+                self._flushed.notify_all()
+
+            return len(batch)
+
+    def _write(self, batch):
+        config = self._app.config
+
+        with self._app.app_context():
+            storage.tasks.set_fields(
+                batch,
+                write_concern=config['TASK_WRITE_BEHIND_WRITE_CONCERN'],
+                batch_size=config['TASK_WRITE_BEHIND_BATCH_SIZE']
+            )
+
+    def _wait_for(self, ticket):
+        with self._lock:
+            self._wake.set()
+            while self._completed < ticket:
+                self._flushed.wait()
+            error = self._errors.get(ticket)
+
+        if error is not None:
+            raise WriteBehindError(str(error))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._app.config['TASK_WRITE_BEHIND_WINDOW'])
+            self._wake.clear()
+            self.flush()
+
+    def shutdown(self):
+        """Stop the flusher and write whatever is still queued"""
+        self._stop.set()
+        self._wake.set()
+        if self._app is not None:
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'enabled': bool(self.enabled()),
+                'queue_depth': len(self._pending),
+                'inflight': len(self._inflight)
+            }
+
+
+write_behind = WriteBehindQueue()
@@ -0,0 +1,88 @@
+"""Compare memory and CPU per page of the two GET /api/tasks serving paths.
+
+Runs against MongoDB (MONGO_URI from the testing config) by default, since the
+raw path's savings come from decoding BSON off the wire. Run with:
+
+    python -m benchmarks.bench_task_list --tasks 1000 --per-page 100 --rounds 200
+
+``--engine memory`` needs no server and measures the app-side work only.
+"""
+import argparse
+import time
+import tracemalloc
+from bson import ObjectId
+from flask import jsonify
+from app import create_app
+from app.models.task import Task
+from app.storage import storage
+from app.utils.cache import cache
+
+USER_ID = ObjectId()
+
+
+def dict_path(per_page):
+    tasks, total = Task.find_all(USER_ID, page=1, per_page=per_page)
+    return jsonify({
+        'tasks': [Task.to_dict(task) for task in tasks],
+        'total': total,
+        'page': 1,
+        'per_page': per_page,
+        'total_pages': (total + per_page - 1) // per_page
+    }).get_data()
+
+
+def raw_path(per_page):
+    records, total = Task.find_records(USER_ID, page=1, per_page=per_page)
+    return Task.encode_page(records, total, 1, per_page).encode()
+
+
+def measure(fn, per_page, rounds):
+    fn(per_page)  # warm up the connection pool and code paths
+
+    tracemalloc.start()
+    fn(per_page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.process_time()
+    for _ in range(rounds):
+        fn(per_page)
+    cpu = (time.process_time() - started) / rounds
+
+    return peak, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--per-page', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--engine', choices=['mongo', 'memory'], default='mongo')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    app.config['TASK_LIST_FAST_PATH'] = True
+    app.config['STORAGE_ENGINE'] = args.engine
+    # Every round has to read the page from storage, not from the page cache
+    app.config['CACHE_BACKEND'] = 'none'
+    app.config['SINGLE_FLIGHT'] = False
+    storage.init_app(app)
+    cache.init_app(app)
+
+    with app.test_request_context():
+        storage.tasks.delete_owned([USER_ID])
+        for i in range(args.tasks):
+            Task.create_task(USER_ID, f'Task {i}', 'A moderately long description ' * 4)
+
+        print(f'{args.tasks} tasks, {args.per_page} per page, {args.rounds} rounds, '
+              f'{args.engine} engine')
+        print(f"{'path':<8}{'peak KiB/page':>16}{'CPU ms/page':>14}")
+        for name, fn in (('dict', dict_path), ('raw', raw_path)):
+            peak, cpu = measure(fn, args.per_page, args.rounds)
+            print(f'{name:<8}{peak / 1024:>16.1f}{cpu * 1000:>14.3f}')
+
+        storage.tasks.delete_owned([USER_ID])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Gunicorn settings for production: gunicorn -c gunicorn.conf.py run:app"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Pre-fork workers sized from the CPU count; threads > 1 switches to gthread
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Import the app once in the master so workers share its pages copy-on-write.
+# With preloading, HUP re-forks workers but does not pick up new code.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Recycle workers after a number of requests to cap slow memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+
+
+def when_ready(server):
+    # The master never serves requests; drop the client it used while
+    # preloading (index creation) so no sockets or monitor threads leak
+    # into forked workers.
+    if preload_app:
+        from app.storage import storage
+        storage.close()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import reinit_after_fork
+        reinit_after_fork(worker.app.wsgi())
+
+
+def worker_exit(server, worker):
+    # Write anything still buffered before the worker goes away
+    from app.utils.audit import audit
+    from app.utils.write_behind import write_behind
+    write_behind.shutdown()
+    audit.shutdown()
@@ -1,6 +1,6 @@
 import pytest
 from app import create_app
-from app.extensions import mongo
+from app.storage import storage
 
 
 @pytest.fixture
@@ -10,15 +10,13 @@ def app():
 
     with app.app_context():
         # Clear test database
-        mongo.db.users.delete_many({})
-        mongo.db.tasks.delete_many({})
+        storage.reset()
 
     yield app
 
     with app.app_context():
         # Cleanup after tests
-        mongo.db.users.delete_many({})
-        mongo.db.tasks.delete_many({})
+        storage.reset()
 
 
 @pytest.fixture
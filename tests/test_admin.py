@@ -0,0 +1,85 @@
+import json
+import time
+from app.models.user import User
+
+
+def get_admin_token(client):
+    """Helper to register and log in an admin"""
+    client.post('/api/auth/register',
+                json={
+                    'username': 'admin',
+                    'email': 'admin@example.com',
+                    'password': 'adminpass123',
+                    'role': 'admin'
+                })
+    response = client.post('/api/auth/login',
+                           json={'username': 'admin', 'password': 'adminpass123'})
+    return json.loads(response.data)['token']
+
+
+def test_bulk_create_users(app, client):
+    """Test bulk provisioning with a duplicate in the batch"""
+    app.config['BCRYPT_ROUNDS'] = 4
+    token = get_admin_token(client)
+
+    users = [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': 'pass12345'}
+        for i in range(5)
+    ]
+    users.append({'username': 'user0', 'email': 'other@example.com', 'password': 'pass12345'})
+
+    response = client.post('/api/admin/users/bulk',
+                           headers={'Authorization': f'Bearer {token}'},
+                           json={'users': users})
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['created'] == 5
+    assert data['failed'] == 1
+    assert 'user_id' not in data['results'][5]
+
+    login = client.post('/api/auth/login',
+                        json={'username': 'user3', 'password': 'pass12345'})
+    assert login.status_code == 200
+
+
+def test_bulk_create_users_stops_at_the_deadline(app, client, monkeypatch):
+    """Test that a batch still hashing at the request deadline creates nobody"""
+    token = get_admin_token(client)
+    hash_password = User.hash_password
+
+    def slow_hash(password, rounds=12):
+        time.sleep(0.3)
+        return hash_password(password, rounds=4)
+
+    monkeypatch.setattr(User, 'hash_password', slow_hash)
+    users = [{'username': f'late{i}', 'email': f'late{i}@example.com', 'password': 'pass12345'}
+             for i in range(20)]
+    # Queued long enough that only 0.2s of the 10s deadline is left
+    response = client.post('/api/admin/users/bulk',
+                           headers={'Authorization': f'Bearer {token}',
+                                    'X-Request-Start': f't={time.time() - 9.8:.3f}'},
+                           json={'users': users})
+
+    assert response.status_code == 503
+    assert client.post('/api/auth/login',
+                       json={'username': 'late0', 'password': 'pass12345'}).status_code == 401
+
+
+def test_bulk_create_users_requires_admin(client):
+    """Test that bulk provisioning is admin-only and validated"""
+    client.post('/api/auth/register',
+                json={'username': 'plain', 'email': 'plain@example.com', 'password': 'plainpass1'})
+    login = client.post('/api/auth/login', json={'username': 'plain', 'password': 'plainpass1'})
+    token = json.loads(login.data)['token']
+
+    response = client.post('/api/admin/users/bulk',
+                           headers={'Authorization': f'Bearer {token}'},
+                           json={'users': [{'username': 'x', 'email': 'x@example.com', 'password': 'p'}]})
+    assert response.status_code == 403
+
+    admin_token = get_admin_token(client)
+    response = client.post('/api/admin/users/bulk',
+                           headers={'Authorization': f'Bearer {admin_token}'},
+                           json={'users': [{'username': 'x'}]})
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.models.task import Task
+from app.storage import storage
+from tests.test_tasks import get_auth_token
+
+
+def create_completed_task(client, token, title, days_ago):
+    """Helper to create a task completed ``days_ago`` days in the past"""
+    response = client.post('/api/tasks',
+                           headers={'Authorization': f'Bearer {token}'},
+                           json={'title': title, 'description': 'Description'})
+    task_id = json.loads(response.data)['task']['id']
+
+    client.put(f'/api/tasks/{task_id}',
+               headers={'Authorization': f'Bearer {token}'},
+               json={'completed': True})
+
+    storage.tasks.set_fields(
+        {ObjectId(task_id): {'updated_at': datetime.utcnow() - timedelta(days=days_ago)}}
+    )
+    return task_id
+
+
+def test_archive_moves_old_completed_tasks(app, client):
+    """Test that only old completed tasks are archived"""
+    token = get_auth_token(client)
+
+    with app.app_context():
+        old_id = create_completed_task(client, token, 'Old', days_ago=120)
+        recent_id = create_completed_task(client, token, 'Recent', days_ago=1)
+        client.post('/api/tasks',
+                    headers={'Authorization': f'Bearer {token}'},
+                    json={'title': 'Open', 'description': 'Description'})
+
+        archived = Task.archive_completed(
+            datetime.utcnow() - timedelta(days=90), batch_size=1
+        )
+
+        assert archived == 1
+        assert storage.tasks.count() == 2
+        assert storage.tasks_archive.get(ObjectId(old_id))
+        assert storage.tasks.get(ObjectId(recent_id))
+
+
+def test_archived_tasks_read_on_demand(app, client):
+    """Test that archived tasks are only listed when requested"""
+    token = get_auth_token(client)
+
+    with app.app_context():
+        old_id = create_completed_task(client, token, 'Old', days_ago=120)
+        client.post('/api/tasks',
+                    headers={'Authorization': f'Bearer {token}'},
+                    json={'title': 'Open', 'description': 'Description'})
+        Task.archive_completed(datetime.utcnow() - timedelta(days=90))
+
+    response = client.get('/api/tasks',
+                          headers={'Authorization': f'Bearer {token}'})
+    assert json.loads(response.data)['total'] == 1
+
+    response = client.get('/api/tasks?include_archived=true',
+                          headers={'Authorization': f'Bearer {token}'})
+    data = json.loads(response.data)
+    assert data['total'] == 2
+    assert [t['archived'] for t in data['tasks']] == [False, True]
+
+    response = client.get(f'/api/tasks/{old_id}',
+                          headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert json.loads(response.data)['task']['archived'] == True
+
+
+def test_archive_command_reports_counts(app, client, runner):
+    """Test the archive CLI command output"""
+    token = get_auth_token(client)
+
+    with app.app_context():
+        create_completed_task(client, token, 'Old', days_ago=120)
+
+    result = runner.invoke(args=['archive-tasks', '--pause', '0'])
+
+    assert result.exit_code == 0
+    assert 'Archived 1 tasks' in result.output
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.storage import storage
+from app.utils.audit import audit
+from tests.test_admin import get_admin_token
+from tests.test_tasks import get_auth_token
+
+
+def audit_page(client, token, query=''):
+    response = client.get(f'/api/admin/audit{query}', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+def test_task_writes_and_logins_are_audited(client):
+    """Test that task writes and logins end up in the audit log once flushed"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    admin = get_admin_token(client)
+
+    response = client.post('/api/tasks', headers=headers, json={'title': 'Audited'})
+    task = json.loads(response.data)['task']
+    client.put(f"/api/tasks/{task['id']}", headers=headers, json={'completed': True})
+    client.delete(f"/api/tasks/{task['id']}", headers=headers)
+    client.post('/api/auth/login', json={'username': 'testuser', 'password': 'wrong'})
+
+    audit.flush()
+    entries = audit_page(client, admin, "?action=task.updated")['entries']
+    assert len(entries) == 1
+    assert entries[0]['task_id'] == task['id']
+    assert entries[0]['details'] == {'fields': ['completed', 'updated_at']}
+
+    user_id = entries[0]['user_id']
+    actions = [entry['action'] for entry in audit_page(client, admin, f'?user_id={user_id}')['entries']]
+    assert actions == ['auth.login_failed', 'task.deleted', 'task.updated', 'task.created', 'auth.login']
+
+    response = client.get('/api/admin/audit', headers=headers)
+    assert response.status_code == 403
+    assert client.get('/api/admin/audit?before=nope',
+                      headers={'Authorization': f'Bearer {admin}'}).status_code == 400
+
+
+def test_keyset_pagination(app, client):
+    """Test that pages follow next_before down to the oldest entry"""
+    admin = get_admin_token(client)
+    for index in range(5):
+        audit.record('test.event', index=index)
+    audit.flush()
+
+    seen, query = [], '?action=test.event&limit=2'
+    while True:
+        page = audit_page(client, admin, query)
+        seen.extend(entry['details']['index'] for entry in page['entries'])
+        if page['next_before'] is None:
+            break
+        query = f"?action=test.event&limit=2&before={page['next_before']}"
+
+    assert seen == [4, 3, 2, 1, 0]
+
+
+def test_overflow_drops_or_spills(app):
+    """Test that a full queue drops entries or writes them inline, as configured"""
+    app.config['AUDIT_QUEUE_MAX'] = 0
+
+    audit.record('test.dropped')
+    assert audit.stats()['dropped'] == 1
+
+    app.config['AUDIT_OVERFLOW'] = 'spill'
+    audit.record('test.spilled')
+    assert audit.stats()['spilled'] == 1
+
+    with app.app_context():
+        assert [entry['action'] for entry in storage.audit_log.find()] == ['test.spilled']
+
+
+def test_failed_batches_are_retried(app, monkeypatch):
+    """Test that a batch the database rejected is written by a later flush"""
+    def fail(entries):
+        raise RuntimeError('database unavailable')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(storage.audit_log, 'insert_many', fail)
+        audit.record('test.retried')
+        assert audit.flush() == 0
+        assert audit.stats()['errors'] >= 1
+
+    audit.flush()
+    with app.app_context():
+        assert [entry['action'] for entry in storage.audit_log.find()] == ['test.retried']
+    assert audit.stats()['dropped'] == 0
+
+
+def test_shutdown_flushes_queue(app):
+    """Test that entries still queued at shutdown are written"""
+    audit.record('test.shutdown')
+    audit.shutdown()
+
+    with app.app_context():
+        assert [entry['action'] for entry in storage.audit_log.find()] == ['test.shutdown']
+
+
+def test_pages_stop_below_unwritten_entries(app, client):
+    """Test that a page never passes an entry that is still queued"""
+    admin = get_admin_token(client)
+    audit.flush()
+    audit.record('test.queued')
+    with app.app_context():
+        # A newer entry written by another worker before ours is flushed
+        storage.audit_log.insert_many([{
+            '_id': ObjectId(), 'at': datetime.utcnow(), 'action': 'test.written',
+            'user_id': None, 'task_id': None, 'ip': None, 'details': {},
+            'expires_at': datetime.utcnow() + timedelta(days=1)
+        }])
+
+    assert audit_page(client, admin, '?action=test.written')['entries'] == []
+
+    audit.flush()
+    actions = [entry['action'] for entry in audit_page(client, admin, '?action=test.written')['entries']]
+    assert actions == ['test.written']
+
+    app.config['AUDIT_PAGE_DELAY'] = 60
+    assert audit_page(client, admin)['entries'] == []
+
+
+def test_queue_stays_in_id_order(app, monkeypatch):
+    """Test that entries recorded from many threads are queued in _id order"""
+    app.config['AUDIT_FLUSH_INTERVAL'] = 60
+    app.config['AUDIT_BATCH_SIZE'] = 1000
+    audit.flush()
+
+    def slow_object_id():
+        # Another thread gets its id in between unless ids are taken under the lock
+        object_id = ObjectId()
+        time.sleep(0.001)
+        return object_id
+
+    monkeypatch.setattr('app.utils.audit.ObjectId', slow_object_id)
+
+    def record():
+        for _ in range(20):
+            audit.record('test.ordered')
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [entry['_id'] for entry in audit._queue]
+    assert len(ids) == 80
+    assert ids == sorted(ids)
+    assert audit.oldest_unwritten() == ids[0]
+    audit.flush()
@@ -1,5 +1,11 @@
 import json
+from datetime import datetime, timedelta
+import jwt
+from pymongo.errors import DuplicateKeyError
+from app.config import Config
 from app.models.user import User
+from app.storage import storage
+from app.utils.revocations import revocations
 
 
 def test_register_user(client):
@@ -84,3 +90,155 @@ def test_missing_fields_register(client):
     assert response.status_code == 400
     data = json.loads(response.data)
     assert 'Missing required fields' in data['message']
+
+
+def login(client):
+    """Helper to register and log in, returning the response data"""
+    client.post('/api/auth/register',
+                json={
+                    'username': 'testuser',
+                    'email': 'test@example.com',
+                    'password': 'testpass123'
+                })
+    response = client.post('/api/auth/login',
+                           json={'username': 'testuser', 'password': 'testpass123'})
+    return json.loads(response.data)
+
+
+def test_refresh_token_rotation(client):
+    """Test that a refresh token yields a working access token and rotates"""
+    data = login(client)
+    assert 'refresh_token' in data
+
+    response = client.post('/api/auth/refresh',
+                           json={'refresh_token': data['refresh_token']})
+
+    assert response.status_code == 200
+    refreshed = json.loads(response.data)
+    assert refreshed['refresh_token'] != data['refresh_token']
+
+    response = client.get('/api/tasks',
+                          headers={'Authorization': f"Bearer {refreshed['token']}"})
+    assert response.status_code == 200
+
+
+def test_refresh_token_reuse_revokes_family(client):
+    """Test that replaying a spent refresh token revokes its successors"""
+    data = login(client)
+
+    first = client.post('/api/auth/refresh', json={'refresh_token': data['refresh_token']})
+    successor = json.loads(first.data)['refresh_token']
+
+    replay = client.post('/api/auth/refresh', json={'refresh_token': data['refresh_token']})
+    assert replay.status_code == 401
+
+    response = client.post('/api/auth/refresh', json={'refresh_token': successor})
+    assert response.status_code == 401
+
+
+def test_refresh_token_invalid(client):
+    """Test refresh with a missing or unknown token"""
+    response = client.post('/api/auth/refresh', json={})
+    assert response.status_code == 400
+
+    response = client.post('/api/auth/refresh', json={'refresh_token': 'bogus'})
+    assert response.status_code == 401
+
+
+def test_register_duplicate_email(client):
+    """Test that the conflicting field is reported"""
+    client.post('/api/auth/register',
+                json={
+                    'username': 'first',
+                    'email': 'same@example.com',
+                    'password': 'testpass123'
+                })
+
+    response = client.post('/api/auth/register',
+                           json={
+                               'username': 'second',
+                               'email': 'same@example.com',
+                               'password': 'testpass123'
+                           })
+
+    assert response.status_code == 409
+    data = json.loads(response.data)
+    assert data['field'] == 'email'
+    assert data['message'] == 'Email already exists'
+
+
+def test_logout_revokes_tokens(client):
+    """Test that logging out rejects the access token and its refresh token"""
+    data = login(client)
+    headers = {'Authorization': f"Bearer {data['token']}"}
+    other = login(client)
+
+    response = client.post('/api/auth/logout', headers=headers,
+                           json={'refresh_token': data['refresh_token']})
+    assert response.status_code == 200
+
+    response = client.get('/api/tasks', headers=headers)
+    assert response.status_code == 401
+    assert json.loads(response.data)['message'] == 'Token has been revoked'
+    assert client.post('/api/auth/refresh',
+                       json={'refresh_token': data['refresh_token']}).status_code == 401
+
+    # Other logins of the same user are unaffected
+    response = client.get('/api/tasks', headers={'Authorization': f"Bearer {other['token']}"})
+    assert response.status_code == 200
+    response = client.post('/api/auth/logout', headers={'Authorization': f"Bearer {other['token']}"},
+                           json={'refresh_token': 'bogus'})
+    assert response.status_code == 400
+
+
+def test_logout_racing_another_worker(app, client, monkeypatch):
+    """Test that losing the race to store the same revocation still logs out"""
+    data = login(client)
+    headers = {'Authorization': f"Bearer {data['token']}"}
+
+    def insert(document):
+        raise DuplicateKeyError('E11000 duplicate key error index: jti_1', 11000)
+
+    monkeypatch.setattr(storage.revoked_tokens, 'insert', insert)
+    response = client.post('/api/auth/logout', headers=headers)
+    assert response.status_code == 200
+    assert client.get('/api/tasks', headers=headers).status_code == 401
+
+
+def test_revocations_reach_other_workers(app, client):
+    """Test that a revocation stored by another worker applies after the next sync"""
+    data = login(client)
+    headers = {'Authorization': f"Bearer {data['token']}"}
+    claims = jwt.decode(data['token'], Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    now = datetime.utcnow()
+
+    with app.app_context():
+        storage.revoked_tokens.insert({
+            'jti': claims['jti'], 'user_id': None,
+            'expires_at': datetime.utcfromtimestamp(claims['exp']), 'revoked_at': now
+        })
+        storage.revoked_tokens.insert({
+            'jti': 'stale', 'user_id': None,
+            'expires_at': now - timedelta(seconds=1), 'revoked_at': now - timedelta(hours=1)
+        })
+
+    # Until this worker syncs, it only knows its own revocations
+    assert client.get('/api/tasks', headers=headers).status_code == 200
+    assert revocations.sync() == 1
+    assert client.get('/api/tasks', headers=headers).status_code == 401
+    assert revocations.sync() == 0
+    assert revocations.stats()['revoked'] == 1
+
+    # Revocations are forgotten once their token has expired
+    revocations.sync(now + Config.JWT_ACCESS_TOKEN_EXPIRES + timedelta(seconds=1))
+    assert revocations.stats()['revoked'] == 0
+
+
+def test_logout_token_without_jti(client):
+    """Test that tokens issued before jti existed cannot be revoked"""
+    user_id = login(client)['user']['id']
+    token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(minutes=5)},
+                       Config.JWT_SECRET_KEY, algorithm='HS256')
+
+    response = client.post('/api/auth/logout', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
@@ -0,0 +1,118 @@
+import json
+import time
+from pymongo import _csot
+from app.models.task import Task
+from app.utils.concurrency import limiter
+from tests.test_tasks import get_auth_token
+
+
+def test_batch_mixed_requests(client):
+    """Test reads and writes in a single batch"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    created = client.post('/api/tasks', headers=headers,
+                          json={'title': 'Existing', 'description': 'Description'})
+    task_id = json.loads(created.data)['task']['id']
+
+    response = client.post('/api/batch', headers=headers, json={
+        'requests': [
+            {'id': 'page', 'method': 'GET', 'path': '/api/tasks?per_page=5'},
+            {'id': 'one', 'method': 'GET', 'path': f'/api/tasks/{task_id}'},
+            {'id': 'new', 'method': 'POST', 'path': '/api/tasks',
+             'body': {'title': 'From batch'}},
+            {'id': 'done', 'method': 'PUT', 'path': f'/api/tasks/{task_id}',
+             'body': {'completed': True}},
+            {'id': 'after', 'method': 'GET', 'path': '/api/tasks'}
+        ]
+    })
+
+    assert response.status_code == 200
+    results = {r['id']: r for r in json.loads(response.data)['responses']}
+
+    assert results['page']['status'] == 200
+    assert results['page']['body']['total'] == 1
+    assert results['one']['body']['task']['title'] == 'Existing'
+    assert results['new']['status'] == 201
+    assert results['done']['body']['task']['completed'] == True
+    assert results['after']['body']['total'] == 2
+
+
+def test_batch_isolates_failures(client):
+    """Test that one failing sub-request does not fail the batch"""
+    token = get_auth_token(client)
+
+    response = client.post('/api/batch',
+                           headers={'Authorization': f'Bearer {token}'},
+                           json={'requests': [
+                               {'method': 'GET', 'path': '/api/tasks/000000000000000000000000'},
+                               {'method': 'GET', 'path': '/api/nowhere'},
+                               {'method': 'POST', 'path': '/api/auth/login', 'body': {}},
+                               {'method': 'GET', 'path': '/api/tasks'}
+                           ]})
+
+    assert response.status_code == 200
+    statuses = [r['status'] for r in json.loads(response.data)['responses']]
+    assert statuses == [404, 404, 400, 200]
+
+
+def test_batch_validation(app, client):
+    """Test malformed and oversized batches"""
+    app.config['BATCH_MAX_REQUESTS'] = 2
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.post('/api/batch', headers=headers, json={'requests': []})
+    assert response.status_code == 400
+
+    response = client.post('/api/batch', headers=headers,
+                           json={'requests': [{'method': 'GET', 'path': '/api/tasks'}] * 3})
+    assert response.status_code == 400
+
+    response = client.post('/api/batch', json={'requests': []})
+    assert response.status_code == 401
+
+
+def test_batch_reads_keep_the_deadline(client, monkeypatch):
+    """Test that concurrent reads run under the batch's pymongo timeout"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    seen = []
+    find_records = Task.find_records
+
+    def recording(*args, **kwargs):
+        seen.append(_csot.get_timeout())
+        return find_records(*args, **kwargs)
+
+    monkeypatch.setattr(Task, 'find_records', recording)
+    response = client.post('/api/batch', headers=headers, json={
+        'requests': [{'method': 'GET', 'path': '/api/tasks'}] * 3
+    })
+
+    assert [r['status'] for r in json.loads(response.data)['responses']] == [200] * 3
+    assert len(seen) == 3 and all(timeout is not None and timeout <= 10 for timeout in seen)
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_batch_stops_at_the_deadline(client, monkeypatch):
+    """Test that sub-requests left once the deadline passes are not run"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    find_records = Task.find_records
+
+    def slow(*args, **kwargs):
+        time.sleep(0.3)
+        return find_records(*args, **kwargs)
+
+    monkeypatch.setattr(Task, 'find_records', slow)
+    # Queued long enough that only 0.2s of the 10s deadline is left
+    response = client.post('/api/batch',
+                           headers={**headers, 'X-Request-Start': f't={time.time() - 9.8:.3f}'},
+                           json={'requests': [
+                               {'method': 'GET', 'path': '/api/tasks'},
+                               {'method': 'POST', 'path': '/api/tasks', 'body': {'title': 'Late'}}
+                           ]})
+
+    assert [r['status'] for r in json.loads(response.data)['responses']] == [200, 503]
+    response = client.get('/api/tasks', headers=headers)
+    assert json.loads(response.data)['total'] == 0
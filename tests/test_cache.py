@@ -0,0 +1,160 @@
+import json
+from app.storage import storage
+from app.utils.cache import cache, LRUCacheBackend, RedisCacheBackend
+from tests.test_tasks import get_auth_token
+
+
+class LocalRedis:
+    """Minimal in-process stand-in for a Redis client"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+
+def test_lru_backend_evicts_oldest():
+    """Test LRU eviction order and counters"""
+    backend = LRUCacheBackend(max_entries=2)
+    backend.set('a', b'1', 60)
+    backend.set('b', b'2', 60)
+    backend.get('a')
+    backend.set('c', b'3', 60)
+
+    assert backend.get('b') is None
+    assert backend.get('a') == b'1'
+    assert backend.evictions() == 1
+
+
+def test_task_reads_are_cached_and_invalidated(client):
+    """Test hits, misses and invalidation on writes"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    created = client.post('/api/tasks', headers=headers,
+                          json={'title': 'Cached', 'description': 'Description'})
+    task_id = json.loads(created.data)['task']['id']
+
+    client.get('/api/tasks', headers=headers)
+    client.get(f'/api/tasks/{task_id}', headers=headers)
+    before = cache.stats()
+
+    client.get('/api/tasks', headers=headers)
+    client.get(f'/api/tasks/{task_id}', headers=headers)
+    assert cache.stats()['hits'] == before['hits'] + 2
+
+    client.put(f'/api/tasks/{task_id}', headers=headers, json={'title': 'Changed'})
+
+    response = client.get(f'/api/tasks/{task_id}', headers=headers)
+    assert json.loads(response.data)['task']['title'] == 'Changed'
+    response = client.get('/api/tasks', headers=headers)
+    assert json.loads(response.data)['tasks'][0]['title'] == 'Changed'
+
+    client.delete(f'/api/tasks/{task_id}', headers=headers)
+    response = client.get('/api/tasks', headers=headers)
+    assert json.loads(response.data)['total'] == 0
+
+
+def test_shared_backend_stand_in(app, client):
+    """Test the shared backend with a local stand-in client"""
+    cache.init_app(app, backend=RedisCacheBackend(LocalRedis()))
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    client.post('/api/tasks', headers=headers, json={'title': 'One'})
+    client.get('/api/tasks', headers=headers)
+    client.post('/api/tasks', headers=headers, json={'title': 'Two'})
+
+    response = client.get('/api/tasks', headers=headers)
+    assert json.loads(response.data)['total'] == 2
+
+    response = client.get('/api/tasks', headers=headers)
+    assert json.loads(response.data)['total'] == 2
+    assert cache.stats()['hits'] >= 1
+
+
+def test_other_users_cannot_read_cached_task(client):
+    """Test that a cached task is still scoped to its owner"""
+    token = get_auth_token(client)
+    created = client.post('/api/tasks', headers={'Authorization': f'Bearer {token}'},
+                          json={'title': 'Private'})
+    task_id = json.loads(created.data)['task']['id']
+    client.get(f'/api/tasks/{task_id}', headers={'Authorization': f'Bearer {token}'})
+
+    client.post('/api/auth/register',
+                json={'username': 'other', 'email': 'other@example.com', 'password': 'otherpass123'})
+    login = client.post('/api/auth/login', json={'username': 'other', 'password': 'otherpass123'})
+    other_token = json.loads(login.data)['token']
+
+    response = client.get(f'/api/tasks/{task_id}',
+                          headers={'Authorization': f'Bearer {other_token}'})
+    assert response.status_code == 404
+
+
+def test_read_racing_an_update_is_not_cached(app, client, monkeypatch):
+    """Test that a document read before an update cannot be cached after it"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    created = client.post('/api/tasks', headers=headers, json={'title': 'Before'})
+    task_id = json.loads(created.data)['task']['id']
+    # Start from an empty cache so the next read goes to storage
+    cache.init_app(app)
+
+    # The update lands between the read's storage call and its cache.set
+    get = storage.tasks.get
+
+    def racing_get(*args, **kwargs):
+        document = get(*args, **kwargs)
+        monkeypatch.setattr(storage.tasks, 'get', get)
+        client.put(f'/api/tasks/{task_id}', headers=headers, json={'title': 'After'})
+        return document
+
+    monkeypatch.setattr(storage.tasks, 'get', racing_get)
+    response = client.get(f'/api/tasks/{task_id}', headers=headers)
+    assert json.loads(response.data)['task']['title'] == 'Before'
+
+    response = client.get(f'/api/tasks/{task_id}', headers=headers)
+    assert json.loads(response.data)['task']['title'] == 'After'
+
+
+def test_lru_counters_with_ttl_expire():
+    """Test that task version counters are dropped once their ttl passes"""
+    backend = LRUCacheBackend()
+    backend.set_counter('task_ver:a', 7, -1)
+    backend.incr('tasks_gen:a')
+
+    assert backend.counter('task_ver:a') == 0
+    assert backend.counter('tasks_gen:a') == 1
+
+
+def test_expired_task_version_is_not_reused(app, client):
+    """Test that a task version that expired cannot bring back an older document"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    created = client.post('/api/tasks', headers=headers, json={'title': 'NEW'})
+    task_id = json.loads(created.data)['task']['id']
+
+    def title():
+        return json.loads(client.get(f'/api/tasks/{task_id}', headers=headers).data)['task']['title']
+
+    cache.init_app(app)
+    client.put(f'/api/tasks/{task_id}', headers=headers, json={'title': 'OLD'})
+    assert title() == 'OLD'
+
+    # The version expires while the document cached under it has not
+    cache.backend._counter_expiry[f'task_ver:{task_id}'] = 0
+    assert title() == 'OLD'
+    client.put(f'/api/tasks/{task_id}', headers=headers, json={'title': 'NEW'})
+    assert title() == 'NEW'
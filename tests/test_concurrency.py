@@ -0,0 +1,107 @@
+import json
+import time
+from pymongo.errors import ExecutionTimeout
+from app.models.task import Task
+from app.utils.concurrency import AdaptiveLimiter, limiter
+from tests.test_tasks import get_auth_token
+
+
+def test_limiter_sheds_auth_before_reads():
+    """Test that each request class only uses its share of the limit"""
+    adaptive = AdaptiveLimiter(initial=10, shares={'read': 1.0, 'write': 0.8, 'auth': 0.3})
+
+    assert all(adaptive.try_acquire('auth') for _ in range(3))
+    assert adaptive.try_acquire('auth') is False
+    assert all(adaptive.try_acquire('read') for _ in range(7))
+    assert adaptive.try_acquire('write') is False
+    assert adaptive.try_acquire('read') is False
+
+    stats = adaptive.stats()
+    assert stats['in_flight'] == 10
+    assert stats['shed'] == {'read': 1, 'write': 1, 'auth': 1}
+
+
+def test_limiter_adapts_to_latency():
+    """Test additive increase on fast requests and backoff on slow ones"""
+    adaptive = AdaptiveLimiter(initial=10, min_limit=4, target_latency=0.1)
+
+    adaptive.try_acquire('read')
+    adaptive.release(0.01)
+    assert adaptive.limit > 10
+
+    for _ in range(50):
+        adaptive.try_acquire('read')
+        adaptive.release(1.0)
+    assert adaptive.limit == 4
+
+    adaptive.try_acquire('auth')
+    adaptive.release(None)
+    assert adaptive.limit == 4
+
+
+def test_overloaded_requests_get_503(client):
+    """Test that requests above the limit are shed with Retry-After"""
+    token = get_auth_token(client)
+    shed_before = limiter.stats()['shed']['read']
+    slots = int(limiter.limiter.limit)
+    for _ in range(slots):
+        limiter.limiter.try_acquire('read')
+
+    try:
+        response = client.get('/api/tasks', headers={'Authorization': f'Bearer {token}'})
+        health = client.get('/healthz')
+    finally:
+        for _ in range(slots):
+            limiter.limiter.release()
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert 'Retry-After' not in health.headers
+    assert limiter.stats()['shed']['read'] == shed_before + 1
+
+    response = client.get('/api/tasks', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+
+
+def test_expired_deadline_is_rejected(client):
+    """Test that requests queued past their deadline are not run"""
+    token = get_auth_token(client)
+    queued_since = time.time() - 60
+
+    response = client.post('/api/tasks',
+                           headers={'Authorization': f'Bearer {token}',
+                                    'X-Request-Start': f't={queued_since:.3f}'},
+                           json={'title': 'Too late'})
+
+    assert response.status_code == 503
+    assert json.loads(response.data)['message'] == 'Request deadline exceeded'
+
+    response = client.get('/api/tasks', headers={'Authorization': f'Bearer {token}'})
+    assert json.loads(response.data)['total'] == 0
+
+
+def test_limit_is_sized_to_worker_threads(app):
+    """Test that the limit never exceeds the requests a worker can run at once"""
+    assert limiter.shedding is True
+    assert limiter.limiter.max_limit == app.config['CONCURRENCY_WORKER_THREADS']
+    assert limiter.stats()['limit'] <= app.config['CONCURRENCY_WORKER_THREADS']
+
+
+def test_database_timeouts_get_503(client, monkeypatch):
+    """Test that a query over the deadline is not reported as a client error"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/api/tasks', headers=headers, json={'title': 'Slow'})
+    task_id = json.loads(response.data)['task']['id']
+
+    def timeout(*args, **kwargs):
+        raise ExecutionTimeout('operation exceeded time limit', 50)
+
+    monkeypatch.setattr(Task, 'find_by_id', timeout)
+    monkeypatch.setattr(Task, 'create_task', timeout)
+
+    response = client.get(f'/api/tasks/{task_id}', headers=headers)
+    assert response.status_code == 503
+    assert json.loads(response.data)['message'] == 'Request deadline exceeded'
+    response = client.post('/api/tasks', headers=headers, json={'title': 'Slower'})
+    assert response.status_code == 503
@@ -0,0 +1,98 @@
+import json
+from tests.test_tasks import get_auth_token
+
+
+def read_until(response, marker):
+    """Read chunks from a streaming response until ``marker`` appears"""
+    body = ''
+    for chunk in response.response:
+        body += chunk.decode() if isinstance(chunk, bytes) else chunk
+        if marker in body:
+            return body
+    return body
+
+
+def test_stream_delivers_task_events(client):
+    """Test that task writes are pushed to an open stream"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    stream = client.get('/api/events', headers=headers, buffered=False)
+    assert stream.status_code == 200
+    assert stream.mimetype == 'text/event-stream'
+
+    response = client.post('/api/tasks', headers=headers,
+                           json={'title': 'Live Task', 'description': 'Description'})
+    task_id = json.loads(response.data)['task']['id']
+    client.delete(f'/api/tasks/{task_id}', headers=headers)
+
+    body = read_until(stream, 'task.deleted')
+    stream.close()
+
+    assert 'event: task.created' in body
+    assert 'Live Task' in body
+    assert 'event: task.deleted' in body
+
+
+def test_stream_resumes_from_last_event_id(client):
+    """Test that a reconnecting client receives the events it missed"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    stream = client.get('/api/events', headers=headers, buffered=False)
+    client.post('/api/tasks', headers=headers,
+                json={'title': 'First', 'description': 'Description'})
+    body = read_until(stream, 'task.created')
+    stream.close()
+
+    last_event_id = [line[4:] for line in body.splitlines() if line.startswith('id: ')][-1]
+
+    client.post('/api/tasks', headers=headers,
+                json={'title': 'Second', 'description': 'Description'})
+
+    stream = client.get('/api/events', buffered=False,
+                        headers={**headers, 'Last-Event-ID': last_event_id})
+    body = read_until(stream, 'Second')
+    stream.close()
+
+    assert 'Second' in body
+    assert 'First' not in body
+
+
+def test_stream_heartbeat_and_unknown_event_id(app, client):
+    """Test heartbeats and the reset event for an unknown Last-Event-ID"""
+    app.config['EVENTS_HEARTBEAT_INTERVAL'] = 0.01
+    token = get_auth_token(client)
+
+    stream = client.get('/api/events', buffered=False,
+                        headers={'Authorization': f'Bearer {token}', 'Last-Event-ID': 'stale'})
+    body = read_until(stream, ': heartbeat')
+    stream.close()
+
+    assert 'event: reset' in body
+    assert ': heartbeat' in body
+
+
+def test_stream_connection_limit(app, client):
+    """Test that streams per user are capped"""
+    app.config['EVENTS_MAX_CONNECTIONS_PER_USER'] = 1
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = client.get('/api/events', headers=headers, buffered=False)
+    second = client.get('/api/events', headers=headers, buffered=False)
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+
+    first.close()
+    third = client.get('/api/events', headers=headers, buffered=False)
+    assert third.status_code == 200
+    third.close()
+
+
+def test_stream_requires_token(client):
+    """Test that the event stream is protected"""
+    response = client.get('/api/events')
+
+    assert response.status_code == 401
@@ -0,0 +1,27 @@
+import json
+import pytest
+from app import reinit_after_fork
+from app.extensions import mongo
+from app.storage import storage
+
+
+def test_healthz(client):
+    """Test the readiness check"""
+    response = client.get('/healthz')
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['status'] == 'ok'
+    assert data['storage'] == storage.name
+
+
+def test_reinit_after_fork_replaces_client(app):
+    """Test that a forked worker gets a new Mongo client"""
+    if storage.name != 'mongo':
+        pytest.skip('only the mongo engine holds a client')
+
+    parent_client = mongo.cx
+
+    reinit_after_fork(app)
+
+    assert mongo.cx is not parent_client
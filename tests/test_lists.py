@@ -0,0 +1,196 @@
+import json
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.utils.events import events
+from app.utils.reminders import reminders
+from tests.test_tasks import get_auth_token
+
+
+def login_as(client, username):
+    """Register ``username`` and return auth headers for them"""
+    client.post('/api/auth/register', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'otherpass123'
+    })
+    response = client.post('/api/auth/login',
+                           json={'username': username, 'password': 'otherpass123'})
+    return {'Authorization': f"Bearer {json.loads(response.data)['token']}"}
+
+
+def create_list(client, headers, name='Household'):
+    response = client.post('/api/lists', headers=headers, json={'name': name})
+    assert response.status_code == 201
+    return json.loads(response.data)['list']['id']
+
+
+def share(client, headers, list_id, username, role):
+    return client.post(f'/api/lists/{list_id}/members', headers=headers,
+                       json={'username': username, 'role': role})
+
+
+def create_task(client, headers, title, **fields):
+    response = client.post('/api/tasks', headers=headers, json={'title': title, **fields})
+    assert response.status_code == 201, response.data
+    return json.loads(response.data)['task']
+
+
+def titles(client, headers, query=''):
+    response = client.get(f'/api/tasks{query}', headers=headers)
+    assert response.status_code == 200
+    return sorted(task['title'] for task in json.loads(response.data)['tasks'])
+
+
+def test_members_see_and_edit_list_tasks(client):
+    """Test that list tasks show up for every member next to their own tasks"""
+    owner = {'Authorization': f'Bearer {get_auth_token(client)}'}
+    editor = login_as(client, 'editor')
+    list_id = create_list(client, owner)
+    assert share(client, owner, list_id, 'editor', 'editor').status_code == 200
+
+    shared = create_task(client, owner, 'Groceries', list_id=list_id)
+    assert shared['list_id'] == list_id
+    create_task(client, owner, 'Private')
+    create_task(client, editor, 'Mine')
+
+    # Warm the cached pages before the shared task changes
+    assert titles(client, owner) == ['Groceries', 'Private']
+    assert titles(client, editor) == ['Groceries', 'Mine']
+    assert titles(client, editor, f'?list_id={list_id}') == ['Groceries']
+
+    response = client.put(f"/api/tasks/{shared['id']}", headers=editor, json={'completed': True})
+    assert response.status_code == 200
+    response = client.get(f"/api/tasks/{shared['id']}", headers=owner)
+    assert json.loads(response.data)['task']['completed'] is True
+    assert titles(client, owner, '?completed=true') == ['Groceries']
+    assert titles(client, owner, '?completed=false') == ['Private']
+
+    response = client.get('/api/lists', headers=editor)
+    assert [(item['name'], item['role']) for item in json.loads(response.data)['lists']] == \
+        [('Household', 'editor')]
+
+
+def test_viewers_cannot_change_tasks(client):
+    """Test that a viewer can read list tasks but every write is refused"""
+    owner = {'Authorization': f'Bearer {get_auth_token(client)}'}
+    viewer = login_as(client, 'viewer')
+    list_id = create_list(client, owner)
+    share(client, owner, list_id, 'viewer', 'viewer')
+    task = create_task(client, owner, 'Read only', list_id=list_id)
+
+    assert client.get(f"/api/tasks/{task['id']}", headers=viewer).status_code == 200
+    assert client.put(f"/api/tasks/{task['id']}", headers=viewer,
+                      json={'title': 'Changed'}).status_code == 404
+    assert client.delete(f"/api/tasks/{task['id']}", headers=viewer).status_code == 404
+    assert client.post(f"/api/tasks/{task['id']}/move", headers=viewer,
+                       json={'after': None}).status_code == 404
+    for fields in ({'list_id': list_id}, {'parent_id': task['id']}):
+        response = client.post('/api/tasks', headers=viewer, json={'title': 'Nope', **fields})
+        assert response.status_code == 400
+
+    # Promoting the viewer takes effect on their next request
+    share(client, owner, list_id, 'viewer', 'editor')
+    assert client.put(f"/api/tasks/{task['id']}", headers=viewer,
+                      json={'title': 'Changed'}).status_code == 200
+
+
+def test_removed_members_lose_access(client):
+    """Test that removing a member hides the list, even from cached reads"""
+    owner = {'Authorization': f'Bearer {get_auth_token(client)}'}
+    member = login_as(client, 'member')
+    list_id = create_list(client, owner)
+    share(client, owner, list_id, 'member', 'editor')
+    task = create_task(client, owner, 'Shared', list_id=list_id)
+
+    assert client.get(f"/api/tasks/{task['id']}", headers=member).status_code == 200
+    assert titles(client, member) == ['Shared']
+
+    members = json.loads(client.get(f'/api/lists/{list_id}/members', headers=owner).data)['members']
+    assert [(m['username'], m['role']) for m in members] == [('testuser', 'owner'), ('member', 'editor')]
+    response = client.delete(f"/api/lists/{list_id}/members/{members[1]['user_id']}", headers=owner)
+    assert response.status_code == 200
+
+    assert client.get(f"/api/tasks/{task['id']}", headers=member).status_code == 404
+    assert titles(client, member) == []
+    assert client.get(f'/api/tasks?list_id={list_id}', headers=member).status_code == 404
+
+
+def test_list_management_rules(client):
+    """Test who may share, leave and delete a list"""
+    owner = {'Authorization': f'Bearer {get_auth_token(client)}'}
+    editor = login_as(client, 'editor')
+    stranger = login_as(client, 'stranger')
+    list_id = create_list(client, owner)
+    share(client, owner, list_id, 'editor', 'editor')
+
+    assert share(client, editor, list_id, 'stranger', 'viewer').status_code == 403
+    assert share(client, stranger, list_id, 'stranger', 'owner').status_code == 404
+    assert share(client, owner, list_id, 'stranger', 'admin').status_code == 400
+    assert share(client, owner, list_id, 'nobody', 'viewer').status_code == 404
+    assert share(client, owner, list_id, 'testuser', 'viewer').status_code == 400
+    assert client.delete(f'/api/lists/{list_id}', headers=editor).status_code == 403
+    assert client.get(f'/api/lists/{ObjectId()}/members', headers=owner).status_code == 404
+    assert client.post('/api/lists', headers=owner, json={'name': ' '}).status_code == 400
+
+    members = json.loads(client.get(f'/api/lists/{list_id}/members', headers=editor).data)['members']
+    owner_id, editor_id = (member['user_id'] for member in members)
+    assert client.delete(f'/api/lists/{list_id}/members/{owner_id}',
+                         headers=editor).status_code == 403
+    assert client.delete(f'/api/lists/{list_id}/members/{owner_id}',
+                         headers=owner).status_code == 400
+
+    # Members can leave on their own
+    assert client.delete(f'/api/lists/{list_id}/members/{editor_id}',
+                         headers=editor).status_code == 200
+    assert json.loads(client.get('/api/lists', headers=editor).data)['lists'] == []
+
+
+def test_delete_list_and_subtasks(client):
+    """Test that subtasks stay in their parent's list and go with it"""
+    owner = {'Authorization': f'Bearer {get_auth_token(client)}'}
+    list_id = create_list(client, owner)
+    other_list = create_list(client, owner, 'Work')
+    parent = create_task(client, owner, 'Trip', list_id=list_id)
+    child = create_task(client, owner, 'Pack', parent_id=parent['id'])
+    personal = create_task(client, owner, 'Personal')
+    assert child['list_id'] == list_id
+
+    response = client.post('/api/tasks', headers=owner,
+                           json={'title': 'Mixed', 'parent_id': parent['id'], 'list_id': other_list})
+    assert response.status_code == 400
+    response = client.put(f"/api/tasks/{personal['id']}", headers=owner,
+                          json={'parent_id': parent['id']})
+    assert response.status_code == 400
+
+    assert client.delete(f'/api/lists/{list_id}', headers=owner).status_code == 200
+    assert client.get(f"/api/tasks/{child['id']}", headers=owner).status_code == 404
+    assert titles(client, owner) == ['Personal']
+    assert [item['name'] for item in json.loads(client.get('/api/lists', headers=owner).data)['lists']] == \
+        ['Work']
+
+
+def test_list_events_reach_every_member(app, client, monkeypatch):
+    """Test that changes and reminders of list tasks are published to each member"""
+    owner = {'Authorization': f'Bearer {get_auth_token(client)}'}
+    viewer = login_as(client, 'viewer')
+    list_id = create_list(client, owner)
+    share(client, owner, list_id, 'viewer', 'viewer')
+    members = json.loads(client.get(f'/api/lists/{list_id}/members', headers=owner).data)['members']
+    user_ids = {member['user_id']: member['role'] for member in members}
+
+    published = []
+
+    def publish(user_id, event_type, data):
+        published.append((user_ids.get(str(user_id), str(user_id)), event_type))
+
+    monkeypatch.setattr(events, 'publish', publish)
+
+    due = (datetime.utcnow() - timedelta(minutes=1)).replace(microsecond=0).isoformat() + 'Z'
+    task = create_task(client, owner, 'Shared', list_id=list_id, due_at=due)
+    create_task(client, owner, 'Private')
+    client.put(f"/api/tasks/{task['id']}", headers=owner, json={'completed': False})
+    assert reminders.run_once(datetime.utcnow()) == 1
+    client.delete(f"/api/tasks/{task['id']}", headers=owner)
+
+    assert sorted(published) == sorted(
+        [(member, event_type) for member in ('owner', 'viewer')
+         for event_type in ('task.created', 'task.updated', 'task.due', 'task.deleted')] +
+        [('owner', 'task.created')])
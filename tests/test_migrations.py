@@ -0,0 +1,59 @@
+import json
+from datetime import datetime
+from bson import ObjectId
+from app.models.task import Task
+from app.storage import storage
+from tests.test_tasks import get_auth_token
+
+
+def insert_legacy_task(user_id, title):
+    """Insert a task the way older versions stored it, with a string user_id"""
+    return storage.tasks.insert({
+        'user_id': str(user_id),
+        'title': title,
+        'description': 'Description',
+        'completed': False,
+        'created_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow()
+    })
+
+
+def test_new_tasks_store_object_id(app, client):
+    """Test that tasks are created with an ObjectId user_id"""
+    token = get_auth_token(client)
+
+    response = client.post('/api/tasks',
+                           headers={'Authorization': f'Bearer {token}'},
+                           json={'title': 'Task', 'description': 'Description'})
+    task_id = json.loads(response.data)['task']['id']
+
+    with app.app_context():
+        task = storage.tasks.get(ObjectId(task_id))
+        assert isinstance(task['user_id'], ObjectId)
+
+
+def test_dual_read_and_migration(app, client):
+    """Test that legacy tasks are readable before and after migration"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with app.app_context():
+        user_id = storage.users.find_by('username', 'testuser')['_id']
+        legacy_id = insert_legacy_task(user_id, 'Legacy')
+        storage.tasks.insert({'user_id': 'not-an-object-id', 'title': 'Broken'})
+    client.post('/api/tasks', headers=headers, json={'title': 'New'})
+
+    response = client.get('/api/tasks', headers=headers)
+    assert json.loads(response.data)['total'] == 2
+
+    with app.app_context():
+        migrated, skipped = Task.migrate_user_ids(batch_size=1)
+        assert (migrated, skipped) == (1, 1)
+        assert storage.tasks.get(legacy_id)['user_id'] == user_id
+
+    app.config['TASK_USER_ID_DUAL_READ'] = False
+    response = client.get('/api/tasks', headers=headers)
+    assert json.loads(response.data)['total'] == 2
+
+    response = client.get(f'/api/tasks/{legacy_id}', headers=headers)
+    assert response.status_code == 200
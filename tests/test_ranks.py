@@ -0,0 +1,243 @@
+import json
+import random
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from app.models.task import Task
+from app.storage import storage
+from app.utils.ranks import key_between, rebalancer, spread_keys
+from tests.test_lists import create_list, create_task, login_as, share
+from tests.test_tasks import get_auth_token
+
+
+def manual_order(client, headers, query=''):
+    response = client.get(f'/api/tasks?sort=manual&per_page=100{query}', headers=headers)
+    assert response.status_code == 200
+    return [task['title'] for task in json.loads(response.data)['tasks']]
+
+
+def move(client, headers, task_id, after):
+    return client.post(f'/api/tasks/{task_id}/move', headers=headers, json={'after': after})
+
+
+def test_key_between_keeps_order():
+    """Test that generated keys always sort between their neighbours"""
+    rng = random.Random(7)
+    keys = []
+    for _ in range(2000):
+        position = rng.randint(0, len(keys))
+        low = keys[position - 1] if position else None
+        high = keys[position] if position < len(keys) else None
+        key = key_between(low, high)
+        assert (low is None or low < key) and (high is None or key < high)
+        assert not key.endswith('0')
+        keys.insert(position, key)
+
+    assert max(len(key) for key in keys) < 10
+
+    keys = spread_keys(5000)
+    assert keys == sorted(set(keys)) and len(keys) == 5000
+
+
+def test_manual_order_and_move(client):
+    """Test that new tasks come first and moves reorder the manual list"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    ids = {}
+    for title in ('C', 'B', 'A'):
+        response = client.post('/api/tasks', headers=headers, json={'title': title})
+        ids[title] = json.loads(response.data)['task']['id']
+    assert manual_order(client, headers) == ['A', 'B', 'C']
+
+    assert move(client, headers, ids['A'], ids['C']).status_code == 200
+    assert manual_order(client, headers) == ['B', 'C', 'A']
+
+    assert move(client, headers, ids['A'], ids['B']).status_code == 200
+    assert manual_order(client, headers) == ['B', 'A', 'C']
+
+    assert move(client, headers, ids['C'], None).status_code == 200
+    assert manual_order(client, headers) == ['C', 'B', 'A']
+
+    # The other list paths honour the same order
+    response = client.get('/api/tasks?sort=manual&completed=false', headers=headers)
+    assert [t['title'] for t in json.loads(response.data)['tasks']] == ['C', 'B', 'A']
+
+
+def test_move_validation(client):
+    """Test the error responses of the move endpoint"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/api/tasks', headers=headers, json={'title': 'Only'})
+    task_id = json.loads(response.data)['task']['id']
+
+    assert client.post(f'/api/tasks/{task_id}/move', headers=headers, json={}).status_code == 400
+    assert move(client, headers, task_id, task_id).status_code == 400
+    assert move(client, headers, task_id, 'not-an-id').status_code == 400
+    assert move(client, headers, task_id, str(ObjectId())).status_code == 404
+    assert move(client, headers, str(ObjectId()), None).status_code == 404
+    assert client.get('/api/tasks?sort=bogus', headers=headers).status_code == 400
+    response = client.get('/api/tasks?sort=manual&include_archived=true', headers=headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('rebalance_async', [False, True])
+def test_long_keys_trigger_rebalance(app, client, rebalance_async):
+    """Test that keys growing past the limit are respaced in the same order"""
+    app.config['TASK_RANK_MAX_LENGTH'] = 3
+    app.config['TASK_RANK_REBALANCE_ASYNC'] = rebalance_async
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    ids = []
+    for i in range(3):
+        response = client.post('/api/tasks', headers=headers, json={'title': f'T{i}'})
+        ids.append(json.loads(response.data)['task']['id'])
+
+    # Moving tasks into the same gap again and again lengthens their keys; with
+    # rebalance_async the respacing runs on the worker thread, racing the moves
+    for _ in range(10):
+        assert move(client, headers, ids[0], ids[2]).status_code == 200
+        assert move(client, headers, ids[1], ids[2]).status_code == 200
+    rebalancer.flush()
+    order = manual_order(client, headers)
+    assert order == ['T2', 'T1', 'T0']
+    assert rebalancer.stats()['rebalanced'] >= 1
+    assert rebalancer.stats()['pending'] == 0
+
+    # A rebalance after the last move leaves the shortest keys
+    with app.app_context():
+        rebalancer.request(storage.tasks.get(ObjectId(ids[0]))['user_id'])
+    rebalancer.flush()
+    assert manual_order(client, headers) == order
+    with app.app_context():
+        ranks = [task['rank'] for task in storage.tasks.rank_order(None)]
+    assert max(len(rank) for rank in ranks) == 1
+
+
+def test_move_racing_a_rebalance_is_placed_again(app, client, monkeypatch):
+    """Test that a move whose neighbours are respaced before its write is redone"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    ids = {}
+    for title in ('C', 'B', 'A'):
+        response = client.post('/api/tasks', headers=headers, json={'title': title})
+        ids[title] = json.loads(response.data)['task']['id']
+    with app.app_context():
+        user_id = storage.tasks.get(ObjectId(ids['A']))['user_id']
+
+    next_rank = storage.tasks.next_rank
+
+    def respaced_after_read(*args, **kwargs):
+        # The rebalance lands between the move's reads and its write
+        following = next_rank(*args, **kwargs)
+        monkeypatch.setattr(storage.tasks, 'next_rank', next_rank)
+        Task.rebalance_ranks(user_id)
+        return following
+
+    with app.app_context():
+        storage.tasks.replace_ranks([(ObjectId(ids[t]), storage.tasks.get(ObjectId(ids[t]))['rank'], rank)
+                                     for t, rank in (('A', 'x1'), ('B', 'x2'), ('C', 'x3'))])
+        monkeypatch.setattr(storage.tasks, 'next_rank', respaced_after_read)
+    assert move(client, headers, ids['A'], ids['B']).status_code == 200
+    assert manual_order(client, headers) == ['B', 'A', 'C']
+
+
+def test_rebalance_racing_a_move_places_it_again(app, client, monkeypatch):
+    """Test that a task moved between a rebalance's read and write ends up in place"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    ids = {}
+    for title in ('C', 'B', 'A'):
+        response = client.post('/api/tasks', headers=headers, json={'title': title})
+        ids[title] = json.loads(response.data)['task']['id']
+    with app.app_context():
+        user_id = storage.tasks.get(ObjectId(ids['A']))['user_id']
+
+    replace_ranks = storage.tasks.replace_ranks
+
+    def moved_before_write(changes):
+        # The move reads, writes and checks its neighbours before the bulk write
+        monkeypatch.setattr(storage.tasks, 'replace_ranks', replace_ranks)
+        assert move(client, headers, ids['A'], ids['C']).status_code == 200
+        return replace_ranks(changes)
+
+    with app.app_context():
+        monkeypatch.setattr(storage.tasks, 'replace_ranks', moved_before_write)
+        Task.rebalance_ranks(user_id)
+    assert manual_order(client, headers) == ['B', 'C', 'A']
+
+
+def test_unranked_tasks_are_ranked_by_the_command(app, client):
+    """Test that tasks stored before manual ordering existed are ranked in place"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.post('/api/tasks', headers=headers, json={'title': 'Ranked'})
+    ranked_id = json.loads(response.data)['task']['id']
+
+    with app.app_context():
+        user_id = storage.tasks.get(ObjectId(ranked_id))['user_id']
+        for title, day in (('Old', 1), ('Older', 0)):
+            storage.tasks.insert({
+                'user_id': user_id, 'title': title, 'description': '', 'completed': False,
+                'created_at': datetime(2020, 1, 1 + day), 'updated_at': datetime(2020, 1, 1)
+            })
+
+    # Unranked tasks sort first; moves next to them wait for the command
+    assert manual_order(client, headers)[-1] == 'Ranked'
+    assert move(client, headers, ranked_id, None).status_code == 409
+
+    result = app.test_cli_runner().invoke(args=['rank-tasks', '--pause', '0'])
+    assert 'Respaced 1 manual orders, rewriting 3 ranks' in result.output
+    assert manual_order(client, headers) == ['Old', 'Older', 'Ranked']
+    with app.app_context():
+        assert storage.tasks.find_unranked(None, 10) == []
+
+    assert move(client, headers, ranked_id, None).status_code == 200
+    assert manual_order(client, headers) == ['Ranked', 'Old', 'Older']
+
+
+def test_tied_ranks_page_without_gaps(app, client):
+    """Test that tasks sharing a rank are each listed once across pages"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    ids = [json.loads(client.post('/api/tasks', headers=headers, json={'title': title}).data)['task']['id']
+           for title in ('A', 'B', 'C')]
+
+    with app.app_context():
+        # As left by a move racing a rebalance, before either repairs it
+        for task_id in ids:
+            storage.tasks.update(ObjectId(task_id), None, {'rank': 'm'})
+
+    titles = []
+    for page in (1, 2, 3):
+        response = client.get(f'/api/tasks?sort=manual&per_page=1&page={page}', headers=headers)
+        titles += [task['title'] for task in json.loads(response.data)['tasks']]
+    assert sorted(titles) == ['A', 'B', 'C']
+
+
+def test_each_list_has_its_own_order(app, client):
+    """Test that list members neither share nor rewrite each other's orders"""
+    owner = {'Authorization': f'Bearer {get_auth_token(client)}'}
+    viewer = login_as(client, 'viewer')
+    list_id = create_list(client, owner)
+    share(client, owner, list_id, 'viewer', 'viewer')
+    listed = [create_task(client, owner, title, list_id=list_id)['id'] for title in ('T', 'U', 'V')]
+    own = create_task(client, viewer, 'Mine')['id']
+
+    with app.app_context():
+        ranks = [storage.tasks.get(ObjectId(task_id))['rank'] for task_id in listed]
+        viewer_id = storage.tasks.get(ObjectId(own))['user_id']
+        assert Task.rebalance_ranks(viewer_id) == 0
+        assert Task.rebalance_ranks(viewer_id, list_id) == 0
+        assert [storage.tasks.get(ObjectId(task_id))['rank'] for task_id in listed] == ranks
+
+    # The viewer's own task cannot be placed among the list's tasks
+    response = move(client, viewer, own, listed[0])
+    assert response.status_code == 400
+    assert move(client, viewer, own, None).status_code == 200
+    assert manual_order(client, owner, f'&list_id={list_id}') == ['V', 'U', 'T']
+    assert manual_order(client, viewer, f'&list_id={list_id}') == ['V', 'U', 'T']
+    # Without list_id each order comes in turn, not interleaved by rank
+    assert manual_order(client, viewer) == ['Mine', 'V', 'U', 'T']
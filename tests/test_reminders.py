@@ -0,0 +1,139 @@
+import json
+from datetime import datetime, timedelta
+from app.models.task import Task
+from app.utils.reminders import reminders
+from tests.test_events import read_until
+from tests.test_tasks import get_auth_token
+
+
+def iso(moment):
+    return moment.replace(microsecond=0).isoformat() + 'Z'
+
+
+def create(client, headers, title, **fields):
+    response = client.post('/api/tasks', headers=headers,
+                           json={'title': title, 'description': '', **fields})
+    assert response.status_code == 201
+    return json.loads(response.data)['task']
+
+
+def test_create_task_with_due_date_and_priority(client):
+    """Test that due_at and priority are stored and returned"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    task = create(client, headers, 'Deadline', due_at='2030-01-02T12:30:00+02:00', priority=3)
+    assert task['due_at'] == '2030-01-02T10:30:00'
+    assert task['priority'] == 3
+
+    plain = create(client, headers, 'No deadline')
+    assert plain['due_at'] is None
+    assert plain['priority'] == 0
+
+    response = client.put(f"/api/tasks/{task['id']}", headers=headers, json={'due_at': None})
+    assert json.loads(response.data)['task']['due_at'] is None
+
+
+def test_due_date_and_priority_validation(client):
+    """Test that malformed due dates and out-of-range priorities are rejected"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    for fields in ({'due_at': 'tomorrow'}, {'due_at': 12}, {'priority': 4},
+                   {'priority': -1}, {'priority': True}, {'priority': '2'}):
+        response = client.post('/api/tasks', headers=headers, json={'title': 'Bad', **fields})
+        assert response.status_code == 400, fields
+
+    task = create(client, headers, 'Good')
+    response = client.put(f"/api/tasks/{task['id']}", headers=headers, json={'priority': 9})
+    assert response.status_code == 400
+
+
+def test_upcoming_tasks(client):
+    """Test that upcoming returns open tasks due in the window, soonest first"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    now = datetime.utcnow()
+
+    later = create(client, headers, 'Later', due_at=iso(now + timedelta(hours=5)))
+    overdue = create(client, headers, 'Overdue', due_at=iso(now - timedelta(days=2)))
+    create(client, headers, 'Next week', due_at=iso(now + timedelta(days=7)))
+    create(client, headers, 'Undated')
+    done = create(client, headers, 'Done', due_at=iso(now + timedelta(hours=1)))
+    client.put(f"/api/tasks/{done['id']}", headers=headers, json={'completed': True})
+
+    response = client.get('/api/tasks/upcoming', headers=headers)
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [t['id'] for t in data['tasks']] == [overdue['id'], later['id']]
+
+    response = client.get('/api/tasks/upcoming?within_hours=240&limit=2', headers=headers)
+    assert [t['title'] for t in json.loads(response.data)['tasks']] == ['Overdue', 'Later']
+
+    response = client.get('/api/tasks/upcoming?limit=0', headers=headers)
+    assert response.status_code == 400
+    for within_hours in ('nan', 'inf', '1e10', '-1', str(24 * 365 + 1)):
+        response = client.get(f'/api/tasks/upcoming?within_hours={within_hours}', headers=headers)
+        assert response.status_code == 400, within_hours
+    response = client.get(f'/api/tasks/upcoming?within_hours={24 * 365}', headers=headers)
+    assert response.status_code == 200
+
+
+def test_upcoming_tasks_are_per_user(client):
+    """Test that upcoming never returns another user's tasks"""
+    token = get_auth_token(client)
+    create(client, {'Authorization': f'Bearer {token}'}, 'Mine',
+           due_at=iso(datetime.utcnow()))
+
+    client.post('/api/auth/register', json={
+        'username': 'other', 'email': 'other@example.com', 'password': 'otherpass123'
+    })
+    response = client.post('/api/auth/login',
+                           json={'username': 'other', 'password': 'otherpass123'})
+    other = json.loads(response.data)['token']
+
+    response = client.get('/api/tasks/upcoming', headers={'Authorization': f'Bearer {other}'})
+    assert json.loads(response.data)['tasks'] == []
+
+
+def test_reminders_are_sent_once(app, client):
+    """Test that each task that came due is announced exactly once"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    now = datetime.utcnow()
+
+    create(client, headers, 'Due now', due_at=iso(now - timedelta(minutes=1)))
+    create(client, headers, 'Long overdue', due_at=iso(now - timedelta(days=3)))
+    create(client, headers, 'Not yet', due_at=iso(now + timedelta(hours=1)))
+
+    stream = client.get('/api/events', headers=headers, buffered=False)
+    assert reminders.run_once(now) == 1
+    body = read_until(stream, 'task.due')
+    stream.close()
+
+    assert 'Due now' in body
+    assert reminders.run_once(now) == 0
+    # The next pass wakes up when 'Not yet' comes due, or after the poll interval
+    assert reminders.seconds_until_next(now) == app.config['TASK_REMINDER_INTERVAL']
+    app.config['TASK_REMINDER_INTERVAL'] = 7200
+    assert 3598 <= reminders.seconds_until_next(now) <= 3600
+    assert reminders.run_once(now + timedelta(hours=2)) == 1
+    assert reminders.stats()['sent'] == 2
+
+
+def test_new_due_date_rearms_reminder(app, client):
+    """Test that moving the due date of a reminded task schedules a new reminder"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    now = datetime.utcnow()
+
+    task = create(client, headers, 'Moved', due_at=iso(now - timedelta(minutes=1)))
+    assert reminders.run_once(now) == 1
+
+    client.put(f"/api/tasks/{task['id']}", headers=headers,
+               json={'due_at': iso(now + timedelta(minutes=30))})
+    assert reminders.run_once(now) == 0
+
+    with app.app_context():
+        assert Task.next_due_at(now) is not None
+    assert reminders.run_once(now + timedelta(hours=1)) == 1
@@ -0,0 +1,131 @@
+import threading
+import time
+from bson import ObjectId
+from app.models.task import Task
+from app.storage import storage
+from app.utils.singleflight import singleflight
+
+
+def run_concurrently(app, count, target):
+    """Call ``target()`` from ``count`` threads; returns their results in order"""
+    results = [None] * count
+
+    def worker(index):
+        with app.app_context():
+            try:
+                results[index] = target()
+            except Exception as error:
+                results[index] = error
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+        # Give each thread time to join the call in flight
+        time.sleep(0.02)
+    return threads, results
+
+
+def blocking_read(release, calls, result='rows'):
+    def read():
+        calls.append(threading.get_ident())
+        release.wait(5)
+        return result
+    return read
+
+
+def test_concurrent_reads_share_one_call(app):
+    """Test that identical reads in flight together run the read once"""
+    release, calls = threading.Event(), []
+    read = blocking_read(release, calls)
+
+    threads, results = run_concurrently(app, 4, lambda: singleflight.do('key', ['user'], read))
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['rows'] * 4
+    assert len(calls) == 1
+    assert singleflight.stats()['shared'] == 3
+    assert singleflight.stats()['in_flight'] == 0
+
+
+def test_failed_read_is_retried_by_each_follower(app):
+    """Test that the leader's error is not handed to the requests waiting on it"""
+    release, calls = threading.Event(), []
+
+    def read():
+        calls.append(threading.get_ident())
+        if len(calls) == 1:
+            release.wait(5)
+            raise RuntimeError('database unavailable')
+        return 'rows'
+
+    threads, results = run_concurrently(app, 3, lambda: singleflight.do('key', ['user'], read))
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == ['rows', 'rows']
+    assert len(calls) == 3
+    assert singleflight.stats()['errors'] == 1
+
+
+def test_followers_stop_waiting_after_timeout(app):
+    """Test that a follower runs its own read once the timeout passes"""
+    app.config['SINGLE_FLIGHT_TIMEOUT'] = 0.05
+    release, calls = threading.Event(), []
+    slow = blocking_read(release, calls, 'slow')
+
+    threads, results = run_concurrently(app, 1, lambda: singleflight.do('key', ['user'], slow))
+    with app.app_context():
+        assert singleflight.do('key', ['user'], lambda: 'own') == 'own'
+    release.set()
+    threads[0].join()
+
+    assert results == ['slow']
+    assert singleflight.stats()['timeouts'] == 1
+
+
+def test_writes_detach_reads_in_flight(app):
+    """Test that a request arriving after a write does not join an older read"""
+    release, calls = threading.Event(), []
+    stale = blocking_read(release, calls, 'stale')
+
+    threads, results = run_concurrently(app, 1, lambda: singleflight.do('key', ['list'], stale))
+    singleflight.forget('list')
+    with app.app_context():
+        assert singleflight.do('key', ['list'], lambda: 'fresh') == 'fresh'
+    release.set()
+    threads[0].join()
+
+    assert results == ['stale']
+    assert singleflight.stats()['shared'] == 0
+
+
+def test_task_pages_are_coalesced(app, monkeypatch):
+    """Test that concurrent requests for the same page of tasks query once"""
+    user_id = ObjectId()
+    with app.app_context():
+        for index in range(3):
+            Task.create_task(user_id, f'Task {index}', '')
+
+    release, calls = threading.Event(), []
+    find_page = storage.tasks.find_page
+
+    def slow_find_page(*args, **kwargs):
+        calls.append(args)
+        release.wait(5)
+        return find_page(*args, **kwargs)
+
+    monkeypatch.setattr(storage.tasks, 'find_page', slow_find_page)
+    # Page 2 is never cached, so every request would reach the database
+    threads, results = run_concurrently(
+        app, 3, lambda: Task.find_records(user_id, page=2, per_page=2))
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [[record.title for record in records] for records, total in results] == [['Task 0']] * 3
+    assert all(total == 3 for records, total in results)
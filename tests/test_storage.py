@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import DuplicateKeyError
+from app.models.task import RAW_CODEC_OPTIONS
+from app.storage.memory import MemoryStorage
+
+
+@pytest.fixture
+def engine():
+    return MemoryStorage()
+
+
+def insert_tasks(store, user_id, count, start=None):
+    start = start or datetime(2024, 1, 1)
+    return [
+        store.insert({
+            'user_id': user_id,
+            'title': f'Task {i}',
+            'description': '',
+            'completed': i % 2 == 0,
+            'created_at': start + timedelta(minutes=i),
+            'updated_at': start + timedelta(minutes=i)
+        })
+        for i in range(count)
+    ]
+
+
+def test_pages_are_newest_first(engine):
+    """Test pagination, filtering and counts per owner"""
+    owner, other = ObjectId(), ObjectId()
+    ids = insert_tasks(engine.tasks, owner, 5)
+    insert_tasks(engine.tasks, other, 3)
+
+    page = engine.tasks.find_page([owner], skip=1, limit=2)
+    assert [task['_id'] for task in page] == [ids[3], ids[2]]
+
+    completed = engine.tasks.find_page([owner], completed=True, limit=10)
+    assert [task['title'] for task in completed] == ['Task 4', 'Task 2', 'Task 0']
+
+    assert engine.tasks.count([owner]) == 5
+    assert engine.tasks.count([owner], completed=False) == 2
+    assert engine.tasks.count() == 8
+
+
+def test_dual_owners_and_projection(engine):
+    """Test matching legacy string owners and raw, projected pages"""
+    owner = ObjectId()
+    insert_tasks(engine.tasks, owner, 1)
+    insert_tasks(engine.tasks, str(owner), 1, start=datetime(2025, 1, 1))
+
+    assert engine.tasks.count([owner]) == 1
+    page = engine.tasks.find_page([owner, str(owner)], fields={'title': 1},
+                                  codec_options=RAW_CODEC_OPTIONS)
+    assert all(isinstance(task, RawBSONDocument) for task in page)
+    assert [set(task.keys()) for task in page] == [{'_id', 'title'}] * 2
+    assert page[0]['title'] == 'Task 0'
+
+
+def test_updates_report_changes(engine):
+    """Test owner checks and MongoDB's modified semantics"""
+    owner = ObjectId()
+    task_id = insert_tasks(engine.tasks, owner, 1)[0]
+
+    assert engine.tasks.update(task_id, [ObjectId()], {'title': 'Stolen'}) is False
+    assert engine.tasks.update(task_id, [owner], {'title': 'Renamed'}) is True
+    assert engine.tasks.update(task_id, [owner], {'title': 'Renamed'}) is False
+
+    task = engine.tasks.get(task_id, [owner])
+    task['title'] = 'Mutated copy'
+    assert engine.tasks.get(task_id)['title'] == 'Renamed'
+
+    assert engine.tasks.delete(task_id, [owner]) is True
+    assert engine.tasks.get(task_id) is None
+
+
+def test_datetimes_round_trip_like_mongo(engine):
+    """Test that stored datetimes are truncated to milliseconds"""
+    created_at = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    task_id = engine.tasks.insert({'user_id': ObjectId(), 'created_at': created_at})
+
+    assert engine.tasks.get(task_id)['created_at'].microsecond == 123000
+
+
+def test_users_are_unique(engine):
+    """Test unique username and email"""
+    engine.users.insert({'username': 'alice', 'email': 'alice@example.com'})
+
+    with pytest.raises(DuplicateKeyError) as error:
+        engine.users.insert({'username': 'alice2', 'email': 'alice@example.com'})
+    assert error.value.details['keyPattern'] == {'email': 1}
+
+    errors = engine.users.insert_many([
+        {'username': 'bob', 'email': 'bob@example.com'},
+        {'username': 'alice', 'email': 'other@example.com'}
+    ])
+    assert [(e['index'], e['keyPattern']) for e in errors] == [(1, {'username': 1})]
+    assert engine.users.find_by('email', 'bob@example.com')['username'] == 'bob'
@@ -0,0 +1,140 @@
+import json
+from bson import ObjectId
+from app.models.task import MAX_TASK_DEPTH
+from app.storage import storage
+from tests.test_tasks import get_auth_token
+
+
+def create(client, headers, title, parent_id=None):
+    response = client.post('/api/tasks', headers=headers,
+                           json={'title': title, 'parent_id': parent_id})
+    assert response.status_code == 201, response.data
+    return json.loads(response.data)['task']['id']
+
+
+def subtree(client, headers, task_id):
+    response = client.get(f'/api/tasks/{task_id}/subtree', headers=headers)
+    assert response.status_code == 200
+    return json.loads(response.data)['task']
+
+
+def shape(node):
+    return [node['title'], [shape(child) for child in node['subtasks']]]
+
+
+def test_subtree_and_rollup(client):
+    """Test that a subtree comes back nested, with completion rolled up"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    root = create(client, headers, 'Release')
+    docs = create(client, headers, 'Docs', root)
+    create(client, headers, 'Changelog', docs)
+    readme = create(client, headers, 'Readme', docs)
+    create(client, headers, 'Tag', root)
+    client.put(f'/api/tasks/{readme}', headers=headers, json={'completed': True})
+
+    tree = subtree(client, headers, root)
+    assert tree['parent_id'] is None
+    assert shape(tree) == ['Release', [['Tag', []], ['Docs', [['Readme', []], ['Changelog', []]]]]]
+    assert tree['rollup'] == {'total': 4, 'completed': 1}
+    assert tree['subtasks'][1]['rollup'] == {'total': 2, 'completed': 1}
+    assert tree['subtasks'][1]['parent_id'] == root
+
+    response = client.get(f'/api/tasks/{docs}', headers=headers)
+    assert json.loads(response.data)['task']['parent_id'] == root
+
+
+def test_move_branch(client):
+    """Test that re-parenting a task carries its whole branch along"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = create(client, headers, 'First')
+    second = create(client, headers, 'Second')
+    branch = create(client, headers, 'Branch', first)
+    create(client, headers, 'Leaf', create(client, headers, 'Twig', branch))
+
+    response = client.put(f'/api/tasks/{branch}', headers=headers, json={'parent_id': second})
+    assert response.status_code == 200
+    assert json.loads(response.data)['task']['parent_id'] == second
+
+    assert shape(subtree(client, headers, first)) == ['First', []]
+    assert shape(subtree(client, headers, second)) == \
+        ['Second', [['Branch', [['Twig', [['Leaf', []]]]]]]]
+
+    response = client.put(f'/api/tasks/{branch}', headers=headers, json={'parent_id': None})
+    assert json.loads(response.data)['task']['parent_id'] is None
+    assert shape(subtree(client, headers, branch)) == ['Branch', [['Twig', [['Leaf', []]]]]]
+
+
+def test_invalid_parents(client):
+    """Test that cycles, unknown parents and deep nesting are rejected"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    root = create(client, headers, 'Root')
+    child = create(client, headers, 'Child', root)
+
+    for parent_id in (child, root):
+        response = client.put(f'/api/tasks/{root}', headers=headers, json={'parent_id': parent_id})
+        assert response.status_code == 400
+
+    for parent_id in (str(ObjectId()), 'nope'):
+        response = client.post('/api/tasks', headers=headers,
+                               json={'title': 'Orphan', 'parent_id': parent_id})
+        assert response.status_code == 400
+
+    parent = child
+    for depth in range(2, MAX_TASK_DEPTH + 1):
+        parent = create(client, headers, f'Level {depth}', parent)
+    response = client.post('/api/tasks', headers=headers, json={'title': 'Too deep', 'parent_id': parent})
+    assert response.status_code == 400
+
+    # Moving the deep chain under another task would push it past the limit too
+    other = create(client, headers, 'Other')
+    response = client.put(f'/api/tasks/{root}', headers=headers, json={'parent_id': other})
+    assert response.status_code == 400
+
+
+def test_delete_removes_subtasks(client):
+    """Test that deleting a task deletes everything below it"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    root = create(client, headers, 'Root')
+    child = create(client, headers, 'Child', root)
+    grandchild = create(client, headers, 'Grandchild', child)
+    client.get(f'/api/tasks/{grandchild}', headers=headers)  # cache it
+
+    assert client.delete(f'/api/tasks/{child}', headers=headers).status_code == 200
+    assert client.get(f'/api/tasks/{grandchild}', headers=headers).status_code == 404
+    assert shape(subtree(client, headers, root)) == ['Root', []]
+    assert client.get(f'/api/tasks/{child}/subtree', headers=headers).status_code == 404
+
+
+def test_concurrent_move_is_a_conflict(client, monkeypatch):
+    """Test that a move losing to another one leaves the branch where the winner put it"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = create(client, headers, 'First')
+    second = create(client, headers, 'Second')
+    branch = create(client, headers, 'Branch')
+    create(client, headers, 'Leaf', branch)
+
+    move_subtree = storage.tasks.move_subtree
+
+    def moved_first(*args, **kwargs):
+        # Another request moves the branch between our read and our write
+        monkeypatch.setattr(storage.tasks, 'move_subtree', move_subtree)
+        response = client.put(f'/api/tasks/{branch}', headers=headers, json={'parent_id': first})
+        assert response.status_code == 200
+        return move_subtree(*args, **kwargs)
+
+    monkeypatch.setattr(storage.tasks, 'move_subtree', moved_first)
+    response = client.put(f'/api/tasks/{branch}', headers=headers, json={'parent_id': second})
+    assert response.status_code == 409
+
+    assert shape(subtree(client, headers, first)) == ['First', [['Branch', [['Leaf', []]]]]]
+    assert shape(subtree(client, headers, second)) == ['Second', []]
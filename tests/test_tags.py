@@ -0,0 +1,91 @@
+import json
+from tests.test_tasks import get_auth_token
+
+
+def create(client, headers, title, tags):
+    response = client.post('/api/tasks', headers=headers,
+                           json={'title': title, 'description': '', 'tags': tags})
+    assert response.status_code == 201
+    return json.loads(response.data)['task']
+
+
+def titles(response):
+    # Tasks created within the same millisecond have no defined order
+    return sorted(task['title'] for task in json.loads(response.data)['tasks'])
+
+
+def test_tags_are_normalized(client):
+    """Test that tags are trimmed, lower-cased and de-duplicated"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    task = create(client, headers, 'Tagged', [' Work', 'work', 'Urgent '])
+    assert task['tags'] == ['work', 'urgent']
+
+    for tags in ('work', ['ok', 3], [''], ['x' * 51], [f't{i}' for i in range(21)]):
+        response = client.post('/api/tasks', headers=headers, json={'title': 'Bad', 'tags': tags})
+        assert response.status_code == 400, tags
+
+    response = client.put(f"/api/tasks/{task['id']}", headers=headers, json={'tags': []})
+    assert json.loads(response.data)['task']['tags'] == []
+
+
+def test_filter_by_tags(app, client):
+    """Test that repeated tag parameters match tasks carrying all of them"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    create(client, headers, 'Both', ['work', 'urgent'])
+    create(client, headers, 'Work', ['work'])
+    create(client, headers, 'None', [])
+
+    for fast_path in (True, False):
+        app.config['TASK_LIST_FAST_PATH'] = fast_path
+
+        assert titles(client.get('/api/tasks?tag=work', headers=headers)) == ['Both', 'Work']
+        response = client.get('/api/tasks?tag=work&tag=Urgent', headers=headers)
+        assert titles(response) == ['Both']
+        assert json.loads(response.data)['total'] == 1
+        assert titles(client.get('/api/tasks?tag=home', headers=headers)) == []
+        assert len(titles(client.get('/api/tasks', headers=headers))) == 3
+
+    # Tagging a task shows up in the (cached) filtered page right away
+    task = create(client, headers, 'Later', ['home'])
+    assert titles(client.get('/api/tasks?tag=home', headers=headers)) == ['Later']
+    client.put(f"/api/tasks/{task['id']}", headers=headers, json={'tags': ['work']})
+    assert titles(client.get('/api/tasks?tag=home', headers=headers)) == []
+
+
+def test_tag_counts(client):
+    """Test the per-tag counts, overall and within a selection"""
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    create(client, headers, 'A', ['work', 'urgent'])
+    create(client, headers, 'B', ['work'])
+    done = create(client, headers, 'C', ['home', 'work'])
+
+    response = client.get('/api/tasks/tags', headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.data)['tags'] == [
+        {'tag': 'work', 'count': 3},
+        {'tag': 'home', 'count': 1},
+        {'tag': 'urgent', 'count': 1}
+    ]
+
+    client.put(f"/api/tasks/{done['id']}", headers=headers, json={'completed': True})
+    response = client.get('/api/tasks/tags?completed=false', headers=headers)
+    assert json.loads(response.data)['tags'] == [
+        {'tag': 'work', 'count': 2},
+        {'tag': 'urgent', 'count': 1}
+    ]
+
+    response = client.get('/api/tasks/tags?tag=urgent', headers=headers)
+    assert json.loads(response.data)['tags'] == [
+        {'tag': 'urgent', 'count': 1},
+        {'tag': 'work', 'count': 1}
+    ]
+
+    client.delete(f"/api/tasks/{done['id']}", headers=headers)
+    response = client.get('/api/tasks/tags', headers=headers)
+    assert {'tag': 'home', 'count': 1} not in json.loads(response.data)['tags']
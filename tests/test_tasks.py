@@ -188,3 +188,25 @@ def test_filter_by_completed(client):
     data = json.loads(response.data)
     assert data['total'] == 1
     assert data['tasks'][0]['completed'] == True
+
+
+def test_list_fast_path_matches_dict_path(app, client):
+    """Test that the raw BSON list path returns the same body as the dict path"""
+    token = get_auth_token(client)
+
+    for i in range(3):
+        client.post('/api/tasks',
+                    headers={'Authorization': f'Bearer {token}'},
+                    json={'title': f'Task "{i}" é', 'description': f'Line\n{i}'})
+
+    app.config['TASK_LIST_FAST_PATH'] = True
+    fast = client.get('/api/tasks?per_page=2',
+                      headers={'Authorization': f'Bearer {token}'})
+
+    app.config['TASK_LIST_FAST_PATH'] = False
+    slow = client.get('/api/tasks?per_page=2',
+                      headers={'Authorization': f'Bearer {token}'})
+
+    assert fast.status_code == 200
+    assert fast.mimetype == 'application/json'
+    assert json.loads(fast.data) == json.loads(slow.data)
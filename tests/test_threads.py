@@ -0,0 +1,25 @@
+import threading
+from app.utils.threads import BackgroundThread
+
+
+def test_background_thread_starts_once_per_process():
+    """Test that a thread is started once, and again in a forked process"""
+    release, started = threading.Event(), []
+
+    def run():
+        started.append(threading.get_ident())
+        release.wait(5)
+
+    worker = BackgroundThread(run, 'test-worker')
+    worker.ensure_running()
+    worker.ensure_running()
+    assert worker.is_alive()
+
+    # A forked child inherits the parent's pid in the thread object only
+    worker._pid = -1
+    assert not worker.is_alive()
+    worker.ensure_running(lambda: started.append('before start'))
+    release.set()
+
+    assert len(started) == 3
+    assert started[1] == 'before start'
@@ -0,0 +1,52 @@
+import json
+import logging
+from tests.test_tasks import get_auth_token
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(', '):
+        name, duration = metric.split(';dur=')
+        metrics[name] = float(duration)
+    return metrics
+
+
+def test_server_timing_header(app, client):
+    """Test that list responses report their phases"""
+    app.config['SERVER_TIMING'] = True
+    token = get_auth_token(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/api/tasks', headers=headers, json={'title': 'Task'})
+
+    for fast_path in (True, False):
+        app.config['TASK_LIST_FAST_PATH'] = fast_path
+        response = client.get('/api/tasks', headers=headers)
+
+        assert response.status_code == 200
+        metrics = parse_server_timing(response.headers['Server-Timing'])
+        assert {'jwt', 'user', 'db', 'serialize', 'total'} <= set(metrics)
+        assert metrics['total'] >= metrics['db']
+
+
+def test_server_timing_disabled(client):
+    """Test that no header is sent by default"""
+    token = get_auth_token(client)
+
+    response = client.get('/api/tasks', headers={'Authorization': f'Bearer {token}'})
+
+    assert 'Server-Timing' not in response.headers
+
+
+def test_access_log(app, client, caplog):
+    """Test the structured access log line"""
+    app.config['ACCESS_LOG'] = True
+    token = get_auth_token(client)
+
+    with caplog.at_level(logging.INFO, logger='app.access'):
+        client.get('/api/tasks', headers={'Authorization': f'Bearer {token}'})
+
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry['method'] == 'GET'
+    assert entry['path'] == '/api/tasks'
+    assert entry['status'] == 200
+    assert {'jwt', 'user', 'db', 'serialize'} <= set(entry['phases'])
@@ -0,0 +1,96 @@
+import json
+from bson import ObjectId
+from app.storage import storage
+from app.utils.write_behind import write_behind
+from tests.test_tasks import get_auth_token
+
+
+def create_task(client, token):
+    """Helper to create a task and return its id"""
+    response = client.post('/api/tasks',
+                           headers={'Authorization': f'Bearer {token}'},
+                           json={'title': 'Original', 'description': 'Description'})
+    return json.loads(response.data)['task']['id']
+
+
+def test_updates_are_coalesced(app, client):
+    """Test that repeated updates are merged and written once"""
+    app.config['TASK_WRITE_BEHIND'] = True
+    app.config['TASK_WRITE_BEHIND_WINDOW'] = 60
+    token = get_auth_token(client)
+    task_id = create_task(client, token)
+
+    for completed in (True, False, True):
+        response = client.put(f'/api/tasks/{task_id}',
+                              headers={'Authorization': f'Bearer {token}'},
+                              json={'completed': completed, 'title': f'Title {completed}'})
+        assert response.status_code == 200
+        assert json.loads(response.data)['task']['completed'] == completed
+
+    with app.app_context():
+        assert storage.tasks.get(ObjectId(task_id))['completed'] == False
+
+        stats = write_behind.stats()
+        assert stats['queue_depth'] == 1
+        assert stats['coalesced'] == 2
+
+        assert write_behind.flush() == 1
+
+        task = storage.tasks.get(ObjectId(task_id))
+        assert task['completed'] == True
+        assert task['title'] == 'Title True'
+        assert write_behind.stats()['queue_depth'] == 0
+
+
+def test_flushed_ack_waits_for_write(app, client):
+    """Test that the 'flushed' durability level replies after the write"""
+    app.config['TASK_WRITE_BEHIND'] = True
+    app.config['TASK_WRITE_BEHIND_ACK'] = 'flushed'
+    token = get_auth_token(client)
+    task_id = create_task(client, token)
+
+    response = client.put(f'/api/tasks/{task_id}',
+                          headers={'Authorization': f'Bearer {token}'},
+                          json={'completed': True})
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert storage.tasks.get(ObjectId(task_id))['completed'] == True
+
+
+def test_update_missing_task_not_queued(app, client):
+    """Test that updates to unknown tasks are rejected up front"""
+    app.config['TASK_WRITE_BEHIND'] = True
+    token = get_auth_token(client)
+
+    response = client.put(f'/api/tasks/{ObjectId()}',
+                          headers={'Authorization': f'Bearer {token}'},
+                          json={'completed': True})
+
+    assert response.status_code == 404
+    assert write_behind.stats()['enqueued'] == 0
+
+
+def test_metrics_require_admin(client):
+    """Test that queue metrics are admin-only"""
+    token = get_auth_token(client)
+
+    response = client.get('/api/admin/metrics',
+                          headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 403
+
+    client.post('/api/auth/register',
+                json={
+                    'username': 'admin',
+                    'email': 'admin@example.com',
+                    'password': 'adminpass123',
+                    'role': 'admin'
+                })
+    login = client.post('/api/auth/login',
+                        json={'username': 'admin', 'password': 'adminpass123'})
+    admin_token = json.loads(login.data)['token']
+
+    response = client.get('/api/admin/metrics',
+                          headers={'Authorization': f'Bearer {admin_token}'})
+    assert response.status_code == 200
+    assert 'queue_depth' in json.loads(response.data)['write_behind']